@@ -2,6 +2,7 @@ from layabase._database import (
     CRUDController,
     load,
     check,
+    teardown,
     ComparisonSigns,
     NoRelatedControllers,
     NoDatabaseProvided,
@@ -21,12 +21,22 @@ def add_all_query_fields(
 
 
 def add_get_query_fields(
-    table_or_collection, parser: flask_restplus.reqparse.RequestParser
+    table_or_collection,
+    parser: flask_restplus.reqparse.RequestParser,
+    history: bool = False,
 ):
     is_mongo = is_mongo_collection(table_or_collection)
     add_all_query_fields(table_or_collection, is_mongo, parser)
     parser.add_argument("limit", type=flask_restplus.inputs.positive, location="args")
     parser.add_argument("offset", type=flask_restplus.inputs.natural, location="args")
+    parser.add_argument("after", type=str, store_missing=False, location="args")
+    if history:
+        parser.add_argument(
+            "as_of_revision",
+            type=flask_restplus.inputs.natural,
+            store_missing=False,
+            location="args",
+        )
     if not is_mongo:
         parser.add_argument("order_by", type=str, action="append", location="args")
 
@@ -1,3 +1,17 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+import weakref
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Every writer still running, drained when the interpreter exits
+_writers = weakref.WeakSet()
+
+
 def current_user_name(anonymous_user_name: str = "") -> str:
     """
     Provide the name of the current user performing a request (if any).
@@ -11,3 +25,141 @@ def current_user_name(anonymous_user_name: str = "") -> str:
         return anonymous_user_name
     except ImportError:
         return anonymous_user_name  # Ensure fail safe call
+
+
+class AuditWriter:
+    """
+    Write audit records in the background, by batches.
+    Records are queued in a bounded queue, callers wait for room if the queue is full.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[dict]], None],
+        max_size: int,
+        batch_size: int = 1000,
+        flush_interval: float = 1.0,
+        name: str = "audit",
+    ):
+        """
+        :param write: Function writing a list of audit records.
+        :param max_size: Maximum number of records waiting to be written.
+        :param batch_size: Maximum number of records written at once.
+        :param flush_interval: Maximum number of seconds a record waits for other records before being written.
+        :param name: Name of the background thread.
+        """
+        self._write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.waits = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self._closed = False
+        self._worker = threading.Thread(
+            target=self._run, name=f"layabase-{name}-writer", daemon=True
+        )
+        self._worker.start()
+        _writers.add(self)
+
+    def put(self, records: List[dict]):
+        """
+        Queue records to be written. Wait for room if the queue is full.
+        """
+        if self._closed:
+            raise Exception("Audit writer is closed.")
+        for record in records:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                with self._lock:
+                    self.waits += 1
+                self._queue.put(record)
+
+    def flush(self):
+        """
+        Wait for every queued record to be written (or to fail being written).
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Write every queued record and stop the background thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+        _writers.discard(self)
+
+    def statistics(self) -> dict:
+        """
+        :return: Number of queued, written and failed records, number of flushes and of waits for room,
+        last and maximum flush latency (in seconds).
+        """
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "waits": self.waits,
+                "last_flush_latency": self.last_flush_latency,
+                "max_flush_latency": self.max_flush_latency,
+            }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            record = self._queue.get()
+            if record is None:
+                self._queue.task_done()
+                break
+
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get(
+                        timeout=max(deadline - time.monotonic(), 0)
+                    )
+                except queue.Empty:
+                    break
+                if record is None:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(record)
+
+            self._flush(batch)
+
+    def _flush(self, batch: List[dict]):
+        start = time.monotonic()
+        try:
+            self._write(batch)
+            succeeded = True
+        except Exception:
+            logger.exception(f"{len(batch)} audit records could not be written.")
+            succeeded = False
+        latency = time.monotonic() - start
+        with self._lock:
+            if succeeded:
+                self.written += len(batch)
+            else:
+                self.failed += len(batch)
+            self.flushes += 1
+            self.last_flush_latency = latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+        for _ in batch:
+            self._queue.task_done()
+
+
+@atexit.register
+def _close_writers():
+    for writer in list(_writers):
+        writer.close()
@@ -1,16 +1,20 @@
+import copy
 import logging
 import datetime
 import enum
-import copy
-from typing import Type
+import itertools
+from typing import Type, List
 
 from layabase._database_mongo import _CRUDModel
 from layabase.mongo import Column
-from layabase._audit import current_user_name
+from layabase._audit import current_user_name, AuditWriter
 from layabase._versioning_mongo import VersionedCRUDModel
 
 logger = logging.getLogger(__name__)
 
+# Number of removed documents copied at once when the server cannot copy them
+_REMOVE_BATCH_SIZE = 1000
+
 
 @enum.unique
 class Action(enum.IntEnum):
@@ -20,21 +24,42 @@ class Action(enum.IntEnum):
     Rollback = 4
 
 
-def _create_from(mixin, model: Type[_CRUDModel], base):
+def _create_from(
+    mixin,
+    model: Type[_CRUDModel],
+    base,
+    skip_update_indexes: bool = False,
+    plan_update_indexes: bool = False,
+):
+    """
+    :param skip_update_indexes: Do not update audit indexes (as for the audited model).
+    :param plan_update_indexes: Only log audit indexes changes (as for the audited model).
+    """
     return (
-        _versioning_audit(mixin, base)
+        _versioning_audit(mixin, base, skip_update_indexes, plan_update_indexes)
         if issubclass(model, VersionedCRUDModel)
-        else _common_audit(mixin, model, base)
+        else _common_audit(mixin, model, base, skip_update_indexes, plan_update_indexes)
     )
 
 
-def _common_audit(mixin, model, base):
-    class AuditModel(mixin, _CRUDModel, base=base, skip_name_check=True):
+def _common_audit(
+    mixin, model, base, skip_update_indexes: bool, plan_update_indexes: bool
+):
+    class AuditModel(
+        mixin,
+        _CRUDModel,
+        base=base,
+        skip_name_check=True,
+        skip_update_indexes=skip_update_indexes,
+        plan_update_indexes=plan_update_indexes,
+    ):
         """
         Class providing Audit fields for a MONGODB model.
         """
 
         __collection_name__ = f"audit_{model.__collection_name__}"
+        # Declared indexes (such as unique or TTL ones) do not apply to audit
+        __indexes__ = []
 
         revision = Column(int, is_primary_key=True)
 
@@ -42,44 +67,143 @@ def _common_audit(mixin, model, base):
         audit_date_utc = Column(datetime.datetime)
         audit_action = Column(Action)
 
+        # Set if audit is written asynchronously
+        _writer: AuditWriter = None
+
         @classmethod
         def audit_add(cls, document: dict):
             """
             :param document: Document as inserted in Mongo.
             """
-            cls._audit_action(Action.Insert, copy.deepcopy(document))
+            cls._audit_actions(Action.Insert, [document])
+
+        @classmethod
+        def audit_add_all(cls, documents: List[dict]):
+            """
+            :param documents: Documents as inserted in Mongo.
+            """
+            cls._audit_actions(Action.Insert, documents)
 
         @classmethod
         def audit_update(cls, document: dict):
             """
             :param document: Document as updated in Mongo.
             """
-            cls._audit_action(Action.Update, copy.deepcopy(document))
+            cls._audit_actions(Action.Update, [document])
+
+        @classmethod
+        def audit_update_all(cls, documents: List[dict]):
+            """
+            :param documents: Documents as updated in Mongo.
+            """
+            cls._audit_actions(Action.Update, documents)
 
         @classmethod
         def audit_remove(cls, **filters):
             """
+            Copy documents that are about to be removed.
+            Copy is performed by the server (aggregation with $merge) if supported (MongoDB 5.0+)
+            and if audit is written synchronously, by batches of documents otherwise.
+
             :param filters: Arguments that can directly be provided to Mongo.
             """
-            for removed_document in model.__collection__.find(filters):
-                cls._audit_action(Action.Delete, removed_document)
+            if not cls._writer and cls._server_version >= (5, 0):
+                cls._merge_removed(filters)
+                return
+
+            removed_documents = model.__collection__.find(
+                filters, projection={"_id": False}, batch_size=_REMOVE_BATCH_SIZE
+            )
+            while True:
+                batch = list(itertools.islice(removed_documents, _REMOVE_BATCH_SIZE))
+                if not batch:
+                    break
+                cls._audit_actions(Action.Delete, batch)
 
         @classmethod
-        def _audit_action(cls, action: Action, document: dict):
-            document.pop("_id", None)
-            document[cls.revision.name] = cls._increment(
-                "revision", model.__collection_name__
+        def _merge_removed(cls, filters: dict):
+            nb_removed = model.__collection__.count_documents(filters)
+            if not nb_removed:
+                return
+
+            revisions = cls._reserve(
+                "revision", model.__collection_name__, count=nb_removed
+            )
+            model.__collection__.aggregate(
+                [
+                    {"$match": filters},
+                    # Documents inserted in the meantime must not use revisions that were not reserved
+                    {"$sort": {"_id": 1}},
+                    {"$limit": nb_removed},
+                    {
+                        "$setWindowFields": {
+                            "sortBy": {"_id": 1},
+                            "output": {cls.revision.name: {"$documentNumber": {}}},
+                        }
+                    },
+                    {
+                        "$set": {
+                            cls.revision.name: {
+                                "$add": [f"${cls.revision.name}", revisions[0] - 1]
+                            },
+                            cls.audit_user.name: {"$literal": current_user_name()},
+                            cls.audit_date_utc.name: datetime.datetime.utcnow(),
+                            cls.audit_action.name: Action.Delete.value,
+                        }
+                    },
+                    {"$unset": "_id"},
+                    {
+                        "$merge": {
+                            "into": cls.__collection_name__,
+                            "whenMatched": "fail",
+                            "whenNotMatched": "insert",
+                        }
+                    },
+                ]
             )
-            document[cls.audit_user.name] = current_user_name()
-            document[cls.audit_date_utc.name] = datetime.datetime.utcnow()
-            document[cls.audit_action.name] = action.value
-            cls.__collection__.insert_one(document)
+
+        @classmethod
+        def _audit_actions(cls, action: Action, documents: List[dict]):
+            audit_user = current_user_name()
+            audit_date_utc = datetime.datetime.utcnow()
+            audit_documents = []
+            for document in documents:
+                # Written later on, documents (and nested ones) might be serialized in place in the meantime
+                # Otherwise only document keys are modified, a shallow copy is enough
+                document = copy.deepcopy(document) if cls._writer else dict(document)
+                document.pop("_id", None)
+                document[cls.audit_user.name] = audit_user
+                document[cls.audit_date_utc.name] = audit_date_utc
+                document[cls.audit_action.name] = action.value
+                audit_documents.append(document)
+            if cls._writer:
+                cls._writer.put(audit_documents)
+            else:
+                cls._write(audit_documents)
+
+        @classmethod
+        def _write(cls, audit_documents: List[dict]):
+            # Reserve all revisions at once
+            revisions = cls._reserve(
+                "revision", model.__collection_name__, count=len(audit_documents)
+            )
+            for revision, audit_document in zip(revisions, audit_documents):
+                audit_document[cls.revision.name] = revision
+            cls.__collection__.insert_many(audit_documents)
 
     return AuditModel
 
 
-def _versioning_audit(mixin, base):
-    class AuditModel(_CRUDModel, base=base, skip_name_check=True):
+def _versioning_audit(
+    mixin, base, skip_update_indexes: bool, plan_update_indexes: bool
+):
+    class AuditModel(
+        _CRUDModel,
+        base=base,
+        skip_name_check=True,
+        skip_update_indexes=skip_update_indexes,
+        plan_update_indexes=plan_update_indexes,
+    ):
         """
         Class providing the audit for all versioned MONGODB models.
         """
@@ -93,6 +217,9 @@ def _versioning_audit(mixin, base):
         audit_date_utc = Column(datetime.datetime)
         audit_action = Column(Action)
 
+        # Set if audit is written asynchronously
+        _writer: AuditWriter = None
+
         @classmethod
         def get_all(cls, **filters):
             filters[cls.table_name.name] = mixin.__collection_name__
@@ -116,14 +243,20 @@ def _versioning_audit(mixin, base):
 
         @classmethod
         def _audit_action(cls, action: Action, revision: int):
-            cls.__collection__.insert_one(
-                {
-                    cls.table_name.name: mixin.__collection_name__,
-                    cls.revision.name: revision,
-                    cls.audit_user.name: current_user_name(),
-                    cls.audit_date_utc.name: datetime.datetime.utcnow(),
-                    cls.audit_action.name: action.value,
-                }
-            )
+            audit_document = {
+                cls.table_name.name: mixin.__collection_name__,
+                cls.revision.name: revision,
+                cls.audit_user.name: current_user_name(),
+                cls.audit_date_utc.name: datetime.datetime.utcnow(),
+                cls.audit_action.name: action.value,
+            }
+            if cls._writer:
+                cls._writer.put([audit_document])
+            else:
+                cls.__collection__.insert_one(audit_document)
+
+        @classmethod
+        def _write(cls, audit_documents: List[dict]):
+            cls.__collection__.insert_many(audit_documents)
 
     return AuditModel
@@ -1,10 +1,16 @@
 import datetime
 import enum
 import copy
+from typing import List
 
-from sqlalchemy import Column, DateTime, Enum, String, Integer
+from sqlalchemy import Column, DateTime, Enum, String, Integer, select, literal, event
+from sqlalchemy.orm import Session, scoped_session
+from sqlalchemy.orm.query import Query
 
-from layabase._audit import current_user_name
+from layabase._audit import current_user_name, AuditWriter
+
+# Session information key of audit records to be written once committed
+_PENDING_AUDIT = "layabase_pending_audit"
 
 
 @enum.unique
@@ -55,6 +61,9 @@ def _create_from(model):
             )
         )
 
+        # Set if audit is written asynchronously
+        _writer: AuditWriter = None
+
         @classmethod
         def audit_add(cls, row: dict):
             """
@@ -62,6 +71,28 @@ def _create_from(model):
             """
             cls._audit_action(Action.Insert, dict(row))
 
+        @classmethod
+        def audit_add_all(cls, rows: List[dict]):
+            """
+            :param rows: Loaded dictionaries (not models) that were properly inserted.
+            """
+            audit_user = current_user_name()
+            audit_date_utc = datetime.datetime.utcnow()
+            mappings = [
+                {
+                    **row,
+                    "audit_user": audit_user,
+                    "audit_date_utc": audit_date_utc,
+                    "audit_action": Action.Insert.value,
+                }
+                for row in rows
+            ]
+            if cls._writer:
+                cls._queue(mappings)
+            else:
+                # Let any error be handled by the caller (main model), same for commit
+                cls._session.bulk_insert_mappings(cls, mappings)
+
         @classmethod
         def audit_update(cls, row: dict):
             """
@@ -70,12 +101,45 @@ def _create_from(model):
             cls._audit_action(Action.Update, dict(row))
 
         @classmethod
-        def audit_remove(cls, **filters):
+        def audit_remove(cls, query: Query):
             """
-            :param filters: Filters as requested.
+            Copy rows that are about to be removed using a single INSERT INTO ... SELECT statement.
+            If audit is written asynchronously, rows are selected and queued instead.
+
+            :param query: Query selecting rows that are about to be removed.
             """
-            for removed_row in model.get_all(**filters):
-                cls._audit_action(Action.Delete, removed_row)
+            columns = [
+                column
+                for column in model.__table__.columns
+                if column.name in cls.__table__.columns
+            ]
+            rows = select(
+                columns
+                + [
+                    literal(current_user_name(), type_=cls.audit_user.type),
+                    literal(datetime.datetime.utcnow(), type_=cls.audit_date_utc.type),
+                    literal(Action.Delete.value, type_=cls.audit_action.type),
+                ]
+            )
+            if query.whereclause is not None:
+                rows = rows.where(query.whereclause)
+            column_names = [column.name for column in columns] + [
+                "audit_user",
+                "audit_date_utc",
+                "audit_action",
+            ]
+            # Let any error be handled by the caller (main model), same for commit
+            if cls._writer:
+                cls._queue(
+                    [
+                        dict(zip(column_names, row))
+                        for row in cls._session.execute(rows).fetchall()
+                    ]
+                )
+            else:
+                cls._session.execute(
+                    cls.__table__.insert().from_select(column_names, rows)
+                )
 
         @classmethod
         def _audit_action(cls, action: Action, row: dict):
@@ -83,6 +147,50 @@ def _create_from(model):
             row["audit_date_utc"] = datetime.datetime.utcnow().isoformat()
             row["audit_action"] = action.value
             # Let any error be handled by the caller (main model), same for commit
-            cls._session.add(cls.schema().load(row, session=cls._session))
+            if cls._writer:
+                cls._queue([cls._bulk_schema().load(row, session=cls._session)])
+            else:
+                cls._session.add(cls.schema().load(row, session=cls._session))
+
+        @classmethod
+        def _queue(cls, mappings: List[dict]):
+            """
+            Keep audit records until the current transaction is committed (discarded on rollback).
+            """
+            cls._session().info.setdefault(_PENDING_AUDIT, []).append(
+                (cls._writer, mappings)
+            )
+
+        @classmethod
+        def _write(cls, mappings: List[dict]):
+            # Written using a dedicated session as it is performed by another thread
+            session = Session(bind=cls.metadata.bind)
+            try:
+                session.bulk_insert_mappings(cls, mappings)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
 
     return AuditModel
+
+
+def _listen_to_transactions(session: scoped_session):
+    """
+    Queue audit records kept by sessions once their transaction is committed.
+
+    :param session: Session registry of models written asynchronously.
+    """
+    event.listen(session, "after_commit", _queue_pending_audit)
+    event.listen(session, "after_rollback", _discard_pending_audit)
+
+
+def _queue_pending_audit(session: Session):
+    for writer, mappings in session.info.pop(_PENDING_AUDIT, []):
+        writer.put(mappings)
+
+
+def _discard_pending_audit(session: Session):
+    session.info.pop(_PENDING_AUDIT, None)
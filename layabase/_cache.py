@@ -0,0 +1,90 @@
+import collections
+import copy
+import json
+import threading
+import time
+from typing import Callable
+
+
+class Cache:
+    """
+    Least recently used results, each of them being valid for a limited amount of time.
+    Every result is a copy so that callers can modify it without altering the cache.
+    """
+
+    def __init__(self, max_size: int, time_to_live: float = None):
+        """
+        :param max_size: Maximum number of results to keep.
+        :param time_to_live: Number of seconds a result is valid. Results are valid until invalidated by default.
+        """
+        self.max_size = max_size
+        self.time_to_live = time_to_live
+        self._results = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # Incremented on every invalidation so that results computed beforehand are never stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, method_name: str, request_arguments: dict, compute: Callable):
+        """
+        Return the cached result of this request or compute (and cache) it.
+
+        :param method_name: Name of the requested controller method.
+        :param request_arguments: Arguments as received by the controller method.
+        :param compute: Function without parameters returning the result.
+        """
+        key = (method_name, _normalize(request_arguments))
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                expiry, value = result
+                if expiry is None or expiry > time.monotonic():
+                    self._results.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._results[key]
+            self.misses += 1
+            generation = self._generation
+
+        value = compute()
+
+        with self._lock:
+            if generation == self._generation:
+                expiry = (
+                    time.monotonic() + self.time_to_live if self.time_to_live else None
+                )
+                self._results[key] = expiry, copy.deepcopy(value)
+                self._results.move_to_end(key)
+                while len(self._results) > self.max_size:
+                    self._results.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self):
+        """
+        Remove every result.
+        """
+        with self._lock:
+            self._results.clear()
+            self._generation += 1
+
+    def statistics(self) -> dict:
+        """
+        :return: Number of hits, misses, evictions and results currently cached.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._results),
+            }
+
+
+def _normalize(request_arguments) -> str:
+    """
+    Provide the same key whatever the order of the arguments.
+    """
+    return json.dumps(request_arguments, sort_keys=True, default=str)
@@ -1,10 +1,12 @@
 import enum
+import functools
 import logging
-from typing import List, Union, Iterable
+from typing import List, Union, Iterable, Iterator
 
 from layaberr import ValidationFailed
 import flask_restplus
 
+from layabase._cache import Cache
 from layabase._exceptions import ControllerModelNotSet
 from layabase._api import (
     add_get_query_fields,
@@ -83,6 +85,23 @@ def check(base) -> (str, dict):
     return _check(base)
 
 
+def teardown(base) -> None:
+    """
+    Release the database session related to the current scope (thread or request).
+    Should be called once a request is processed (using Flask teardown_appcontext for example).
+
+    :param base: database object as returned by the load method (Mandatory).
+    """
+    if not base:
+        raise NoDatabaseProvided()
+
+    # Mongo client is thread-safe and manage its own connection pool
+    if not hasattr(base, "is_mongos"):
+        from layabase._database_sqlalchemy import _teardown
+
+        _teardown(base)
+
+
 def _ignore_read_only_fields(model_properties: dict, model_as_dict: dict):
     if model_as_dict:
         if not isinstance(model_as_dict, dict):
@@ -100,6 +119,22 @@ def _ignore_read_only_fields(model_properties: dict, model_as_dict: dict):
     return model_as_dict
 
 
+def _invalidates_cache(method):
+    """
+    Invalidate the controller cache once method is called (even if it failed as data might have been modified).
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            if self._cache:
+                self._cache.invalidate()
+
+    return wrapper
+
+
 class CRUDController:
     """
     Class providing methods to interact with a Table or a Mongo Collection.
@@ -111,26 +146,60 @@ class CRUDController:
 
         :param table_or_collection: Naive python class describing a table or a mongo collection.
         :param history: True to be able to rollback to any state in the past. No history by default. (Mongo only)
+        :param history_collection: True to store expired versions in a separate <collection>_history collection. (Mongo only)
+        Expired versions are stored alongside valid ones by default. Only used if history is activated.
+        :param history_snapshot_interval: Store only updated fields of expired versions, with a full copy every this number of versions. (Mongo only)
+        Reduce storage at the cost of rebuilding versions when reading history. Full copies by default. Only used if history is activated.
+        :param revision_scope: layabase.mongo.RevisionScope.Collection to use a revision counter per collection instead of a single one shared by every versioned collection. (Mongo only)
+        Only used if history is activated.
+        :param revision_block_size: Number of revisions reserved at once by this process. Revisions are reserved when needed by default. (Mongo only)
+        Use it to reduce the number of counter updates, at the cost of an additional query per modification.
+        Requires a revision scope per collection, and a single process modifying the collection:
+        revisions are not chronological across processes (rollback_to and get_as_of would not reflect the modifications order).
+        Only used if history is activated.
         :param audit: True to keep record of every action on the underlying table or collection. No audit by default.
+        :param audit_queue_size: Maximum number of audit records waiting to be written in the background. Audit is written synchronously by default.
+        Use it to remove audit from the critical path of modifications, at the cost of an eventual audit (records might be lost if the process is killed).
+        Callers wait for room if the queue is full. Only used if audit is activated.
+        :param audit_batch_size: Maximum number of audit records written at once in the background. Default to 1000.
+        :param audit_flush_interval: Maximum number of seconds an audit record waits to be written in the background. Default to 1 second.
         :param skip_name_check: True to be able to force the usage of forbidden table or collection names. Name check is enforced by default. (Mongo only)
         :param skip_unknown_fields: False to use strict field name check. Ignore unknown fields by default. (Mongo only)
         :param skip_update_indexes: True to never update indexes. Warning, this might lead to invalid indexes on the underlying table or collection. (Mongo only)
+        :param plan_update_indexes: True to only log index creations and drops instead of performing them. Indexes are updated by default. (Mongo only)
         :param skip_log_for_unknown_fields: List of unknown field names that are to be expected.
+        :param counter_block_size: Number of auto incremented values reserved at once by this process. Values are reserved when needed by default. (Mongo only)
+        Use it to reduce the number of counter updates, at the cost of non consecutive values across processes.
+        :param cache_size: Maximum number of get and get_one results to cache. No cache by default.
+        Cache is invalidated by every modification performed through this controller.
+        :param cache_ttl: Number of seconds a cached result is valid. Valid until invalidated by default.
         """
         if not table_or_collection:
             raise Exception("Table or Collection must be provided.")
 
         self.table_or_collection = table_or_collection
         self.history = kwargs.pop("history", False)
+        self.history_collection = kwargs.pop("history_collection", False)
+        self.history_snapshot_interval = kwargs.pop("history_snapshot_interval", 1)
+        self.revision_scope = kwargs.pop("revision_scope", None)
+        self.revision_block_size = kwargs.pop("revision_block_size", 1)
         self.audit = kwargs.pop("audit", False)
+        self.audit_queue_size = kwargs.pop("audit_queue_size", 0)
+        self.audit_batch_size = kwargs.pop("audit_batch_size", 1000)
+        self.audit_flush_interval = kwargs.pop("audit_flush_interval", 1.0)
         self.skip_name_check = kwargs.pop("skip_name_check", False)
         self.skip_unknown_fields = kwargs.pop("skip_unknown_fields", True)
         self.skip_update_indexes = kwargs.pop("skip_update_indexes", False)
+        self.plan_update_indexes = kwargs.pop("plan_update_indexes", False)
         self.skip_log_for_unknown_fields = kwargs.pop("skip_log_for_unknown_fields", [])
+        self.counter_block_size = kwargs.pop("counter_block_size", 1)
+        cache_size = kwargs.pop("cache_size", 0)
+        cache_ttl = kwargs.pop("cache_ttl", None)
+        self._cache = Cache(cache_size, cache_ttl) if cache_size else None
 
         # CRUD request parsers
         self.query_get_parser = flask_restplus.reqparse.RequestParser()
-        add_get_query_fields(table_or_collection, self.query_get_parser)
+        add_get_query_fields(table_or_collection, self.query_get_parser, self.history)
 
         self.query_delete_parser = flask_restplus.reqparse.RequestParser()
         add_delete_query_fields(table_or_collection, self.query_delete_parser)
@@ -205,8 +274,39 @@ class CRUDController:
             raise ControllerModelNotSet(self)
         if not isinstance(request_arguments, dict):
             raise ValidationFailed(request_arguments, message="Must be a dictionary.")
+        if self._cache:
+            return self._cache.get(
+                "get",
+                request_arguments,
+                lambda: self._model.get_all(**request_arguments),
+            )
         return self._model.get_all(**request_arguments)
 
+    def stream(self, request_arguments: dict, fetch_size: int = 1000) -> Iterator[dict]:
+        """
+        Return all models formatted as dictionaries, one at a time.
+        Use it instead of get to retrieve a huge number of models as only fetch_size models are kept in memory.
+
+        :param fetch_size: Number of models fetched (and serialized) at a time. Default to 1000.
+        """
+        if not self._model:
+            raise ControllerModelNotSet(self)
+        if not isinstance(request_arguments, dict):
+            raise ValidationFailed(request_arguments, message="Must be a dictionary.")
+        return self._model.stream(fetch_size, **request_arguments)
+
+    def get_page(self, request_arguments: dict) -> (List[dict], str):
+        """
+        Return a page of models formatted as a list of dictionaries and the continuation token of the next page.
+        Provide this token as after request argument to retrieve the next page.
+        Token is None if there is no next page (or if limit is not provided).
+        """
+        if not self._model:
+            raise ControllerModelNotSet(self)
+        if not isinstance(request_arguments, dict):
+            raise ValidationFailed(request_arguments, message="Must be a dictionary.")
+        return self._model.get_page(**request_arguments)
+
     def get_one(self, request_arguments: dict) -> dict:
         """
         Return a model formatted as a dictionary.
@@ -215,6 +315,12 @@ class CRUDController:
             raise ControllerModelNotSet(self)
         if not isinstance(request_arguments, dict):
             raise ValidationFailed(request_arguments, message="Must be a dictionary.")
+        if self._cache:
+            return self._cache.get(
+                "get_one",
+                request_arguments,
+                lambda: self._model.get(**request_arguments),
+            )
         return self._model.get(**request_arguments)
 
     def get_last(self, request_arguments: dict) -> dict:
@@ -249,6 +355,7 @@ class CRUDController:
             f'{endpoint}{"?" if dict_identifiers else ""}{"&".join(dict_identifiers)}'
         )
 
+    @_invalidates_cache
     def post(self, new_dict: dict) -> dict:
         """
         Add a model formatted as a dictionary.
@@ -263,9 +370,12 @@ class CRUDController:
             )
         return self._model.add(new_dict)
 
-    def post_many(self, new_dicts: List[dict]) -> List[dict]:
+    @_invalidates_cache
+    def post_many(self, new_dicts: List[dict], bulk_size: int = None) -> List[dict]:
         """
         Add models formatted as a list of dictionaries.
+        :param bulk_size: Insert bulk_size rows at a time without creating models. (non Mongo only)
+        Use it to insert a huge number of rows. Values generated by the database (auto increment) are not returned.
         :raises ValidationFailed in case Marshmallow validation fail.
         :returns The inserted models formatted as a list of dictionaries.
         """
@@ -282,8 +392,11 @@ class CRUDController:
                 )
                 for new_dict in new_dicts
             ]
+        if bulk_size:
+            return self._model.add_all(new_dicts, bulk_size=bulk_size)
         return self._model.add_all(new_dicts)
 
+    @_invalidates_cache
     def put(self, updated_dict: dict) -> (dict, dict):
         """
         Update a model formatted as a dictionary.
@@ -295,6 +408,7 @@ class CRUDController:
             raise ControllerModelNotSet(self)
         return self._model.update(updated_dict)
 
+    @_invalidates_cache
     def put_many(self, updated_dicts: List[dict]) -> (List[dict], List[dict]):
         """
         Update models formatted as a list of dictionaries.
@@ -306,6 +420,7 @@ class CRUDController:
             raise ControllerModelNotSet(self)
         return self._model.update_all(updated_dicts)
 
+    @_invalidates_cache
     def delete(self, request_arguments: dict) -> int:
         """
         Remove the model(s) matching those criterion.
@@ -329,22 +444,79 @@ class CRUDController:
             raise ValidationFailed(request_arguments, message="Must be a dictionary.")
         return self._model.audit_model.get_all(**request_arguments)
 
+    def flush_audit(self):
+        """
+        Wait for every audit record to be written (if audit is written in the background).
+        """
+        if not self._model:
+            raise ControllerModelNotSet(self)
+        if self._model.audit_model and self._model.audit_model._writer:
+            self._model.audit_model._writer.flush()
+
+    def close_audit(self):
+        """
+        Write every queued audit record and stop the background writer (if audit is written in the background).
+        Writer of a controller linked again is closed as well.
+        """
+        if not self._model:
+            raise ControllerModelNotSet(self)
+        if self._model.audit_model and self._model.audit_model._writer:
+            self._model.audit_model._writer.close()
+
+    def audit_statistics(self) -> dict:
+        """
+        Return audit records queued, written and failed, flushes, waits for room and flush latency (in seconds).
+        Empty if audit is not written in the background.
+        """
+        if not self._model:
+            raise ControllerModelNotSet(self)
+        if not self._model.audit_model or not self._model.audit_model._writer:
+            return {}
+        return self._model.audit_model._writer.statistics()
+
     def get_model_description(self) -> dict:
         if not self._model_description_dictionary:
             raise ControllerModelNotSet(self)
         return self._model_description_dictionary
 
-    def rollback_to(self, request_arguments: dict) -> int:
+    @_invalidates_cache
+    def rollback_to(self, request_arguments: dict, dry_run: bool = False) -> int:
         """
         Rollback to the model(s) matching those criterion.
+        :param dry_run: Do not modify anything, only return the number of rows that would be affected.
         :returns Number of affected rows.
         """
         if not self._model:
             raise ControllerModelNotSet(self)
         if not isinstance(request_arguments, dict):
             raise ValidationFailed(request_arguments, message="Must be a dictionary.")
+        if dry_run:
+            return self._model.rollback_to(dry_run=True, **request_arguments)
         return self._model.rollback_to(**request_arguments)
 
+    def move_expired_versions(self, batch_size: int = 1000) -> int:
+        """
+        Move expired versions stored in the collection to the history collection (Mongo only, with history_collection).
+        Should be called once history_collection is used for a collection already containing expired versions.
+        Versions are moved by batches, an interrupted move can be resumed by calling this method again.
+
+        :param batch_size: Maximum number of expired versions moved at once.
+        :returns Number of moved versions.
+        """
+        if not self._model:
+            raise ControllerModelNotSet(self)
+        return self._model.move_expired_versions(batch_size)
+
+    def get_as_of(self, revision: int, request_arguments: dict) -> List[dict]:
+        """
+        Return all models (as they were at this revision) formatted as a list of dictionaries.
+        """
+        if not self._model:
+            raise ControllerModelNotSet(self)
+        if not isinstance(request_arguments, dict):
+            raise ValidationFailed(request_arguments, message="Must be a dictionary.")
+        return self._model.get_as_of(revision, **request_arguments)
+
     def get_history(self, request_arguments: dict) -> List[dict]:
         """
         Return all models formatted as a list of dictionaries.
@@ -355,6 +527,14 @@ class CRUDController:
             raise ValidationFailed(request_arguments, message="Must be a dictionary.")
         return self._model.get_history(**request_arguments)
 
+    def cache_statistics(self) -> dict:
+        """
+        Return cache hits, misses, evictions and size (number of cached results).
+        """
+        if not self._cache:
+            return {}
+        return self._cache.statistics()
+
     def get_field_names(self) -> List[str]:
         """
         Return all model field names formatted as a str list.
@@ -382,6 +562,7 @@ def load(database_connection_url: str, controllers: Iterable[CRUDController], **
      In case database connection URL is related to a non mongo database:
         SQLAlchemy.create_engine methods parameters.
         base_parameters can be set to a dictionary containing parameters to use when calling SQLAlchemy.declarative_base
+        session_scope can be set to "thread" (default), "request" (Flask request) or a function identifying the scope
      Otherwise (mongo):
         pymongo.MongoClient constructor parameters.
     :return Database object.
@@ -3,20 +3,39 @@ import datetime
 import inspect
 import logging
 import os.path
-from typing import List, Dict, Union, Type, Iterable
+import threading
+import warnings
+from typing import (
+    List,
+    Dict,
+    Union,
+    Type,
+    Iterable,
+    Iterator,
+    Set,
+    Tuple,
+    Callable,
+)
 
 import pymongo
 import pymongo.errors
+import pymongo.collection
 import pymongo.database
 from layaberr import ValidationFailed, ModelCouldNotBeFound
 
 from layabase import CRUDController
-from layabase.mongo import Column, DictColumn, IndexType, link
+from layabase.mongo import Column, DictColumn, ListColumn, IndexType, Index, link
+from layabase._pagination import to_continuation_token, from_continuation_token
 
 logger = logging.getLogger(__name__)
 
 
-_server_versions: Dict[str, str] = {}
+# Server version (as comparable integers) per database name
+_server_versions: Dict[str, Tuple[int, ...]] = {}
+
+# Counter values reserved by this process but not yet provided (per counters collection, category and name)
+_counter_blocks: Dict[Tuple[str, str, str], range] = {}
+_counter_blocks_lock = threading.Lock()
 
 
 class _CRUDModel:
@@ -31,17 +50,25 @@ class _CRUDModel:
     __collection__: pymongo.collection.Collection = None  # Mongo collection
     __counters__: pymongo.collection.Collection = None  # Mongo counters collection (to increment fields)
     __fields__: List[Column] = []  # All Mongo fields within this model
+    __indexes__: List[Index] = []  # Indexes declared in addition to fields ones
+    _field_names: Set[str] = set()  # Computed once and for all by __init_subclass__
+    _auto_increment_fields: List[
+        Column
+    ] = []  # Computed once and for all by __init_subclass__
     audit_model: Type["_CRUDModel"] = None
     _skip_unknown_fields: bool = True
     _skip_log_for_unknown_fields: List[str] = []
     logger = None
-    _server_version: str = ""
+    _server_version: Tuple[int, ...] = ()
+    _counter_block_size: int = 1
 
     def __init_subclass__(cls, base: pymongo.database.Database = None, **kwargs):
         cls._skip_unknown_fields = kwargs.pop("skip_unknown_fields", True)
         cls._skip_log_for_unknown_fields = kwargs.pop("skip_log_for_unknown_fields", [])
         skip_name_check = kwargs.pop("skip_name_check", False)
         skip_update_indexes = kwargs.pop("skip_update_indexes", False)
+        plan_update_indexes = kwargs.pop("plan_update_indexes", False)
+        cls._counter_block_size = kwargs.pop("counter_block_size", 1)
         super().__init_subclass__(**kwargs)
         cls.logger = logging.getLogger(f"{__name__}.{cls.__collection_name__}")
         cls.__fields__ = [
@@ -49,6 +76,12 @@ class _CRUDModel:
             for field_name, field in inspect.getmembers(cls)
             if isinstance(field, Column)
         ]
+        cls._field_names = {field.name for field in cls.__fields__}
+        cls._primary_key_names = cls.get_primary_keys()
+        cls._auto_increment_fields = [
+            field for field in cls.__fields__ if field.should_auto_increment
+        ]
+        cls._check_declared_indexes()
         # TODO Remove the need for this check, only create models with a base
         if base is not None:  # Allow to not provide base to create fake models
             if not skip_name_check and cls._is_forbidden():
@@ -57,9 +90,9 @@ class _CRUDModel:
                 )
             cls.__collection__ = base[cls.__collection_name__]
             cls.__counters__ = base["counters"]
-            cls._server_version = _server_versions.get(base.name, "")
+            cls._server_version = _server_versions.get(base.name, ())
             if not skip_update_indexes:
-                cls.update_indexes()
+                cls.update_indexes(dry_run=plan_update_indexes)
 
     @classmethod
     def get_primary_keys(cls) -> List[str]:
@@ -76,102 +109,203 @@ class _CRUDModel:
         )
 
     @classmethod
-    def update_indexes(cls, document: dict = None):
+    def update_indexes(cls, document: dict = None, dry_run: bool = False) -> List[dict]:
         """
-        Drop all indexes and recreate them.
-        As advised in https://docs.mongodb.com/manual/tutorial/manage-indexes/#modify-an-index
-        """
-        if cls._check_indexes(document):
-            cls.logger.info("Updating indexes...")
-            cls.__collection__.drop_indexes()
-            cls._create_indexes(IndexType.Unique, document)
-            cls._create_indexes(IndexType.Other, document)
-            cls.logger.info("Indexes updated.")
-            if cls.audit_model:
-                cls.audit_model.update_indexes(document)
+        Create missing indexes, then drop obsolete ones (every index but _id one that is not expected).
+        Indexes that are already as expected (whatever their name) are kept as is.
+        An obsolete index is dropped first only if it uses the same keys as a missing one (as Mongo would refuse to create it).
+        Audit indexes (if audited) are then updated the same way.
 
-    @classmethod
-    def _check_indexes(cls, document: dict) -> bool:
-        """
-        Check if indexes are present and if criteria have been modified
         :param document: Data specified by the user at the time of the index creation.
+        :param dry_run: True to only log the changes that would be performed.
+        :return: Changes (in the order they are performed). Each change is a dictionary containing the collection name,
+        the action ("create" or "drop") and the index (name, key, unique and partialFilterExpression if any).
         """
-        criteria = [
-            field_name
-            for field_name in cls._get_index_fields(IndexType.Other, document, "")
-        ]
-        unique_criteria = [
-            field_name
-            for field_name in cls._get_index_fields(IndexType.Unique, document, "")
-        ]
-        index_name = f"idx{cls.__collection_name__}"
-        unique_index_name = f"uidx{cls.__collection_name__}"
-        indexes = cls.__collection__.list_indexes()
-        cls.logger.debug(f"Checking existing indexes: {indexes}")
-        indexes = {
-            index["name"]: index["key"].keys()
-            for index in indexes
-            if "name" in index and "key" in index
-        }
-        return (
-            (criteria and index_name not in indexes)
-            or (not criteria and index_name in indexes)
-            or (criteria and index_name in indexes and criteria != indexes[index_name])
-            or (unique_criteria and unique_index_name not in indexes)
-            or (not unique_criteria and unique_index_name in indexes)
-            or (
-                unique_criteria
-                and unique_index_name in indexes
-                and unique_criteria != indexes[unique_index_name]
+        changes = cls._index_changes(document)
+        for change in changes:
+            cls.logger.info(
+                f"{'Would ' if dry_run else ''}{change['action']} {change['index']} index on {change['collection']}."
             )
-        )
+        if changes and not dry_run:
+            cls.logger.info("Updating indexes...")
+            collections = {
+                collection.name: collection
+                for collection, _ in cls._expected_indexes(document)
+            }
+            for change in changes:
+                collection = collections[change["collection"]]
+                if change["action"] == "create":
+                    cls._create_index(collection, change["index"])
+                else:
+                    collection.drop_index(change["index"]["name"])
+            cls.logger.info("Indexes updated.")
+        if cls.audit_model:
+            changes += cls.audit_model.update_indexes(document, dry_run)
+        return changes
 
     @classmethod
-    def _create_indexes(cls, index_type: IndexType, document: dict, condition=None):
+    def _expected_indexes(
+        cls, document: dict, condition: dict = None
+    ) -> List[Tuple[pymongo.collection.Collection, List[dict]]]:
         """
-        Create indexes of specified type.
+        Indexes that should exist, per collection.
         :param document: Data specified by the user at the time of the index creation.
+        :param condition: Partial filter expression of unique and other indexes (if supported by the server).
         """
-        try:
+        indexes = []
+        for index_type, prefix in [
+            (IndexType.Unique, "uidx"),
+            (IndexType.Other, "idx"),
+        ]:
             criteria = [
                 (field_name, pymongo.ASCENDING)
                 for field_name in cls._get_index_fields(index_type, document, "")
             ]
             if criteria:
                 # Avoid using auto generated index name that might be too long
-                index_name = (
-                    f"uidx{cls.__collection_name__}"
-                    if index_type == IndexType.Unique
-                    else f"idx{cls.__collection_name__}"
+                index = {
+                    "name": f"{prefix}{cls.__collection_name__}",
+                    "key": criteria,
+                    "unique": index_type == IndexType.Unique,
+                }
+                if condition is not None and cls._server_version >= (3, 2):
+                    index["partialFilterExpression"] = condition
+                indexes.append(index)
+
+        for declared_index in cls.__indexes__:
+            index = {
+                "name": declared_index.name,
+                "key": declared_index.keys,
+                "unique": declared_index.is_unique,
+            }
+            if declared_index.is_sparse:
+                index["sparse"] = True
+            if declared_index.expire_after_seconds is not None:
+                index["expireAfterSeconds"] = declared_index.expire_after_seconds
+            partial_filter = {
+                **(declared_index.partial_filter or {}),
+                **(condition or {}),
+            }
+            if partial_filter and cls._server_version >= (3, 2):
+                index["partialFilterExpression"] = partial_filter
+            indexes.append(index)
+        return [(cls.__collection__, indexes)]
+
+    @classmethod
+    def _check_declared_indexes(cls):
+        """
+        Ensure that indexes declared in __indexes__ can be created.
+        """
+        # Names of indexes created from fields (or for versioning)
+        reserved_names = {
+            f"{prefix}{cls.__collection_name__}"
+            for prefix in ["uidx", "idx", "ridx", "aidx"]
+        }
+        for index in cls.__indexes__:
+            if index.name in reserved_names:
+                raise Exception(
+                    f"{index.name} index name is already used by {cls.__collection_name__} fields."
+                )
+            reserved_names.add(index.name)
+            unknown_field_names = [
+                field_name
+                for field_name in index.field_names()
+                if field_name not in cls._field_names
+            ]
+            if unknown_field_names:
+                raise Exception(
+                    f"{index.name} index refers to unknown fields: {', '.join(unknown_field_names)}."
                 )
-                cls.logger.info(
-                    f"Create {index_name} {index_type.name} index on {cls.__collection_name__} using {criteria} criteria."
+
+    @classmethod
+    def _index_changes(cls, document: dict) -> List[dict]:
+        changes = []
+        for collection, expected_indexes in cls._expected_indexes(document):
+            existing_indexes = {
+                index["name"]: _to_index(index)
+                for index in collection.list_indexes()
+                if "name" in index and "key" in index and index["name"] != "_id_"
+            }
+            kept_names = set()
+            missing_indexes = []
+            for index in expected_indexes:
+                same_name = next(
+                    (
+                        name
+                        for name, existing_index in existing_indexes.items()
+                        if name not in kept_names and _same_index(existing_index, index)
+                    ),
+                    None,
                 )
-                if condition is None or cls._server_version < "3.2":
-                    cls.__collection__.create_index(
-                        criteria, unique=index_type == IndexType.Unique, name=index_name
-                    )
+                if same_name:
+                    kept_names.add(same_name)
                 else:
-                    try:
-                        cls.__collection__.create_index(
-                            criteria,
-                            unique=index_type == IndexType.Unique,
-                            name=index_name,
-                            partialFilterExpression=condition,
-                        )
-                    except pymongo.errors.OperationFailure:
-                        cls.logger.exception(
-                            f"Unable to create a {index_type.name} index."
-                        )
-                        cls.__collection__.create_index(
-                            criteria,
-                            unique=index_type == IndexType.Unique,
-                            name=index_name,
-                        )
+                    missing_indexes.append(index)
+
+            obsolete_indexes = [
+                index
+                for name, index in existing_indexes.items()
+                if name not in kept_names
+            ]
+            missing_keys = [index["key"] for index in missing_indexes]
+            blocking_indexes = [
+                index for index in obsolete_indexes if index["key"] in missing_keys
+            ]
+            changes.extend(
+                {"collection": collection.name, "action": "drop", "index": index}
+                for index in blocking_indexes
+            )
+
+            # Names of obsolete indexes are still in use until they are dropped
+            used_names = set(existing_indexes) - {
+                index["name"] for index in blocking_indexes
+            }
+            for index in missing_indexes:
+                name, suffix = index["name"], 1
+                while name in used_names:
+                    name, suffix = f"{index['name']}_{suffix}", suffix + 1
+                used_names.add(name)
+                changes.append(
+                    {
+                        "collection": collection.name,
+                        "action": "create",
+                        "index": {**index, "name": name},
+                    }
+                )
+
+            changes.extend(
+                {"collection": collection.name, "action": "drop", "index": index}
+                for index in obsolete_indexes
+                if index not in blocking_indexes
+            )
+        return changes
+
+    @classmethod
+    def _create_index(cls, collection: pymongo.collection.Collection, index: dict):
+        options = {"name": index["name"], "unique": index["unique"]}
+        if index.get("sparse"):
+            options["sparse"] = True
+        if "expireAfterSeconds" in index:
+            options["expireAfterSeconds"] = index["expireAfterSeconds"]
+        if cls._server_version < (4, 2):
+            # Do not lock the collection while building the index (default behavior since 4.2)
+            options["background"] = True
+        try:
+            if "partialFilterExpression" in index:
+                try:
+                    collection.create_index(
+                        index["key"],
+                        partialFilterExpression=index["partialFilterExpression"],
+                        **options,
+                    )
+                    return
+                except pymongo.errors.OperationFailure:
+                    cls.logger.exception(f"Unable to create {index['name']} index.")
+            collection.create_index(index["key"], **options)
         except pymongo.errors.DuplicateKeyError:
             cls.logger.exception(
-                f"Duplicate key found for {criteria} criteria "
-                f"when creating a {index_type.name} index."
+                f"Duplicate key found for {index['key']} criteria "
+                f"when creating {index['name']} index."
             )
             raise
 
@@ -205,14 +339,16 @@ class _CRUDModel:
 
         cls.deserialize_query(filters)
 
-        if cls.__collection__.count_documents(filters) > 1:
+        if cls.logger.isEnabledFor(logging.DEBUG):
+            cls.logger.debug(f"Query document matching {filters}...")
+        # Retrieving a second document (if any) is enough to know that there is more than one result
+        documents = list(cls.__collection__.find(filters, limit=2))
+        if len(documents) > 1:
             raise ValidationFailed(
                 filters, message="More than one result: Consider another filtering."
             )
 
-        if cls.logger.isEnabledFor(logging.DEBUG):
-            cls.logger.debug(f"Query document matching {filters}...")
-        document = cls.__collection__.find_one(filters)
+        document = documents[0] if documents else None
         if cls.logger.isEnabledFor(logging.DEBUG):
             cls.logger.debug(
                 f'{"1" if document else "No corresponding"} document retrieved.'
@@ -231,20 +367,66 @@ class _CRUDModel:
         """
         Return all documents matching provided filters.
         """
+        return [cls.serialize(document) for document in cls._find_all(filters)]
+
+    @classmethod
+    def stream(cls, fetch_size: int, **filters) -> Iterator[dict]:
+        """
+        Return all documents matching provided filters, one at a time.
+        Documents are fetched fetch_size at a time.
+        """
+        documents = cls._find_all(filters).batch_size(fetch_size)
+        return (cls.serialize(document) for document in documents)
+
+    @classmethod
+    def get_page(cls, **filters) -> (List[dict], str):
+        """
+        Return a page of documents matching provided filters, ordered by primary keys.
+
+        :returns A tuple containing documents (first item)
+        and the token to provide as after filter to retrieve the next page (second item, None if there is none).
+        """
+        limit = filters.get("limit")
+        documents = [
+            cls.serialize(document) for document in cls._find_all(filters, seek=True)
+        ]
+        if limit and len(documents) == limit:
+            return (
+                documents,
+                to_continuation_token(documents[-1], cls.get_primary_keys()),
+            )
+        return documents, None
+
+    @classmethod
+    def _find_all(cls, filters: dict, seek: bool = False) -> pymongo.cursor.Cursor:
+        """
+        :param seek: True if keyset pagination should be used (ordered by primary keys).
+        Keyset pagination is always used if after filter is provided.
+        """
         limit = filters.pop("limit", 0) or 0
         offset = filters.pop("offset", 0) or 0
+        after = filters.pop("after", None)
         errors = cls.validate_query(filters)
         if errors:
             raise ValidationFailed(filters, errors)
 
         cls.deserialize_query(filters)
 
+        sort = None
+        if seek or after is not None:
+            seek_keys = cls._seek_keys(filters)
+            sort = [(field_name, pymongo.ASCENDING) for field_name in seek_keys]
+            if after is not None:
+                filters = cls._after(filters, after, seek_keys)
+
         if cls.logger.isEnabledFor(logging.DEBUG):
             if filters:
                 cls.logger.debug(f"Query documents matching {filters}...")
             else:
                 cls.logger.debug(f"Query all documents...")
-        documents = cls.__collection__.find(filters, skip=offset, limit=limit)
+        documents = cls.__collection__.find(
+            filters, skip=offset, limit=limit, sort=sort
+        )
         if cls.logger.isEnabledFor(logging.DEBUG):
             nb_documents = (
                 cls.__collection__.count_documents(filters, skip=offset, limit=limit)
@@ -254,7 +436,54 @@ class _CRUDModel:
             cls.logger.debug(
                 f'{nb_documents if nb_documents else "No corresponding"} documents retrieved.'
             )
-        return [cls.serialize(document) for document in documents]
+        return documents
+
+    @classmethod
+    def _seek_keys(cls, filters: dict) -> List[str]:
+        """
+        Return the name of the fields used to order documents for keyset pagination.
+        """
+        seek_keys = cls.get_primary_keys()
+        if not seek_keys:
+            raise ValidationFailed(
+                filters, message="Pagination requires at least one primary key."
+            )
+        return seek_keys
+
+    @classmethod
+    def _after(cls, filters: dict, after: str, seek_keys: List[str]) -> dict:
+        """
+        Return filters selecting documents located after the one identified by this token.
+        """
+        try:
+            values = from_continuation_token(after, seek_keys)
+        except ValueError:
+            values = None
+        fields = {field.name: field for field in cls.__fields__}
+        if values is None or any(
+            fields[field_name].validate_query(values) for field_name in seek_keys
+        ):
+            raise ValidationFailed(
+                {**filters, "after": after}, {"after": ["Invalid continuation token."]}
+            )
+
+        values = {
+            field_name: fields[field_name]._deserialize_value(value)
+            for field_name, value in values.items()
+        }
+        after_filters = {
+            "$or": [
+                {
+                    **{
+                        previous_name: values[previous_name]
+                        for previous_name in seek_keys[:index]
+                    },
+                    field_name: {"$gt": values[field_name]},
+                }
+                for index, field_name in enumerate(seek_keys)
+            ]
+        }
+        return {"$and": [filters, after_filters]} if filters else after_filters
 
     @classmethod
     def get_history(cls, **filters) -> List[dict]:
@@ -264,9 +493,27 @@ class _CRUDModel:
         return cls.get_all(**filters)
 
     @classmethod
-    def rollback_to(cls, **filters) -> int:
+    def get_as_of(cls, revision: int, **filters) -> List[dict]:
+        """
+        Return all documents matching filters, as they were at this revision.
+        As there is no history, current documents are returned.
+        """
+        return cls.get_all(**filters)
+
+    @classmethod
+    def move_expired_versions(cls, batch_size: int = 1000) -> int:
+        """
+        Move expired versions to the history collection.
+        As there is no history, there is nothing to move.
+        """
+        return 0
+
+    @classmethod
+    def rollback_to(cls, dry_run: bool = False, **filters) -> int:
         """
         All records matching the query and valid at specified validity will be considered as valid.
+
+        :param dry_run: Only return the number of records that would be updated.
         :return Number of records updated.
         """
         return 0
@@ -375,9 +622,10 @@ class _CRUDModel:
 
         # Make sure fields that were stored in a previous version of a model are not returned if removed since then
         # It also ensure _id can be skipped unless specified otherwise in the model
-        known_fields = [field.name for field in cls.__fields__]
+        if len(document) == len(cls._field_names):
+            return document
         removed_fields = [
-            field_name for field_name in document if field_name not in known_fields
+            field_name for field_name in document if field_name not in cls._field_names
         ]
         if removed_fields:
             for removed_field in removed_fields:
@@ -398,11 +646,11 @@ class _CRUDModel:
         :raises ValidationFailed in case validation fail.
         :returns The inserted model formatted as a dictionary.
         """
-        errors = cls.validate_insert(document)
+        document, errors = cls._validate_and_deserialize_insert(document)
         if errors:
             raise ValidationFailed(document, errors)
 
-        cls.deserialize_insert(document)
+        cls._auto_increment([document])
         try:
             if cls.logger.isEnabledFor(logging.DEBUG):
                 cls.logger.debug(f"Inserting {document}...")
@@ -429,12 +677,19 @@ class _CRUDModel:
         if not isinstance(documents, list):
             raise ValidationFailed(documents, message="Must be a list.")
 
-        new_documents = copy.deepcopy(documents)
-
-        errors = cls.validate_and_deserialize_insert(new_documents)
+        new_documents = []
+        errors = {}
+        for index, document in enumerate(documents):
+            new_document, document_errors = cls._validate_and_deserialize_insert(
+                document
+            )
+            if document_errors:
+                errors[index] = document_errors
+            new_documents.append(new_document)
         if errors:
             raise ValidationFailed(documents, errors)
 
+        cls._auto_increment(new_documents)
         try:
             if cls.logger.isEnabledFor(logging.DEBUG):
                 cls.logger.debug(f"Inserting {new_documents}...")
@@ -446,111 +701,200 @@ class _CRUDModel:
             raise ValidationFailed(documents, message=str(e.details))
 
     @classmethod
-    def validate_and_deserialize_insert(cls, documents: List[dict]) -> dict:
+    def _validate_and_deserialize_insert(cls, document: dict) -> (dict, dict):
+        """
+        Validate a document insertion request and convert it to a document that can be inserted in Mongo.
+        Every field is validated and deserialized at once (instead of validating every field, then deserializing).
+        Provided document is not modified. Auto incremented fields are not set (see _auto_increment).
+
+        :param document: Mongo to be document.
+        Each entry if composed of a field name associated to a value.
+        :return: A tuple containing the document that can be inserted in Mongo (first item, provided one if invalid)
+        and the validation errors that might have occurred (second item, empty if no error occurred).
+        """
+        if document is None:
+            return document, {"": ["No data provided."]}
+
+        if not isinstance(document, dict):
+            return document, {"": ["Must be a dictionary."]}
+
         errors = {}
 
-        for index, document in enumerate(documents):
-            document_errors = cls.validate_insert(document)
-            if document_errors:
-                errors[index] = document_errors
-                continue
+        # Convert dot notation fields to corresponding dictionary as dot notation is not allowed on insert
+        new_document, unknown_fields = cls._merge_dot_notation(document)
+        for unknown_field in unknown_fields:
+            if not cls._skip_unknown_fields:
+                errors[unknown_field] = ["Unknown field"]
+            elif unknown_field not in cls._skip_log_for_unknown_fields:
+                cls.logger.warning(f"Skipping unknown field {unknown_field}.")
 
-            if (
-                not errors
-            ):  # Skip deserialization in case errors were found as it will stop
-                cls.deserialize_insert(document)
+        for field in cls.__fields__:
+            errors.update(field.validate_and_deserialize_insert(new_document))
 
-        return errors
+        if errors:
+            return document, errors
+
+        return new_document, errors
+
+    @classmethod
+    def _auto_increment(
+        cls, documents: List[dict], reserve: Callable[..., range] = None
+    ):
+        """
+        Set auto incremented fields values within those (valid and deserialized) documents, nested ones included.
+        Values are reserved once per counter (instead of once per document).
+
+        :param reserve: Function reserving counter values (see _reserve).
+        Default to this model one, nested documents use the one of the model storing them.
+        """
+        reserve = reserve or cls._reserve
+        for field in cls._auto_increment_fields:
+            counters = [field.get_counter(document) for document in documents]
+            values = {
+                counter: iter(reserve(*counter, count=counters.count(counter)))
+                for counter in set(counters)
+            }
+            for document, counter in zip(documents, counters):
+                document[field.name] = next(values[counter])
+        for field in cls.__fields__:
+            if isinstance(field, (DictColumn, ListColumn)):
+                field._auto_increment_nested(documents, reserve)
 
     @classmethod
     def validate_insert(cls, document: dict) -> dict:
         """
         Validate a document insertion request.
+        Deprecated: validation and deserialization are now performed at once (see _validate_and_deserialize_insert).
 
-        :param document: Mongo to be document.
+        :param document: Mongo to be document. Provided document is not modified.
         Each entry if composed of a field name associated to a value.
         :return: Validation errors that might have occurred. Empty if no error occurred.
         Entry would be composed of a field name associated to a list of error messages.
         """
-        if document is None:
-            return {"": ["No data provided."]}
-
-        if not isinstance(document, dict):
-            return {"": ["Must be a dictionary."]}
-
-        new_document = copy.deepcopy(document)
-
-        errors = {}
-
-        field_names = [field.name for field in cls.__fields__]
-        unknown_fields = [
-            field_name for field_name in new_document if field_name not in field_names
-        ]
-        for unknown_field in unknown_fields:
-            known_field, field_value = cls._to_known_field(
-                unknown_field, new_document[unknown_field]
-            )
-            if known_field:
-                new_document.setdefault(known_field.name, {}).update(field_value)
-            elif not cls._skip_unknown_fields:
-                errors.update({unknown_field: ["Unknown field"]})
+        warnings.warn(
+            "validate_insert is deprecated, use _validate_and_deserialize_insert instead.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return cls._validate_and_deserialize_insert(document)[1]
 
-        for field in cls.__fields__:
-            errors.update(field.validate_insert(new_document))
+    @classmethod
+    def deserialize_insert(cls, document: dict):
+        """
+        Update this (valid) document values to values that can be inserted in Mongo.
+        Deprecated: validation and deserialization are now performed at once (see _validate_and_deserialize_insert).
 
-        return errors
+        :param document: Document that should be inserted.
+        Each entry if composed of a field name associated to a value.
+        """
+        warnings.warn(
+            "deserialize_insert is deprecated, use _validate_and_deserialize_insert instead.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        new_document, errors = cls._validate_and_deserialize_insert(document)
+        if errors:
+            raise ValidationFailed(document, errors)
+        cls._auto_increment([new_document])
+        document.clear()
+        document.update(new_document)
 
     @classmethod
-    def _remove_dot_notation(cls, document: dict):
+    def _merge_dot_notation(cls, document: dict) -> (dict, List[str]):
         """
-        Update document so that it does not contains dot notation fields.
-        Remove entries for unknown fields.
+        Provide this document without dot notation fields (merged within their dictionary field) and unknown fields.
+        Provided document (and its values) are not modified, only merged dictionaries are new ones.
+
+        :return: A tuple containing the merged document (first item) and the unknown field names (second item).
         """
-        field_names = [field.name for field in cls.__fields__]
-        unknown_fields = [
-            field_name for field_name in document if field_name not in field_names
-        ]
-        for unknown_field in unknown_fields:
+        merged_document = {}
+        dot_notation_fields = []
+        for field_name, value in document.items():
+            if field_name in cls._field_names:
+                merged_document[field_name] = value
+            else:
+                dot_notation_fields.append(field_name)
+
+        unknown_fields = []
+        for field_name in dot_notation_fields:
             known_field, field_value = cls._to_known_field(
-                unknown_field, document[unknown_field]
+                field_name, document[field_name]
             )
-            del document[unknown_field]
             if known_field:
-                document.setdefault(known_field.name, {}).update(field_value)
-            elif unknown_field not in cls._skip_log_for_unknown_fields:
-                cls.logger.warning(f"Skipping unknown field {unknown_field}.")
+                merged_document[known_field.name] = {
+                    **merged_document.get(known_field.name, {}),
+                    **field_value,
+                }
+            else:
+                unknown_fields.append(field_name)
+        return merged_document, unknown_fields
 
     @classmethod
-    def deserialize_insert(cls, document: dict):
+    def _reserve(
+        cls,
+        counter_name: str,
+        counter_category: str = None,
+        count: int = 1,
+        block_size: int = None,
+        after: int = 0,
+    ) -> range:
         """
-        Update this document values to values that can be inserted in Mongo.
-        Remove entries for unknown fields.
-        Convert dot notation fields to corresponding dictionary as dot notation is not allowed on insert.
+        Reserve values of a counter.
+        If counter block size is greater than 1, values are reserved by blocks (at least block size values)
+        and remaining ones are kept by this process for further reservations.
+        As a result, values are unique but not always consecutive.
 
-        :param document: Document that should be inserted.
-        Each entry if composed of a field name associated to a value.
+        :param counter_name: Name of the counter to increment. Will be created at 0 if not existing yet.
+        :param counter_category: Category storing those counters. Default to model table name.
+        :param count: Number of values to reserve.
+        :param block_size: Number of values reserved at once. Default to counter block size of the model.
+        :param after: Reserved values must be greater than this (already reserved) value.
+        A new block is reserved if needed.
+        :return: Reserved values (in ascending order).
         """
-        cls._remove_dot_notation(document)
+        block_size = cls._counter_block_size if block_size is None else block_size
+        if block_size <= 1:
+            last_value = cls._increment(counter_name, counter_category, count)
+            return range(last_value - count + 1, last_value + 1)
+
+        key = cls._counter_block_key(counter_name, counter_category)
+        with _counter_blocks_lock:
+            block = _counter_blocks.get(key, range(0))
+            if len(block) < count or (block and block[0] <= after):
+                # Current block is lost as it cannot be merged with a non consecutive one
+                size = max(block_size, count)
+                last_value = cls._increment(counter_name, counter_category, size)
+                block = range(last_value - size + 1, last_value + 1)
+            _counter_blocks[key] = block[count:]
+            return block[:count]
 
-        for field in cls.__fields__:
-            field.deserialize_insert(document)
-            if field.should_auto_increment:
-                document[field.name] = cls._increment(*field.get_counter(document))
+    @classmethod
+    def _counter_block_key(
+        cls, counter_name: str, counter_category: str = None
+    ) -> Tuple[str, str, str]:
+        return (
+            cls.__counters__.full_name,
+            counter_category if counter_category else cls.__collection__.name,
+            counter_name,
+        )
 
     @classmethod
-    def _increment(cls, counter_name: str, counter_category: str = None) -> int:
+    def _increment(
+        cls, counter_name: str, counter_category: str = None, count: int = 1
+    ) -> int:
         """
-        Increment a counter by one.
+        Increment a counter.
 
         :param counter_name: Name of the counter to increment. Will be created at 0 if not existing yet.
         :param counter_category: Category storing those counters. Default to model table name.
+        :param count: Value to add to the counter. Default to 1.
         :return: New counter value.
         """
         counter_key = {
             "_id": counter_category if counter_category else cls.__collection__.name
         }
         counter_update = {
-            "$inc": {f"{counter_name}.counter": 1},
+            "$inc": {f"{counter_name}.counter": count},
             "$set": {f"{counter_name}.last_update_time": datetime.datetime.utcnow()},
         }
         counter_element = cls.__counters__.find_one_and_update(
@@ -587,13 +931,16 @@ class _CRUDModel:
                 cls._reset_counter(*field.get_counter({}))
 
     @classmethod
-    def _reset_counter(cls, counter_name: str):
+    def _reset_counter(cls, counter_name: str, counter_category: str = None):
         """
         Reset a counter.
 
         :param counter_name: Name of the counter to reset. Will be created at 0 if not existing yet.
+        :param counter_category: Category storing those counters. Default to model table name.
         """
-        counter_key = {"_id": cls.__collection__.name}
+        counter_key = {
+            "_id": counter_category if counter_category else cls.__collection__.name
+        }
         counter_update = {
             "$set": {
                 f"{counter_name}.counter": 0,
@@ -601,7 +948,10 @@ class _CRUDModel:
             }
         }
         cls.__counters__.find_one_and_update(counter_key, counter_update, upsert=True)
-        return
+        with _counter_blocks_lock:
+            _counter_blocks.pop(
+                cls._counter_block_key(counter_name, counter_category), None
+            )
 
     @classmethod
     def update(cls, document: dict) -> (dict, dict):
@@ -615,6 +965,8 @@ class _CRUDModel:
         if errors:
             raise ValidationFailed(document, errors)
 
+        # Deserialization only replaces values, a shallow copy is enough to keep provided document untouched
+        document = dict(document)
         cls.deserialize_update(document)
 
         try:
@@ -643,7 +995,11 @@ class _CRUDModel:
         if not isinstance(documents, list):
             raise ValidationFailed(documents, message="Must be a list.")
 
-        new_documents = copy.deepcopy(documents)
+        # Deserialization only replaces values, a shallow copy is enough to keep provided documents untouched
+        new_documents = [
+            dict(document) if isinstance(document, dict) else document
+            for document in documents
+        ]
 
         errors = cls.validate_and_deserialize_update(new_documents)
         if errors:
@@ -659,7 +1015,7 @@ class _CRUDModel:
                 [cls.serialize(document) for document in previous_documents],
                 [cls.serialize(document) for document in updated_documents],
             )
-        except pymongo.errors.DuplicateKeyError:
+        except (pymongo.errors.DuplicateKeyError, pymongo.errors.BulkWriteError):
             raise ValidationFailed(
                 [cls.serialize(document) for document in documents],
                 message="One document already exists.",
@@ -698,26 +1054,13 @@ class _CRUDModel:
         if not isinstance(document, dict):
             return {"": ["Must be a dictionary."]}
 
-        new_document = copy.deepcopy(document)
+        new_document, unknown_fields = cls._merge_dot_notation(document)
 
         errors = {}
 
-        updated_field_names = [
-            field.name for field in cls.__fields__ if field.name in new_document
-        ]
-        unknown_fields = [
-            field_name
-            for field_name in new_document
-            if field_name not in updated_field_names
-        ]
-        for unknown_field in unknown_fields:
-            known_field, field_value = cls._to_known_field(
-                unknown_field, new_document[unknown_field]
-            )
-            if known_field:
-                new_document.setdefault(known_field.name, {}).update(field_value)
-            elif not cls._skip_unknown_fields:
-                errors.update({unknown_field: ["Unknown field"]})
+        if not cls._skip_unknown_fields:
+            for unknown_field in unknown_fields:
+                errors[unknown_field] = ["Unknown field"]
 
         # Also ensure that primary keys will contain a valid value
         updated_fields = [
@@ -819,8 +1162,7 @@ class _CRUDModel:
     def _insert_many(cls, documents: List[dict]):
         cls.__collection__.insert_many(documents)
         if cls.audit_model:
-            for document in documents:
-                cls.audit_model.audit_add(document)
+            cls.audit_model.audit_add_all(documents)
 
     @classmethod
     def _insert_one(cls, document: dict) -> dict:
@@ -847,23 +1189,48 @@ class _CRUDModel:
 
     @classmethod
     def _update_many(cls, documents: List[dict]) -> (List[dict], List[dict]):
-        previous_documents = []
-        new_documents = []
-        for document in documents:
-            document_keys = cls._to_primary_keys_model(document)
-            previous_document = cls.__collection__.find_one(document_keys)
-            if not previous_document:
-                raise ModelCouldNotBeFound(document_keys)
+        documents_keys = [
+            cls._to_primary_keys_model(document) for document in documents
+        ]
 
-            new_document = cls.__collection__.find_one_and_update(
-                document_keys,
-                {"$set": document},
-                return_document=pymongo.ReturnDocument.AFTER,
+        # Retrieve every previous document at once
+        previous_documents = {
+            cls._to_primary_keys_value(previous_document): previous_document
+            for previous_document in cls.__collection__.find(
+                cls._primary_keys_filter(documents_keys)
             )
+        }
+        for document_keys in documents_keys:
+            if cls._to_primary_keys_value(document_keys) not in previous_documents:
+                raise ModelCouldNotBeFound(document_keys)
+
+        cls.__collection__.bulk_write(
+            [
+                pymongo.UpdateOne(document_keys, {"$set": document})
+                for document, document_keys in zip(documents, documents_keys)
+            ],
+            ordered=True,
+        )
+
+        # Updated documents are computed locally instead of being retrieved again
+        current_documents = dict(previous_documents)
+        updated_keys = set()
+        previous_documents = []
+        new_documents = []
+        for document, document_keys in zip(documents, documents_keys):
+            primary_keys_value = cls._to_primary_keys_value(document_keys)
+            previous_document = current_documents[primary_keys_value]
+            if primary_keys_value in updated_keys:
+                # Serialization modifies documents in place, a returned document must not be shared
+                previous_document = copy.deepcopy(previous_document)
+            new_document = _apply_set(previous_document, document)
+            current_documents[primary_keys_value] = new_document
+            updated_keys.add(primary_keys_value)
             previous_documents.append(previous_document)
             new_documents.append(new_document)
-            if cls.audit_model:
-                cls.audit_model.audit_update(new_document)
+
+        if cls.audit_model:
+            cls.audit_model.audit_update_all(new_documents)
         return previous_documents, new_documents
 
     @classmethod
@@ -876,16 +1243,42 @@ class _CRUDModel:
 
     @classmethod
     def _to_primary_keys_model(cls, document: dict) -> dict:
-        # TODO Compute primary key field names only once
-        primary_key_field_names = [
-            field.name for field in cls.__fields__ if field.is_primary_key
-        ]
         return {
             field_name: value
             for field_name, value in document.items()
-            if field_name in primary_key_field_names
+            if field_name in cls._primary_key_names
         }
 
+    @classmethod
+    def _to_primary_keys_value(cls, document: dict) -> tuple:
+        """
+        Hashable representation of the primary keys of this document.
+        Values are represented as stored by Mongo so that provided and retrieved keys can be compared.
+        """
+        return tuple(
+            _to_stored_value(document.get(field_name))
+            for field_name in cls._primary_key_names
+        )
+
+    @classmethod
+    def _primary_keys_filter(cls, documents_keys: List[dict]) -> dict:
+        """
+        Filter matching every document identified by one of those primary keys.
+
+        :param documents_keys: Primary keys of each document (as returned by _to_primary_keys_model).
+        """
+        if len(cls._primary_key_names) == 1:
+            field_name = cls._primary_key_names[0]
+            return {
+                field_name: {
+                    "$in": [
+                        document_keys.get(field_name)
+                        for document_keys in documents_keys
+                    ]
+                }
+            }
+        return {"$or": documents_keys}
+
     @classmethod
     def description_dictionary(cls) -> Dict[str, str]:
         description = {"collection": cls.__collection_name__}
@@ -894,6 +1287,19 @@ class _CRUDModel:
         return description
 
 
+def _to_version(server_info: dict) -> Tuple[int, ...]:
+    """
+    Server version as a tuple of integers (as "10.0" would be lower than "5.0" if compared as a string).
+    """
+    if "versionArray" in server_info:
+        return tuple(server_info["versionArray"])
+    return tuple(
+        int(part)
+        for part in server_info.get("version", "").split("-")[0].split(".")
+        if part.isdigit()
+    )
+
+
 def _load(
     database_connection_url: str, controllers: Iterable[CRUDController], **kwargs
 ) -> pymongo.database.Database:
@@ -923,7 +1329,7 @@ def _load(
     server_info = client.server_info()
     if server_info:
         logger.debug(f"Server information: {server_info}")
-        _server_versions.setdefault(base.name, server_info.get("version", ""))
+        _server_versions.setdefault(base.name, _to_version(server_info))
     logger.debug(f"Creating models...")
     for controller in controllers:
         link(controller, base)
@@ -989,3 +1395,73 @@ def _check(base: pymongo.database.Database) -> (str, dict):
                 }
             },
         )
+
+
+def _to_stored_value(value):
+    """
+    Convert a value to the value that would be retrieved from Mongo once stored.
+    Dates are stored in UTC (without time zone) and with a millisecond precision.
+    """
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, dict):
+        return {key: _to_stored_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_stored_value(item) for item in value]
+    return value
+
+
+def _apply_set(document: dict, updates: dict) -> dict:
+    """
+    Compute the document resulting from a Mongo $set update, leaving provided document untouched.
+
+    :param document: Document as stored in Mongo.
+    :param updates: Content of the $set operator, fields might use dot notation.
+    :return: A new document (serialization modifies documents in place, so nothing is shared).
+    """
+    new_document = copy.deepcopy(document)
+    for field_name, value in updates.items():
+        *parent_names, last_name = field_name.split(".")
+        parent = new_document
+        for parent_name in parent_names:
+            if not isinstance(parent.get(parent_name), dict):
+                parent[parent_name] = {}
+            parent = parent[parent_name]
+        parent[last_name] = _to_stored_value(copy.deepcopy(value))
+    return new_document
+
+
+def _to_index(index: dict) -> dict:
+    """
+    Convert an index as listed by Mongo to an index as expected by layabase.
+    """
+    converted = {
+        "name": index["name"],
+        "key": [
+            (field_name, direction if isinstance(direction, str) else int(direction))
+            for field_name, direction in index["key"].items()
+        ],
+        "unique": bool(index.get("unique", False)),
+    }
+    if index.get("sparse"):
+        converted["sparse"] = True
+    if "expireAfterSeconds" in index:
+        converted["expireAfterSeconds"] = index["expireAfterSeconds"]
+    if "partialFilterExpression" in index:
+        converted["partialFilterExpression"] = index["partialFilterExpression"]
+    return converted
+
+
+def _same_index(index: dict, other: dict) -> bool:
+    """
+    Compare index definitions (names are not compared).
+    """
+    return (
+        index["key"] == other["key"]
+        and index["unique"] == other["unique"]
+        and index.get("sparse", False) == other.get("sparse", False)
+        and index.get("expireAfterSeconds") == other.get("expireAfterSeconds")
+        and index.get("partialFilterExpression") == other.get("partialFilterExpression")
+    )
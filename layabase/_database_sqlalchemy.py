@@ -1,25 +1,43 @@
 import datetime
 import logging
+import threading
 import urllib.parse
-from typing import List, Dict, Type, Iterable
+import weakref
+from typing import List, Dict, Type, Iterable, Iterator, Union, Callable, Tuple
 import operator
 
 from marshmallow import ValidationError, EXCLUDE
 from marshmallow_sqlalchemy import ModelSchema
 from layaberr import ValidationFailed, ModelCouldNotBeFound
-from sqlalchemy import create_engine, inspect, Column, text, or_, and_
+from sqlalchemy import (
+    create_engine,
+    inspect,
+    Column,
+    text,
+    or_,
+    and_,
+    case,
+    literal_column,
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, exc
+from sqlalchemy.orm import sessionmaker, scoped_session, exc
 from sqlalchemy.orm.query import Query
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.engine.base import Engine
+from sqlalchemy.util import ScopedRegistry
 
 from layabase._exceptions import MultiSchemaNotSupported
+from layabase._pagination import to_continuation_token, from_continuation_token
 from layabase import ComparisonSigns, CRUDController
 
 
 logger = logging.getLogger(__name__)
 
+# Session registry (one session per scope) of every loaded base
+_sessions: Dict[object, scoped_session] = weakref.WeakKeyDictionary()
+
+# Maximum number of parameters that can be sent in a single query (SQLite default limit)
+_max_query_parameters = 999
 
 _operators = {
     ComparisonSigns.Greater: operator.gt,
@@ -34,10 +52,20 @@ class CRUDModel:
     Class providing CRUD helper methods for a SQL Alchemy model.
     _session class property must be specified in Model.
     Calling load_from(...) will provide you one.
+    This session is a registry providing the session of the current scope (thread or request).
     """
 
-    _session = None
+    _session: scoped_session = None
     audit_model = None
+    _schema_class: Type[
+        ModelSchema
+    ] = None  # Created once and for all by _compile_schema
+    _bulk_schema_class: Type[
+        ModelSchema
+    ] = None  # Created once and for all by _compile_schema
+    _schemas: threading.local = None  # Schema instances per thread (load is stateful)
+    _primary_keys: List[str] = []
+    _required_query_fields: List[str] = []
 
     @classmethod
     def _post_init(cls, session):
@@ -58,25 +86,120 @@ class CRUDModel:
         return cls.get_all(**filters)
 
     @classmethod
-    def rollback_to(cls, **filters) -> int:
+    def get_as_of(cls, revision: int, **filters) -> List[dict]:
+        """
+        Return all rows matching filters, as they were at this revision.
+        As there is no history, current rows are returned.
+        """
+        return cls.get_all(**filters)
+
+    @classmethod
+    def move_expired_versions(cls, batch_size: int = 1000) -> int:
+        """
+        Move expired versions to the history collection.
+        As there is no history, there is nothing to move.
+        """
+        return 0
+
+    @classmethod
+    def rollback_to(cls, dry_run: bool = False, **filters) -> int:
         """
         All records matching the query and valid at specified validity will be considered as valid.
 
+        :param dry_run: Only return the number of records that would be updated.
+
         :return Number of records updated.
         """
         return 0
 
+    @classmethod
+    def stream(cls, fetch_size: int, **filters) -> Iterator[dict]:
+        """
+        Return all models formatted as dictionaries, one at a time.
+        A server side cursor is used (if supported) and models are fetched and serialized fetch_size at a time.
+        """
+        query = cls._get_all_query(filters)
+        return cls._stream(
+            query.execution_options(stream_results=True).yield_per(fetch_size),
+            fetch_size,
+        )
+
+    @classmethod
+    def _stream(cls, query: Query, fetch_size: int) -> Iterator[dict]:
+        schema = cls.schema()
+        rows = []
+        try:
+            for row in query:
+                rows.append(row)
+                if len(rows) == fetch_size:
+                    yield from schema.dump(rows, many=True)
+                    rows = []
+            if rows:
+                yield from schema.dump(rows, many=True)
+        except exc.sa_exc.DBAPIError:
+            cls._handle_connection_failure()
+        finally:
+            cls._session.close()
+
+    @classmethod
+    def get_page(cls, **filters) -> (List[dict], str):
+        """
+        Return a page of models formatted as a list of dictionaries.
+        Models are ordered by order_by columns (if any) followed by primary keys.
+
+        :returns A tuple containing models formatted as a list of dictionaries (first item)
+        and the token to provide as after filter to retrieve the next page (second item, None if there is none).
+        """
+        seek_keys = cls._seek_keys(filters)
+        limit = filters.get("limit")
+        rows = cls.schema().dump(
+            cls._fetch_all(cls._get_all_query(filters, seek_keys)), many=True
+        )
+        if limit and len(rows) == limit:
+            return (
+                rows,
+                to_continuation_token(rows[-1], [name for name, _ in seek_keys]),
+            )
+        return rows, None
+
     @classmethod
     def get_all_models(cls, **filters) -> list:
         """
         Return all SQLAlchemy models.
         """
+        return cls._fetch_all(cls._get_all_query(filters))
+
+    @classmethod
+    def _fetch_all(cls, query: Query) -> list:
+        try:
+            result = query.all()
+            cls._session.close()
+            return result
+        except exc.sa_exc.DBAPIError:
+            cls._handle_connection_failure()
+
+    @classmethod
+    def _get_all_query(
+        cls, filters: dict, seek_keys: List[Tuple[str, bool]] = None
+    ) -> Query:
+        """
+        :param seek_keys: Ordering (as returned by _seek_keys) if keyset pagination should be used.
+        Keyset pagination is always used if after filter is provided.
+        """
         cls._check_required_query_fields(filters)
 
         query = cls._session.query(cls)
 
+        if seek_keys is None and filters.get("after") is not None:
+            seek_keys = cls._seek_keys(filters)
+
         order_by = filters.pop("order_by", [])
-        if order_by:
+        after = filters.pop("after", None)
+        if seek_keys:
+            query = query.order_by(*cls._seek_order(seek_keys))
+            if after is not None:
+                query = query.filter(cls._after(filters, after, seek_keys))
+        elif order_by:
             query = query.order_by(
                 *[
                     text(column) if isinstance(column, str) else column
@@ -132,12 +255,105 @@ class CRUDModel:
         if query_offset:
             query = query.offset(query_offset)
 
+        return query
+
+    @classmethod
+    def _seek_keys(cls, filters: dict) -> List[Tuple[str, bool]]:
+        """
+        Return the ordering used by keyset pagination.
+        Requested order_by columns (in ascending order unless followed by desc) then remaining primary keys.
+
+        :return: A list of tuples containing the column (field) name and True if descending.
+        """
+        mapper = inspect(cls)
+        field_names = mapper.column_attrs.keys()
+        seek_keys = []
+        for column in filters.get("order_by") or []:
+            column_name, *direction = str(column).split()
+            direction = [value.lower() for value in direction]
+            if column_name not in field_names or direction not in (
+                [],
+                ["asc"],
+                ["desc"],
+            ):
+                raise ValidationFailed(
+                    filters, {"order_by": [f"{column} cannot be used to paginate."]}
+                )
+            seek_keys.append((column_name, direction == ["desc"]))
+
+        ordered_names = [name for name, _ in seek_keys]
+        for primary_key in mapper.primary_key:
+            name = mapper.get_property_by_column(primary_key).key
+            if name not in ordered_names:
+                seek_keys.append((name, False))
+        return seek_keys
+
+    @classmethod
+    def _is_nullable(cls, name: str) -> bool:
+        return any(
+            column.nullable for column in inspect(cls).get_property(name).columns
+        )
+
+    @classmethod
+    def _seek_order(cls, seek_keys: List[Tuple[str, bool]]) -> list:
+        """
+        Return the ordering criteria corresponding to keyset pagination.
+        NULL values are ordered last (whatever the direction and the database default).
+        """
+        criteria = []
+        for name, descending in seek_keys:
+            column = getattr(cls, name)
+            if cls._is_nullable(name):
+                # A CASE expression as boolean predicates cannot be ordered by every database (Oracle, MSSQL, Sybase)
+                criteria.append(
+                    case(
+                        [(column.is_(None), literal_column("1"))],
+                        else_=literal_column("0"),
+                    )
+                )
+            criteria.append(column.desc() if descending else column)
+        return criteria
+
+    @classmethod
+    def _after(cls, filters: dict, after: str, seek_keys: List[Tuple[str, bool]]):
+        """
+        Return the criterion selecting rows located after the one identified by this token.
+        Expanded as (a > x) OR (a = x AND b > y) as row value comparison is not supported by every database.
+        NULL values being ordered last, (a > x) is expanded as (a > x OR a IS NULL), and nothing is after a NULL value.
+        """
         try:
-            result = query.all()
-            cls._session.close()
-            return result
-        except exc.sa_exc.DBAPIError:
-            cls._handle_connection_failure()
+            serialized_values = from_continuation_token(
+                after, [name for name, _ in seek_keys]
+            )
+            fields = cls.schema().fields
+            values = {
+                name: fields[name].deserialize(value)
+                for name, value in serialized_values.items()
+            }
+        except (ValueError, ValidationError):
+            raise ValidationFailed(
+                {**filters, "after": after}, {"after": ["Invalid continuation token."]}
+            )
+
+        def equals(name: str):
+            column = getattr(cls, name)
+            return column.is_(None) if values[name] is None else column == values[name]
+
+        conditions = []
+        for index, (name, descending) in enumerate(seek_keys):
+            if values[name] is None:
+                continue
+            column = getattr(cls, name)
+            after_value = column < values[name] if descending else column > values[name]
+            if cls._is_nullable(name):
+                after_value = or_(after_value, column.is_(None))
+            conditions.append(
+                and_(
+                    *[equals(previous_name) for previous_name, _ in seek_keys[:index]],
+                    after_value,
+                )
+            )
+        return or_(*conditions)
 
     @classmethod
     def customize_query(cls, query: Query) -> Query:
@@ -190,15 +406,18 @@ class CRUDModel:
         return cls.get(**filters)
 
     @classmethod
-    def add_all(cls, rows: List[dict]) -> List[dict]:
+    def add_all(cls, rows: List[dict], bulk_size: int = None) -> List[dict]:
         """
         Add models formatted as a list of dictionaries.
 
+        :param bulk_size: Insert bulk_size rows at a time (without creating models). Models are created by default.
         :raises ValidationFailed in case Marshmallow validation fail.
         :returns The inserted models formatted as a list of dictionaries.
         """
         if not rows:
             raise ValidationFailed({}, message="No data provided.")
+        if bulk_size:
+            return cls._bulk_add_all(rows, bulk_size)
         try:
             models = cls.schema().load(rows, many=True, session=cls._session)
         except exc.sa_exc.DBAPIError:
@@ -219,6 +438,77 @@ class CRUDModel:
             cls._session.rollback()
             raise
 
+    @classmethod
+    def _bulk_add_all(cls, rows: List[dict], bulk_size: int) -> List[dict]:
+        """
+        Add rows using one INSERT statement (executed many times) per bulk_size rows.
+        Rows are validated at once and are never loaded as models (nor stored in the session identity map).
+        Client side default values are set before insertion. Rows without primary key values are inserted one at a time
+        to retrieve values generated by the database. Other values generated by the database are returned as None.
+        """
+        try:
+            mappings = [
+                cls._with_default_values(mapping)
+                for mapping in cls._bulk_schema().load(
+                    rows, many=True, session=cls._session
+                )
+            ]
+        except exc.sa_exc.DBAPIError:
+            cls._handle_connection_failure()
+        except ValidationError as e:
+            raise ValidationFailed(rows, e.messages)
+        mapper = inspect(cls)
+        primary_key_names = [
+            mapper.get_property_by_column(primary_key).key
+            for primary_key in mapper.primary_key
+        ]
+        try:
+            for start in range(0, len(mappings), bulk_size):
+                bulk = mappings[start : start + bulk_size]
+                # Generated primary keys are needed by the audit and returned to the client
+                cls._session.bulk_insert_mappings(
+                    cls,
+                    bulk,
+                    return_defaults=any(
+                        mapping.get(name) is None
+                        for mapping in bulk
+                        for name in primary_key_names
+                    ),
+                )
+                if cls.audit_model:
+                    cls.audit_model.audit_add_all(bulk)
+            cls._session.commit()
+            # Dump rows with every column, as for a model
+            unset = {name: None for name in mapper.column_attrs.keys()}
+            return cls.schema().dump(
+                [{**unset, **mapping} for mapping in mappings], many=True
+            )
+        except exc.sa_exc.DBAPIError:
+            cls._session.rollback()
+            cls._handle_connection_failure()
+        except Exception:
+            cls._session.rollback()
+            raise
+
+    @classmethod
+    def _with_default_values(cls, row: dict) -> dict:
+        """
+        Set the client side default value of columns that are not provided (as SQLAlchemy would on insert).
+        Default functions requiring the execution context are left to SQLAlchemy.
+        """
+        for attribute in inspect(cls).column_attrs:
+            if attribute.key in row:
+                continue
+            default = attribute.columns[0].default
+            if default is None:
+                continue
+            if default.is_scalar:
+                row[attribute.key] = default.arg
+            # Functions without parameters are wrapped by SQLAlchemy to receive (and ignore) the context
+            elif default.is_callable and hasattr(default.arg, "__wrapped__"):
+                row[attribute.key] = default.arg(None)
+        return row
+
     @classmethod
     def add(cls, row: dict) -> dict:
         """
@@ -260,18 +550,21 @@ class CRUDModel:
         """
         if not rows:
             raise ValidationFailed({}, message="No data provided.")
-        previous_rows = []
-        new_rows = []
-        new_models = []
         for row in rows:
             if not isinstance(row, dict):
                 raise ValidationFailed(row, message="Must be a dictionary.")
-            try:
-                previous_model = cls.schema().get_instance(row)
-            except exc.sa_exc.DBAPIError:
-                cls._handle_connection_failure()
+        try:
+            previous_models = cls._get_instances(rows)
+        except exc.sa_exc.DBAPIError:
+            cls._handle_connection_failure()
+        # Check every row before updating any model
+        for row, previous_model in zip(rows, previous_models):
             if not previous_model:
                 raise ModelCouldNotBeFound(row)
+        previous_rows = []
+        new_rows = []
+        new_models = []
+        for row, previous_model in zip(rows, previous_models):
             previous_row = _model_field_values(previous_model)
             try:
                 new_model = cls.schema().load(
@@ -299,6 +592,73 @@ class CRUDModel:
             cls._session.rollback()
             raise
 
+    @classmethod
+    def _get_instances(cls, rows: List[dict]) -> list:
+        """
+        Return the model corresponding to each row (None if not found or if a primary key is not provided).
+        Models are fetched using one query per chunk of rows (instead of one query per row).
+        Rows that do not exactly match a fetched model are then fetched one at a time,
+        so that the database collation applies (case or accent insensitive matching for instance).
+        """
+        mapper = inspect(cls)
+        primary_keys = [
+            mapper.get_property_by_column(column).key for column in mapper.primary_key
+        ]
+        schema = cls.schema()
+        identities = []
+        for row in rows:
+            if any(row.get(primary_key) is None for primary_key in primary_keys):
+                identities.append(None)
+                continue
+            identity = []
+            for primary_key in primary_keys:
+                try:
+                    identity.append(
+                        schema.fields[primary_key].deserialize(row[primary_key])
+                    )
+                except ValidationError as e:
+                    raise ValidationFailed(row, {primary_key: e.messages})
+            identities.append(tuple(identity))
+
+        requested = list({identity for identity in identities if identity})
+        models = {}
+        chunk_size = max(1, _max_query_parameters // len(primary_keys))
+        for start in range(0, len(requested), chunk_size):
+            chunk = requested[start : start + chunk_size]
+            if len(primary_keys) == 1:
+                condition = getattr(cls, primary_keys[0]).in_(
+                    [identity[0] for identity in chunk]
+                )
+            else:
+                condition = or_(
+                    *[
+                        and_(
+                            *[
+                                getattr(cls, primary_key) == value
+                                for primary_key, value in zip(primary_keys, identity)
+                            ]
+                        )
+                        for identity in chunk
+                    ]
+                )
+            for model in cls._session.query(cls).filter(condition):
+                models[mapper.identity_key_from_instance(model)[1]] = model
+
+        for identity in requested:
+            if identity not in models:
+                models[identity] = (
+                    cls._session.query(cls)
+                    .filter(
+                        *[
+                            getattr(cls, primary_key) == value
+                            for primary_key, value in zip(primary_keys, identity)
+                        ]
+                    )
+                    .one_or_none()
+                )
+
+        return [models.get(identity) if identity else None for identity in identities]
+
     @classmethod
     def update(cls, row: dict) -> (dict, dict):
         """
@@ -357,8 +717,9 @@ class CRUDModel:
                     else:
                         query = query.filter(getattr(cls, column_name) == value)
             if cls.audit_model:
-                cls.audit_model.audit_remove(**filters)
-            nb_removed = query.delete(synchronize_session="fetch")
+                cls.audit_model.audit_remove(query)
+            # Removed models are not looked up in the session, they will be expired on commit anyway
+            nb_removed = query.delete(synchronize_session=False)
             cls._session.commit()
             return nb_removed
         except exc.sa_exc.DBAPIError:
@@ -371,46 +732,46 @@ class CRUDModel:
     @classmethod
     def schema(cls) -> ModelSchema:
         """
-        Create a new Marshmallow SQL Alchemy schema instance.
-        TODO Remove the need for a new schema instance every time. Create it once and for all
+        Provide the Marshmallow SQL Alchemy schema instance of this model.
+        Schema class is created only once (when model is created).
+        As schema instance keeps loading state (session and instance), one instance is provided per thread.
 
-        :return: The newly created schema instance.
+        :return: The schema instance for the current thread.
         """
+        schema = getattr(cls._schemas, "schema", None)
+        if schema is None:
+            schema = cls._schema_class()
+            cls._schemas.schema = schema
+        schema.session = cls._session
+        return schema
 
-        class Schema(ModelSchema):
-            class Meta:
-                model = cls
-                ordered = True
-                unknown = EXCLUDE
+    @classmethod
+    def _bulk_schema(cls) -> ModelSchema:
+        """
+        Provide the Marshmallow SQL Alchemy schema instance loading rows as dictionaries (instead of models).
 
-        return Schema(session=cls._session)
+        :return: The bulk schema instance for the current thread.
+        """
+        schema = getattr(cls._schemas, "bulk_schema", None)
+        if schema is None:
+            schema = cls._bulk_schema_class()
+            cls._schemas.bulk_schema = schema
+        schema.session = cls._session
+        return schema
 
     @classmethod
     def get_primary_keys(cls) -> List[str]:
-        # TODO Replace with marshmallow_sqlalchemy.fields.get_primary_keys(cls)
-        return [
-            marshmallow_field.name
-            for marshmallow_field in cls.schema().fields.values()
-            if marshmallow_field.required
-        ]
+        return cls._primary_keys
 
     @classmethod
     def _check_required_query_fields(cls, filters):
-        for required_field in cls._get_required_query_fields():
+        for required_field in cls._required_query_fields:
             if required_field not in filters:
                 raise ValidationFailed(
                     filters,
                     errors={required_field: ["Missing data for required field."]},
                 )
 
-    @classmethod
-    def _get_required_query_fields(cls) -> List[str]:
-        return [
-            marshmallow_field.name
-            for marshmallow_field in cls.schema().fields.values()
-            if marshmallow_field.metadata.get("required_on_query", False)
-        ]
-
     @classmethod
     def description_dictionary(cls) -> Dict[str, str]:
         description = {"table": cls.__tablename__}
@@ -429,7 +790,48 @@ class CRUDModel:
         return [field.name for field in cls.schema().fields.values()]
 
 
+def _compile_schema(model: Type[CRUDModel]):
+    """
+    Create the Marshmallow SQL Alchemy schema class of this model (and everything that can be deduced from it).
+    Converting SQL Alchemy columns to Marshmallow fields is costly, so this is only performed once per model.
+    """
+
+    crud_model = model
+
+    class Schema(ModelSchema):
+        class Meta:
+            model = crud_model
+            ordered = True
+            unknown = EXCLUDE
+
+    class BulkSchema(Schema):
+        def make_instance(self, data, **kwargs):
+            # Overriding post_load hook without decorator disables it: loaded data is kept as is
+            return data
+
+    model._schema_class = Schema
+    model._bulk_schema_class = BulkSchema
+    model._schemas = threading.local()
+
+    marshmallow_fields = Schema().fields.values()
+    # TODO Replace with marshmallow_sqlalchemy.fields.get_primary_keys(cls)
+    model._primary_keys = [
+        marshmallow_field.name
+        for marshmallow_field in marshmallow_fields
+        if marshmallow_field.required
+    ]
+    model._required_query_fields = [
+        marshmallow_field.name
+        for marshmallow_field in marshmallow_fields
+        if marshmallow_field.metadata.get("required_on_query", False)
+    ]
+
+
 def _create_model(controller: CRUDController, base) -> Type[CRUDModel]:
+    if controller._model:
+        # Do not leave the background audit writer of a previous link running
+        controller.close_audit()
+
     model: Type[CRUDModel] = type(
         f"{controller.table_or_collection.__name__}_SQLAlchemyModel",
         (controller.table_or_collection, CRUDModel, base),
@@ -461,6 +863,19 @@ def _create_model(controller: CRUDController, base) -> Type[CRUDModel]:
             (_create_from(model), table_copy, CRUDModel, base),
             {"__tablename__": f"audit_{controller.table_or_collection.__tablename__}"},
         )
+        _compile_schema(model.audit_model)
+        if controller.audit_queue_size:
+            from layabase._audit import AuditWriter
+
+            model.audit_model._writer = AuditWriter(
+                model.audit_model._write,
+                controller.audit_queue_size,
+                controller.audit_batch_size,
+                controller.audit_flush_interval,
+                name=model.audit_model.__tablename__,
+            )
+
+    _compile_schema(model)
 
     controller._model_description_dictionary = model.description_dictionary()
 
@@ -477,12 +892,18 @@ def _load(
     :param controllers: List of all CRUDController-like instances (Mandatory).
     :param pool_recycle: Number of seconds to wait before recycling a connection pool. Default value is 60.
     :param base_parameters: Dictionary containing the parameters that will be sent for base creation.
+    :param session_scope: How sessions are shared. Default value is "thread".
+     - "thread": One session per thread.
+     - "request": One session per Flask request (one session per thread outside of a request).
+     Session is closed once the request is garbage collected if layabase.teardown was not called.
+     - A function without parameters returning a hashable identifying the current scope.
     :return SQLAlchemy base.
     """
     database_connection_url = _clean_database_url(database_connection_url)
     logger.info(f"Connecting to {database_connection_url}...")
     logger.debug("Creating engine...")
     base_parameters = kwargs.pop("base_parameters", None) or {}
+    session_scope = _to_scope_function(kwargs.pop("session_scope", "thread"))
     if _in_memory(database_connection_url):
         engine = create_engine(
             database_connection_url,
@@ -516,14 +937,86 @@ def _load(
                 )
         base.metadata.create_all(bind=engine)
         base.metadata.tables = all_tables_and_views
-    logger.debug("Creating session...")
-    session = sessionmaker(bind=engine)()
+    logger.debug("Creating session registry...")
+    session = scoped_session(sessionmaker(bind=engine), scopefunc=session_scope)
+    if session_scope is _current_request:
+        # Release sessions of requests that were not torn down
+        session.registry = _WeakScopedRegistry(session.session_factory, session_scope)
+    _sessions[base] = session
+    if any(
+        model_class.audit_model and model_class.audit_model._writer
+        for model_class in model_classes
+    ):
+        from layabase._audit_sqlalchemy import _listen_to_transactions
+
+        _listen_to_transactions(session)
     logger.info(f"Connected to {database_connection_url}.")
     for model_class in model_classes:
         model_class._post_init(session)
     return base
 
 
+def _to_scope_function(session_scope: Union[str, Callable]) -> Union[Callable, None]:
+    """
+    Return the function identifying the current session scope.
+
+    :param session_scope: "thread", "request" or a function without parameters.
+    :return: None in case session is thread scoped (SQLAlchemy default).
+    """
+    if callable(session_scope):
+        return session_scope
+    if session_scope == "thread":
+        return None
+    if session_scope == "request":
+        return _current_request
+    raise Exception(
+        f'session_scope should be "thread", "request" or a function. Received {session_scope}.'
+    )
+
+
+def _current_request():
+    """
+    Identify the current Flask request (or the current thread if there is no request).
+    Request (or thread) itself is used (not its id) as ids can be reused once a request is garbage collected.
+    """
+    try:
+        import flask
+
+        return flask.request._get_current_object()
+    except (ImportError, RuntimeError):  # Flask is not installed or there is no request
+        return threading.current_thread()
+
+
+class _WeakScopedRegistry(ScopedRegistry):
+    """
+    Session registry that does not keep a reference to the object identifying the scope (request or thread).
+    Session of a scope is closed (releasing its connection) once this object is garbage collected,
+    in case it was not removed beforehand (using layabase.teardown).
+    """
+
+    def __init__(self, createfunc, scopefunc):
+        super().__init__(createfunc, scopefunc)
+        self.registry = weakref.WeakKeyDictionary()
+
+    def __call__(self):
+        key = self.scopefunc()
+        try:
+            return self.registry[key]
+        except KeyError:
+            session = self.registry.setdefault(key, self.createfunc())
+            weakref.finalize(key, session.close)
+            return session
+
+
+def _teardown(base) -> None:
+    """
+    Close the session of the current scope and release its connection to the pool.
+    """
+    session = _sessions.get(base)
+    if session:
+        session.remove()
+
+
 def _reset(base) -> None:
     """
     If the database was already created, then drop all tables and recreate them all.
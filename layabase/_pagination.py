@@ -0,0 +1,29 @@
+import base64
+import json
+from typing import List
+
+
+def to_continuation_token(row_or_document: dict, field_names: List[str]) -> str:
+    """
+    Create an opaque token identifying the position of this row or document.
+
+    :param row_or_document: Last row or document of a page (as returned to the client).
+    :param field_names: Name of the fields used to order the rows or documents.
+    """
+    values = {field_name: row_or_document[field_name] for field_name in field_names}
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def from_continuation_token(token: str, field_names: List[str]) -> dict:
+    """
+    Extract position from a token created by to_continuation_token.
+
+    :param token: Opaque token as provided by the client.
+    :param field_names: Name of the fields used to order the rows or documents.
+    :return: Dictionary where keys are field names and values are their (serialized) value.
+    :raises ValueError in case token is invalid or does not correspond to the requested ordering.
+    """
+    values = json.loads(base64.urlsafe_b64decode(str(token).encode()))
+    if not isinstance(values, dict) or list(values) != field_names:
+        raise ValueError(f"{token} does not correspond to {field_names}.")
+    return values
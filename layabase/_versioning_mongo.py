@@ -1,16 +1,28 @@
+import itertools
 import logging
-from typing import List, Dict
+from typing import List, Dict, Iterator, Iterable, Callable, Tuple
 
 import pymongo
+import pymongo.collection
 from layaberr import ValidationFailed, ModelCouldNotBeFound
 
 from layabase._database_mongo import _CRUDModel
-from layabase.mongo import Column, IndexType
+from layabase.mongo import Column, IndexType, RevisionScope
 
 logger = logging.getLogger(__name__)
 
 REVISION_COUNTER = ("revision", "shared")
 
+# Name of the fields (added to those of the model) used to store expired versions as deltas
+# List of the fields that were not set in the expired version (also identifies a delta)
+_DELTA = "_delta"
+# Number of delta versions directly preceding this valid version
+_DELTAS = "_deltas"
+# Position of a reconstructed version while filtering reconstructed versions
+_POSITION = "_position"
+# Maximum number of versions reconstructed at once
+_RECONSTRUCTION_BATCH = 1000
+
 
 class VersionedCRUDModel(_CRUDModel):
     """
@@ -18,6 +30,9 @@ class VersionedCRUDModel(_CRUDModel):
     It is mandatory for at least one field to be a unique index.
     """
 
+    # Collection storing expired versions, expired versions are kept alongside valid ones by default
+    __history__: pymongo.collection.Collection = None
+
     valid_since_revision = Column(
         int, description="Record is valid since this revision (included)."
     )
@@ -27,25 +42,212 @@ class VersionedCRUDModel(_CRUDModel):
         description="Record is valid until this revision (excluded).",
     )
 
+    # Store a full copy of every expired version by default
+    _snapshot_interval: int = 1
+    # Name and category of the counter providing revisions
+    _revision_counter = REVISION_COUNTER
+    # Revisions are reserved when needed by default
+    _revision_block_size: int = 1
+
+    def __init_subclass__(
+        cls,
+        base: pymongo.database.Database = None,
+        history_collection: bool = False,
+        history_snapshot_interval: int = 1,
+        revision_scope: RevisionScope = RevisionScope.Shared,
+        revision_block_size: int = 1,
+        **kwargs,
+    ):
+        if revision_block_size > 1 and revision_scope != RevisionScope.Collection:
+            # Revisions of a shared counter would not be chronological across collections (and processes)
+            raise Exception(
+                "Revisions can only be reserved by blocks with a revision scope per collection."
+            )
+        if history_collection and base is not None:
+            cls.__history__ = base[f"{cls.__collection_name__}_history"]
+        cls._snapshot_interval = history_snapshot_interval
+        cls._revision_counter = (
+            ("revision", f"{cls.__collection_name__}_revision")
+            if revision_scope == RevisionScope.Collection
+            else REVISION_COUNTER
+        )
+        cls._revision_block_size = revision_block_size
+        super().__init_subclass__(base=base, **kwargs)
+
+    @classmethod
+    def move_expired_versions(cls, batch_size: int = 1000) -> int:
+        """
+        Move expired versions stored in the collection (history collection not used at the time) to the history collection.
+        Versions are moved by batches (inserted in the history collection, then removed from the collection),
+        an interrupted move can be resumed by calling this method again.
+
+        :param batch_size: Maximum number of expired versions moved at once.
+        :return: Number of expired versions moved.
+        """
+        if cls.__history__ is None:
+            return 0
+        expired = {cls.valid_until_revision.name: {"$ne": -1}}
+        nb_moved = 0
+        while True:
+            expired_documents = list(cls.__collection__.find(expired, limit=batch_size))
+            if not expired_documents:
+                break
+            # Upsert so that versions already moved by an interrupted migration are not duplicated
+            cls.__history__.bulk_write(
+                [
+                    pymongo.ReplaceOne(
+                        {"_id": expired_document["_id"]}, expired_document, upsert=True
+                    )
+                    for expired_document in expired_documents
+                ]
+            )
+            cls.__collection__.delete_many(
+                {
+                    "_id": {
+                        "$in": [
+                            expired_document["_id"]
+                            for expired_document in expired_documents
+                        ]
+                    }
+                }
+            )
+            nb_moved += len(expired_documents)
+        if nb_moved:
+            cls.logger.info(
+                f"{nb_moved} expired versions moved to {cls.__history__.name}."
+            )
+        return nb_moved
+
+    @classmethod
+    def _new_revision(cls, latest_revision: Callable[[], int] = None) -> int:
+        """
+        Reserve the revision of a modification.
+
+        :param latest_revision: Function returning the highest revision of the modified documents.
+        Only called when revisions are reserved by blocks as revisions reserved by this process
+        might be lower than revisions used by another one in the meantime.
+        """
+        if cls._revision_block_size <= 1:
+            return cls._increment(*cls._revision_counter)
+
+        return cls._reserve(
+            *cls._revision_counter,
+            block_size=cls._revision_block_size,
+            after=latest_revision() if latest_revision else 0,
+        )[0]
+
+    @classmethod
+    def _latest_revision(cls, filters: dict) -> int:
+        """
+        Highest revision of versions matching filters (0 if there is no such version).
+        """
+        latest_revision = 0
+        for collection in cls._versions_collections():
+            for revisions in collection.aggregate(
+                [
+                    {"$match": filters},
+                    {
+                        "$group": {
+                            "_id": None,
+                            "since": {"$max": f"${cls.valid_since_revision.name}"},
+                            "until": {"$max": f"${cls.valid_until_revision.name}"},
+                        }
+                    },
+                ]
+            ):
+                latest_revision = max(
+                    latest_revision, revisions["since"] or 0, revisions["until"] or 0
+                )
+        return latest_revision
+
+    @classmethod
+    def _expired_collection(cls) -> pymongo.collection.Collection:
+        """
+        Collection storing expired versions.
+        """
+        return cls.__history__ if cls.__history__ is not None else cls.__collection__
+
+    @classmethod
+    def _check_declared_indexes(cls):
+        super()._check_declared_indexes()
+        for index in cls.__indexes__:
+            # Mongo refuses sparse partial indexes (every index only applies to valid versions)
+            if index.is_sparse:
+                raise Exception(
+                    f"{index.name} index cannot be sparse as {cls.__collection_name__} is versioned."
+                )
+
+    @classmethod
+    def _expected_indexes(
+        cls, document: dict, condition: dict = None
+    ) -> List[Tuple[pymongo.collection.Collection, List[dict]]]:
+        """
+        Indexes that should exist, per collection (including revision related ones).
+        Unique and other indexes only apply to valid versions.
+        :param document: Data specified by the user at the time of the index creation.
+        """
+        [(collection, indexes)] = super()._expected_indexes(
+            document, {cls.valid_until_revision.name: {"$lt": 0}}
+        )
+        expected_indexes = [(collection, indexes)]
+        if cls.__history__ is not None:
+            expected_indexes.append((cls.__history__, []))
+
+        for collection, indexes in expected_indexes:
+            if collection is cls._expired_collection():
+                indexes.append(
+                    {
+                        "name": f"ridx{cls.__collection_name__}",
+                        "key": cls._revision_index_criteria(),
+                        "unique": False,
+                    }
+                )
+            indexes.append(
+                {
+                    "name": f"aidx{cls.__collection_name__}",
+                    "key": cls._as_of_index_criteria(),
+                    "unique": False,
+                }
+            )
+        return expected_indexes
+
+    @classmethod
+    def _versions_collections(cls) -> List[pymongo.collection.Collection]:
+        """
+        Collections storing versions (valid ones first).
+        """
+        if cls.__history__ is None:
+            return [cls.__collection__]
+        return [cls.__collection__, cls.__history__]
+
+    @classmethod
+    def _as_of_index_criteria(cls) -> List[tuple]:
+        """
+        Criteria of the index allowing to retrieve versions valid at a given revision.
+        """
+        return [
+            (cls.valid_until_revision.name, pymongo.ASCENDING),
+            (cls.valid_since_revision.name, pymongo.ASCENDING),
+        ]
+
     @classmethod
-    def update_indexes(cls, document: dict = None):
+    def _revision_index_criteria(cls) -> List[tuple]:
         """
-        Drop all indexes and recreate them.
-        As advised in https://docs.mongodb.com/manual/tutorial/manage-indexes/#modify-an-index
+        Criteria of the index allowing to retrieve the last revision of a document.
         """
-        if cls._check_indexes(document):
-            logger.info("Updating indexes Versioning...")
-            cls.__collection__.drop_indexes()
-            condition = {"valid_until_revision": {"$lt": 0}}
-            cls._create_indexes(IndexType.Unique, document, condition)
-            cls._create_indexes(IndexType.Other, document, condition)
-            logger.info("Indexes updated.")
-            if cls.audit_model:
-                cls.audit_model.update_indexes(document)
+        return [
+            *[(field_name, pymongo.ASCENDING) for field_name in cls._primary_key_names],
+            (cls.valid_since_revision.name, pymongo.DESCENDING),
+        ]
 
     @classmethod
     def _insert_one(cls, document: dict) -> dict:
-        revision = cls._increment(*REVISION_COUNTER)
+        # Document might have been removed (by another process)
+        revision = cls._new_revision(
+            lambda: cls._latest_revision(
+                cls._primary_keys_filter([cls._to_primary_keys_model(document)])
+            )
+        )
         document[cls.valid_since_revision.name] = revision
         document[cls.valid_until_revision.name] = -1
         cls.__collection__.insert_one(document)
@@ -55,7 +257,14 @@ class VersionedCRUDModel(_CRUDModel):
 
     @classmethod
     def _insert_many(cls, documents: List[dict]):
-        revision = cls._increment(*REVISION_COUNTER)
+        # Documents might have been removed (by another process)
+        revision = cls._new_revision(
+            lambda: cls._latest_revision(
+                cls._primary_keys_filter(
+                    [cls._to_primary_keys_model(document) for document in documents]
+                )
+            )
+        )
         for document in documents:
             document[cls.valid_since_revision.name] = revision
             document[cls.valid_until_revision.name] = -1
@@ -73,11 +282,13 @@ class VersionedCRUDModel(_CRUDModel):
         if not previous_document:
             raise ModelCouldNotBeFound(document_keys)
 
-        revision = cls._increment(*REVISION_COUNTER)
+        revision = cls._new_revision(
+            lambda: previous_document[cls.valid_since_revision.name]
+        )
 
         # Set previous version as expired (insert previous as expired)
-        cls.__collection__.insert_one(
-            {**previous_document, cls.valid_until_revision.name: revision}
+        cls._expired_collection().insert_one(
+            cls._to_expired(previous_document, document, revision)
         )
 
         # Update valid version (update previous)
@@ -94,38 +305,294 @@ class VersionedCRUDModel(_CRUDModel):
 
     @classmethod
     def _update_many(cls, documents: List[dict]) -> (List[dict], List[dict]):
-        previous_documents = []
-        new_documents = []
-        revision = cls._increment(*REVISION_COUNTER)
-        for document in documents:
-            document_keys = cls._to_primary_keys_model(document)
-            document_keys[cls.valid_until_revision.name] = -1
-            previous_document = cls.__collection__.find_one(
-                document_keys, projection={"_id": False}
+        documents_keys = [
+            cls._to_primary_keys_model(document) for document in documents
+        ]
+        valid = {cls.valid_until_revision.name: -1}
+
+        # Retrieve every valid version at once
+        previous_documents = {
+            cls._to_primary_keys_value(previous_document): previous_document
+            for previous_document in cls.__collection__.find(
+                {**cls._primary_keys_filter(documents_keys), **valid},
+                projection={"_id": False},
+            )
+        }
+        for document_keys in documents_keys:
+            if cls._to_primary_keys_value(document_keys) not in previous_documents:
+                raise ModelCouldNotBeFound({**document_keys, **valid})
+
+        revision = cls._new_revision(
+            lambda: max(
+                previous_document[cls.valid_since_revision.name]
+                for previous_document in previous_documents.values()
             )
-            if not previous_document:
-                raise ModelCouldNotBeFound(document_keys)
+        )
 
+        expired_documents = []
+        requests = []
+        for document, document_keys in zip(documents, documents_keys):
+            previous_document = previous_documents[
+                cls._to_primary_keys_value(document_keys)
+            ]
             # Set previous version as expired (insert previous as expired)
-            cls.__collection__.insert_one(
-                {**previous_document, cls.valid_until_revision.name: revision}
+            expired_documents.append(
+                cls._to_expired(previous_document, document, revision)
             )
 
             # Update valid version (update previous)
             document[cls.valid_since_revision.name] = revision
             document[cls.valid_until_revision.name] = -1
-            new_document = cls.__collection__.find_one_and_update(
-                document_keys,
-                {"$set": document},
-                return_document=pymongo.ReturnDocument.AFTER,
+            requests.append(
+                pymongo.UpdateOne({**document_keys, **valid}, {"$set": document})
             )
 
-            previous_documents.append(previous_document)
-            new_documents.append(new_document)
+        if cls.__history__ is None:
+            requests = [
+                *[pymongo.InsertOne(expired) for expired in expired_documents],
+                *requests,
+            ]
+        else:
+            cls.__history__.insert_many(expired_documents)
+        cls.__collection__.bulk_write(requests, ordered=True)
+
+        new_documents = {
+            cls._to_primary_keys_value(new_document): new_document
+            for new_document in cls.__collection__.find(
+                {**cls._primary_keys_filter(documents_keys), **valid}
+            )
+        }
 
         if cls.audit_model:
             cls.audit_model.audit_update(revision)
-        return previous_documents, new_documents
+        return (
+            [
+                previous_documents[cls._to_primary_keys_value(document_keys)]
+                for document_keys in documents_keys
+            ],
+            [
+                new_documents[cls._to_primary_keys_value(document_keys)]
+                for document_keys in documents_keys
+            ],
+        )
+
+    @classmethod
+    def _to_expired(
+        cls, previous_document: dict, document: dict, revision: int
+    ) -> dict:
+        """
+        Provide the previous version as it should be stored once expired by this update.
+        Only updated fields are stored unless a full snapshot is required by the snapshot interval.
+
+        :param previous_document: Valid version (as stored) before the update.
+        :param document: Update that will be applied on previous version (number of deltas will be added).
+        :param revision: Revision of the update.
+        """
+        if cls._snapshot_interval <= 1:
+            return {**previous_document, cls.valid_until_revision.name: revision}
+
+        nb_deltas = previous_document.get(_DELTAS, 0) + 1
+        if nb_deltas >= cls._snapshot_interval:
+            document[_DELTAS] = 0
+            expired_document = {
+                **previous_document,
+                cls.valid_until_revision.name: revision,
+            }
+            expired_document.pop(_DELTAS, None)
+            return expired_document
+
+        document[_DELTAS] = nb_deltas
+        updated_field_names = {
+            field_name.split(".", 1)[0] for field_name in document
+        } - {cls.valid_since_revision.name, cls.valid_until_revision.name, _DELTAS}
+        return {
+            **cls._to_primary_keys_model(previous_document),
+            **{
+                field_name: previous_document[field_name]
+                for field_name in updated_field_names
+                if field_name in previous_document
+            },
+            cls.valid_since_revision.name: previous_document[
+                cls.valid_since_revision.name
+            ],
+            cls.valid_until_revision.name: revision,
+            _DELTA: [
+                field_name
+                for field_name in updated_field_names
+                if field_name not in previous_document
+            ],
+        }
+
+    @classmethod
+    def _find_versions(
+        cls,
+        collection: pymongo.collection.Collection,
+        filters: dict,
+        sort: list = None,
+        limit: int = 0,
+        projection: dict = None,
+    ) -> Iterable[dict]:
+        """
+        Provide versions matching filters, expired versions stored as deltas being reconstructed.
+        """
+        if cls._snapshot_interval <= 1:
+            return collection.find(
+                filters, sort=sort, limit=limit, projection=projection
+            )
+
+        # Full versions are filtered by Mongo, deltas only contain primary keys, revisions and updated fields
+        stored_field_names = [
+            *cls._primary_key_names,
+            cls.valid_since_revision.name,
+            cls.valid_until_revision.name,
+        ]
+        stored_filters = {
+            field_name: value
+            for field_name, value in filters.items()
+            if field_name in stored_field_names
+        }
+        other_filters = {
+            field_name: value
+            for field_name, value in filters.items()
+            if field_name not in stored_field_names
+        }
+        if not other_filters:
+            return cls._reconstruct(
+                list(
+                    collection.find(
+                        filters, sort=sort, limit=limit, projection=projection
+                    )
+                ),
+                projection,
+            )
+
+        versions = collection.find(
+            {
+                "$or": [
+                    {**filters, _DELTA: {"$exists": False}},
+                    {**stored_filters, _DELTA: {"$exists": True}},
+                ]
+            },
+            sort=sort,
+            projection=projection,
+        )
+        matching_versions = []
+        while not limit or len(matching_versions) < limit:
+            batch_size = (
+                limit - len(matching_versions) if limit else _RECONSTRUCTION_BATCH
+            )
+            batch = list(itertools.islice(versions, batch_size))
+            if not batch:
+                break
+            matching_versions.extend(
+                cls._matching_deltas(collection, batch, other_filters, projection)
+            )
+        return matching_versions[:limit] if limit else matching_versions
+
+    @classmethod
+    def _matching_deltas(
+        cls,
+        collection: pymongo.collection.Collection,
+        versions: List[dict],
+        filters: dict,
+        projection: dict,
+    ) -> List[dict]:
+        """
+        Reconstruct deltas and only keep those matching filters (other versions are already matching).
+        Reconstructed versions are filtered by Mongo (provided as literal documents of an aggregation).
+        """
+        positions = [
+            position for position, version in enumerate(versions) if _DELTA in version
+        ]
+        if not positions:
+            return versions
+
+        reconstructed = cls._reconstruct(versions, projection)
+        matching_positions = {
+            matching[_POSITION]
+            for matching in collection.aggregate(
+                [
+                    {"$limit": 1},
+                    {
+                        "$project": {
+                            "_id": False,
+                            _POSITION: {
+                                "$literal": [
+                                    {**reconstructed[position], _POSITION: position}
+                                    for position in positions
+                                ]
+                            },
+                        }
+                    },
+                    {"$unwind": f"${_POSITION}"},
+                    {"$replaceRoot": {"newRoot": f"${_POSITION}"}},
+                    {"$match": filters},
+                    {"$project": {"_id": False, _POSITION: True}},
+                ]
+            )
+        }
+        return [
+            version
+            for position, version in enumerate(reconstructed)
+            if _DELTA not in versions[position] or position in matching_positions
+        ]
+
+    @classmethod
+    def _reconstruct(cls, versions: List[dict], projection: dict) -> List[dict]:
+        """
+        Replace versions stored as deltas by the full version.
+        """
+        deltas = [version for version in versions if _DELTA in version]
+        if not deltas:
+            return versions
+
+        # Every delta is followed by the version it was updated to, up to a full version
+        newer_versions_filter = {
+            **cls._primary_keys_filter(
+                [cls._to_primary_keys_model(delta) for delta in deltas]
+            ),
+            cls.valid_since_revision.name: {
+                "$gte": min(delta[cls.valid_until_revision.name] for delta in deltas)
+            },
+        }
+        newer_versions = {
+            (
+                cls._to_primary_keys_value(version),
+                version[cls.valid_since_revision.name],
+            ): version
+            for collection in cls._versions_collections()
+            for version in collection.find(newer_versions_filter, projection=projection)
+        }
+
+        def full(version: dict) -> dict:
+            if _DELTA not in version:
+                return version
+            next_version = newer_versions.get(
+                (
+                    cls._to_primary_keys_value(version),
+                    version[cls.valid_until_revision.name],
+                )
+            )
+            if next_version is None:
+                raise Exception(
+                    f"Version following {version} cannot be found in {cls.__collection_name__}."
+                )
+            next_version = full(next_version)
+            full_version = {
+                field_name: value
+                for field_name, value in next_version.items()
+                if field_name not in version[_DELTA] and field_name != _DELTAS
+            }
+            full_version.update(
+                {
+                    field_name: value
+                    for field_name, value in version.items()
+                    if field_name != _DELTA
+                }
+            )
+            return full_version
+
+        return [full(version) for version in versions]
 
     @classmethod
     def remove(cls, **filters) -> int:
@@ -135,14 +602,36 @@ class VersionedCRUDModel(_CRUDModel):
 
     @classmethod
     def _delete_many(cls, filters: dict) -> int:
-        revision = cls._increment(*REVISION_COUNTER)
+        revision = cls._new_revision(lambda: cls._latest_revision(filters))
         if cls.audit_model:
             cls.audit_model.audit_remove(revision)
         if filters == {"valid_until_revision": -1}:
             cls.reset_counters()
-        return cls.__collection__.update_many(
-            filters, {"$set": {cls.valid_until_revision.name: revision}}
-        ).modified_count
+        return cls._expire(filters, revision)
+
+    @classmethod
+    def _expire(cls, filters: dict, revision: int) -> int:
+        """
+        Set valid documents matching filters as valid until this revision (excluded).
+        They are moved to the history collection (if any).
+
+        :return: Number of expired documents.
+        """
+        if cls.__history__ is None:
+            return cls.__collection__.update_many(
+                filters, {"$set": {cls.valid_until_revision.name: revision}}
+            ).modified_count
+
+        expired_documents = list(cls.__collection__.find(filters))
+        if not expired_documents:
+            return 0
+
+        for expired_document in expired_documents:
+            expired_document[cls.valid_until_revision.name] = revision
+        cls.__history__.insert_many(expired_documents)
+        return cls.__collection__.delete_many(
+            {"_id": {"$in": [expired["_id"] for expired in expired_documents]}}
+        ).deleted_count
 
     @classmethod
     def _get_revision(cls, filters: dict) -> int:
@@ -180,31 +669,119 @@ class VersionedCRUDModel(_CRUDModel):
             return last_valid
 
         filters[cls.valid_until_revision.name] = {"$exists": True, "$ne": -1}
-        all_invalid = cls.__collection__.find(filters)
-        max_valid_since_revision = 0
-        last_invalid = None
-        for invalid in all_invalid:
-            valid_since_revision = invalid[cls.valid_since_revision.name]
-            if max_valid_since_revision < valid_since_revision:
-                max_valid_since_revision = valid_since_revision
-                last_invalid = invalid
-        return cls.serialize(last_invalid)
+        last_invalid = cls._find_versions(
+            cls._expired_collection(),
+            filters,
+            sort=[(cls.valid_since_revision.name, pymongo.DESCENDING)],
+            limit=1,
+        )
+        return cls.serialize(next(iter(last_invalid), None))
 
     @classmethod
     def get_all(cls, **filters) -> List[dict]:
         """
         Return all valid documents corresponding to query.
+        Documents valid at a given revision are returned if as_of_revision is provided.
         """
+        as_of_revision = filters.pop("as_of_revision", None)
+        if as_of_revision is not None:
+            return cls.get_as_of(as_of_revision, **filters)
+
         filters.pop(cls.valid_since_revision.name, None)
         filters[cls.valid_until_revision.name] = -1
         return super().get_all(**filters)
 
+    @classmethod
+    def get_as_of(cls, revision: int, **filters) -> List[dict]:
+        """
+        Return all documents corresponding to query, as they were at this revision.
+        """
+        if not isinstance(revision, int):
+            raise ValidationFailed(
+                {**filters, "as_of_revision": revision},
+                {"as_of_revision": ["Not a valid int."]},
+            )
+
+        limit = filters.pop("limit", 0) or 0
+        offset = filters.pop("offset", 0) or 0
+        filters.pop(cls.valid_since_revision.name, None)
+        filters.pop(cls.valid_until_revision.name, None)
+        errors = cls.validate_query(filters)
+        if errors:
+            raise ValidationFailed(filters, errors)
+
+        cls.deserialize_query(filters)
+
+        valid_since = {cls.valid_since_revision.name: {"$lte": revision}}
+        # -1 stands for a document that is still valid
+        documents = itertools.chain(
+            cls._find_versions(
+                cls.__collection__,
+                {**filters, **valid_since, cls.valid_until_revision.name: -1},
+            ),
+            cls._find_versions(
+                cls._expired_collection(),
+                {
+                    **filters,
+                    **valid_since,
+                    cls.valid_until_revision.name: {"$gt": revision},
+                },
+            ),
+        )
+        documents = itertools.islice(
+            documents, offset, offset + limit if limit else None
+        )
+        return [cls.serialize(document) for document in documents]
+
+    @classmethod
+    def get_page(cls, **filters) -> (List[dict], str):
+        """
+        Return a page of valid documents corresponding to query.
+        """
+        filters.pop(cls.valid_since_revision.name, None)
+        filters[cls.valid_until_revision.name] = -1
+        return super().get_page(**filters)
+
+    @classmethod
+    def stream(cls, fetch_size: int, **filters) -> Iterator[dict]:
+        """
+        Return all valid documents corresponding to query, one at a time.
+        """
+        filters.pop(cls.valid_since_revision.name, None)
+        filters[cls.valid_until_revision.name] = -1
+        return super().stream(fetch_size, **filters)
+
     @classmethod
     def get_history(cls, **filters) -> List[dict]:
-        return super().get_all(**filters)
+        if cls.__history__ is None and cls._snapshot_interval <= 1:
+            return super().get_all(**filters)
+
+        limit = filters.pop("limit", 0) or 0
+        offset = filters.pop("offset", 0) or 0
+        errors = cls.validate_query(filters)
+        if errors:
+            raise ValidationFailed(filters, errors)
+
+        cls.deserialize_query(filters)
+
+        # Valid versions first, then expired ones (as when they are stored in the same collection)
+        documents = itertools.chain.from_iterable(
+            cls._find_versions(collection, filters)
+            for collection in cls._versions_collections()
+        )
+        documents = itertools.islice(
+            documents, offset, offset + limit if limit else None
+        )
+        return [cls.serialize(document) for document in documents]
 
     @classmethod
-    def rollback_to(cls, **filters) -> int:
+    def rollback_to(cls, dry_run: bool = False, **filters) -> int:
+        """
+        All records matching the query and valid at specified revision will be considered as valid.
+
+        :param dry_run: Only return the number of records that would be updated.
+        :return Number of records updated.
+        """
         revision = cls._get_revision(filters)
 
         errors = cls.validate_query(filters)
@@ -222,8 +799,10 @@ class VersionedCRUDModel(_CRUDModel):
                 "$gt": revision,
             },
         }
-        expired_documents = cls.__collection__.find(
-            {**filters, **previously_expired}, projection={"_id": False}
+        expired_documents = cls._find_versions(
+            cls._expired_collection(),
+            {**filters, **previously_expired},
+            projection={"_id": False},
         )
         expired_documents = list(expired_documents)  # Convert Cursor to list
 
@@ -231,32 +810,52 @@ class VersionedCRUDModel(_CRUDModel):
         if errors:
             raise ValidationFailed({**filters, "revision": revision}, errors)
 
-        new_revision = cls._increment(*REVISION_COUNTER)
+        # Currently valid documents that were not existing at the time
+        new_still_valid = {
+            cls.valid_since_revision.name: {"$gt": revision},
+            cls.valid_until_revision.name: -1,
+        }
+        expired_documents_keys = [
+            cls._to_primary_keys_model(expired_document)
+            for expired_document in expired_documents
+        ]
+
+        if dry_run:
+            if expired_documents_keys:
+                # Current version of expired documents will be replaced, not removed
+                new_still_valid["$nor"] = [
+                    cls._primary_keys_filter(expired_documents_keys)
+                ]
+            return len(expired_documents) + cls.__collection__.count_documents(
+                {**filters, **new_still_valid}
+            )
 
-        # Update currently valid as non valid anymore (new version since this validity)
-        for expired_document in expired_documents:
-            expired_document_keys = cls._to_primary_keys_model(expired_document)
-            expired_document_keys[cls.valid_until_revision.name] = -1
+        restored_or_removed = [{**filters, **new_still_valid}]
+        if expired_documents_keys:
+            restored_or_removed.append(cls._primary_keys_filter(expired_documents_keys))
+        new_revision = cls._new_revision(
+            lambda: cls._latest_revision({"$or": restored_or_removed})
+        )
 
-            cls.__collection__.find_one_and_update(
-                expired_document_keys,
-                {"$set": {cls.valid_until_revision.name: new_revision}},
+        # Update currently valid as non valid anymore (new version since this validity)
+        if expired_documents_keys:
+            cls._expire(
+                {
+                    **cls._primary_keys_filter(expired_documents_keys),
+                    cls.valid_until_revision.name: -1,
+                },
+                new_revision,
             )
 
         # Update currently valid as non valid anymore (they were not existing at the time)
-        new_still_valid = {
-            cls.valid_since_revision.name: {"$gt": revision},
-            cls.valid_until_revision.name: -1,
-        }
-        nb_removed = cls.__collection__.update_many(
-            {**filters, **new_still_valid},
-            {"$set": {cls.valid_until_revision.name: new_revision}},
-        ).modified_count
+        nb_removed = cls._expire({**filters, **new_still_valid}, new_revision)
 
         # Insert expired as valid
         for expired_document in expired_documents:
             expired_document[cls.valid_since_revision.name] = new_revision
             expired_document[cls.valid_until_revision.name] = -1
+            # Previous version is the currently valid one (stored as a full version)
+            expired_document.pop(_DELTAS, None)
 
         if expired_documents:
             cls.__collection__.insert_many(expired_documents)
@@ -280,4 +879,4 @@ class VersionedCRUDModel(_CRUDModel):
 
     @classmethod
     def current_revision(cls) -> int:
-        return cls._get_counter(*REVISION_COUNTER)
+        return cls._get_counter(*cls._revision_counter)
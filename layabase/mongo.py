@@ -1,7 +1,10 @@
 import enum
 import datetime
+import functools
+import warnings
 from typing import Dict, List, Union
 
+import pymongo
 import pymongo.database
 import iso8601
 from bson.objectid import ObjectId
@@ -16,6 +19,67 @@ class IndexType(enum.IntEnum):
     Other = 2
 
 
+@enum.unique
+class RevisionScope(enum.IntEnum):
+    """
+    Versioned collections sharing the same revision counter.
+    """
+
+    # Every versioned collection (of a database) shares a single counter
+    Shared = 1
+    # Every versioned collection has its own counter
+    Collection = 2
+
+
+class Index:
+    """
+    Definition of a named Mongo index, to be listed in the __indexes__ attribute of a collection.
+    Declared indexes are created (and updated) alongside the ones created from fields index_type.
+    """
+
+    def __init__(self, name: str, *keys, **kwargs):
+        """
+
+        :param name: Index name. Should be unique within the collection.
+        :param keys: Indexed fields, in order. Each key can be a field name (ascending)
+        or a tuple containing the field name and the direction (pymongo.ASCENDING or pymongo.DESCENDING).
+        Dot notation can be used for dictionary fields.
+        :param is_unique: If indexed values should be unique. Should be a boolean value. Default to False.
+        :param is_sparse: If documents without indexed fields should be skipped. Should be a boolean value. Default to False.
+        Cannot be combined with partial_filter and not available on versioned collections (partial indexes).
+        :param expire_after_seconds: Number of seconds after which a document is removed by the server (TTL index).
+        Only for a single date field. Default to None (documents never expire).
+        :param partial_filter: Only index documents matching this Mongo filter (MongoDB 3.2+).
+        Default to None (every document is indexed).
+        """
+        if not name:
+            raise Exception("An index must have a name.")
+        if not keys:
+            raise Exception(f"{name} index must have at least one key.")
+        self.name = name
+        self.keys = [
+            (key, pymongo.ASCENDING) if isinstance(key, str) else tuple(key)
+            for key in keys
+        ]
+        self.is_unique = bool(kwargs.pop("is_unique", False))
+        self.is_sparse = bool(kwargs.pop("is_sparse", False))
+        self.expire_after_seconds = kwargs.pop("expire_after_seconds", None)
+        if self.expire_after_seconds is not None and len(self.keys) > 1:
+            raise Exception(f"{name} TTL index must have a single key.")
+        self.partial_filter = kwargs.pop("partial_filter", None)
+        if self.is_sparse and self.partial_filter:
+            raise Exception(f"{name} index cannot be both sparse and partial.")
+
+    def field_names(self) -> List[str]:
+        """
+        :return: Name of the indexed fields (first part of dot notation keys).
+        """
+        return [field_name.split(".", maxsplit=1)[0] for field_name, _ in self.keys]
+
+
+# Maximum number of models describing a DictColumn content to keep per DictColumn
+_max_cached_models = 100
+
 _operators = {
     ComparisonSigns.Greater: "$gt",
     ComparisonSigns.GreaterOrEqual: "$gte",
@@ -86,6 +150,8 @@ class Column:
         :param allow_comparison_signs: If field can be queries with ComparisonSign. Should be a boolean.
         Default to False (only equality can be queried).
         """
+        # How this column was defined (used to compare columns)
+        self._definition = (type(self), field_type, _to_hashable(kwargs))
         self.field_type = field_type or str
         self.get_choices = self._to_get_choices(kwargs.pop("choices", None))
         self.get_counter = self._to_get_counter(kwargs.pop("counter", None))
@@ -177,6 +243,7 @@ class Column:
         self._validate_insert = self._get_insert_update_validation_function()
         self._validate_update = self._get_insert_update_validation_function()
         self._deserialize_value = self._get_value_deserialization_function()
+        self._serialize_value = self._get_value_serialization_function()
 
     def _to_get_counter(self, counter):
         if counter:
@@ -245,6 +312,22 @@ class Column:
             return {}
         return self._validate_insert(value)
 
+    def validate_and_deserialize_insert(self, document: dict) -> dict:
+        """
+        Validate this field for a document insertion request and, if valid,
+        update this field value within the document to a value that can be inserted in Mongo.
+
+        :param document: Mongo to be document. Values of other fields are not modified.
+        Each entry if composed of a field name associated to a value.
+        This field might not be in it.
+        :return: Validation errors that might have occurred on this field. Empty if no error occurred.
+        Entry would be composed of the field name associated to a list of error messages.
+        """
+        errors = self.validate_insert(document)
+        if not errors:
+            self.deserialize_insert(document)
+        return errors
+
     def validate_update(self, document: dict) -> dict:
         """
         Validate this field for a document update request.
@@ -762,18 +845,24 @@ class Column:
 
         if value is None:
             document[self.name] = self.get_default_value(document)
-        elif self.field_type == datetime.datetime:
-            document[
-                self.name
-            ] = (
-                value.isoformat()
-            )  # TODO Time Offset is missing to be fully compliant with RFC
+        elif self._serialize_value:
+            document[self.name] = self._serialize_value(value)
+
+    def _get_value_serialization_function(self) -> Union[callable, None]:
+        """
+        Return the function to convert Mongo (BSON) values to valid JSON ones.
+        None if Mongo values are already valid JSON ones.
+        """
+        if self.field_type == datetime.datetime:
+            # TODO Time Offset is missing to be fully compliant with RFC
+            return datetime.datetime.isoformat
         elif self.field_type == datetime.date:
-            document[self.name] = value.date().isoformat()
+            return lambda value: value.date().isoformat()
         elif isinstance(self.field_type, enum.EnumMeta):
-            document[self.name] = self.field_type(value).name
+            return lambda value: self.field_type(value).name
         elif self.field_type == ObjectId:
-            document[self.name] = str(value)
+            return str
+        return None
 
     def example(self):
         if self._example is not None:
@@ -820,6 +909,42 @@ class Column:
         )
 
 
+def _to_hashable(value):
+    """
+    Hashable representation of a column option. Columns are represented by their definition.
+    Functions (and other objects) are compared as is.
+    """
+    if isinstance(value, Column):
+        return value._definition
+    if isinstance(value, dict):
+        return tuple((key, _to_hashable(item)) for key, item in value.items())
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_to_hashable(item) for item in value)
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_to_hashable(item) for item in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return type(value), repr(value)
+
+
+class _Fields:
+    """
+    Columns (by name) compared by their definition, so that equivalent columns can share the same model.
+    """
+
+    def __init__(self, columns: Dict[str, Column]):
+        self.columns = columns
+        self._definition = _to_hashable(columns)
+
+    def __hash__(self):
+        return hash(self._definition)
+
+    def __eq__(self, other):
+        return isinstance(other, _Fields) and self._definition == other._definition
+
+
 class DictColumn(Column):
     """
     Definition of a Mongo document dictionary field.
@@ -841,6 +966,7 @@ class DictColumn(Column):
         :param get_fields: Function returning a definition of this dictionary.
         Should be a function (with dictionary as parameter) returning a dictionary.
         Keys are field names and associated values are Column.
+        Columns defined the same way (same options, functions being the same objects) share the same description.
         Default to returning fields.
         :param index_fields: Definition of all possible dictionary fields.
         This is used to identify every possible index fields.
@@ -879,6 +1005,14 @@ class DictColumn(Column):
         Should be an integer value. Default to None (no maximum length).
         """
         kwargs.pop("field_type", None)
+        definition = (
+            type(self),
+            _to_hashable(fields),
+            get_fields,
+            _to_hashable(index_fields),
+            get_index_fields,
+            _to_hashable(kwargs),
+        )
 
         if not fields and not get_fields:
             raise Exception("fields or get_fields must be provided.")
@@ -905,6 +1039,13 @@ class DictColumn(Column):
                 }
 
         Column.__init__(self, dict, **kwargs)
+        self._definition = definition
+
+        # Creating a model is costly, only create one per distinct fields definition
+        # Cache is bounded in case get_fields (or get_index_fields) provides different columns on every call
+        self._cached_model = functools.lru_cache(maxsize=_max_cached_models)(
+            self._create_model
+        )
 
     def _default_description_model(self):
         """
@@ -918,12 +1059,8 @@ class DictColumn(Column):
         :param model_as_dict: Data provided by the user.
         :return: A CRUDModel describing every dictionary fields.
         """
-        from layabase._database_mongo import _CRUDModel
-
-        return type(
-            f"{self.name}_DescriptionModel",
-            (_CRUDModel,),
-            self._get_fields(model_as_dict),
+        return self._cached_model(
+            "DescriptionModel", _Fields(self._get_fields(model_as_dict))
         )
 
     def _index_description_model(self, model_as_dict: dict):
@@ -931,13 +1068,19 @@ class DictColumn(Column):
         :param model_as_dict: Data provided by the user.
         :return: A CRUDModel describing every index fields.
         """
+        return self._cached_model(
+            "IndexDescriptionModel", _Fields(self._get_all_index_fields(model_as_dict))
+        )
+
+    def _create_model(self, model_type: str, fields: "_Fields"):
+        """
+        :param model_type: DescriptionModel or IndexDescriptionModel.
+        :param fields: Fields (by name) to describe.
+        :return: A CRUDModel describing those fields.
+        """
         from layabase._database_mongo import _CRUDModel
 
-        return type(
-            f"{self.name}_IndexDescriptionModel",
-            (_CRUDModel,),
-            self._get_all_index_fields(model_as_dict),
-        )
+        return type(f"{self.name}_{model_type}", (_CRUDModel,), dict(fields.columns))
 
     def _get_index_fields(
         self, index_type: IndexType, model_as_dict: Union[dict, None], prefix: str
@@ -946,32 +1089,63 @@ class DictColumn(Column):
             index_type, model_as_dict, f"{prefix}{self.name}."
         )
 
-    def validate_insert(self, model_as_dict: dict) -> dict:
-        errors = Column.validate_insert(self, model_as_dict)
-        if not errors:
-            value = model_as_dict.get(self.name)
-            if value is not None:
-                try:
-                    description_model = self._description_model(model_as_dict)
-                    errors.update(
-                        {
-                            f"{self.name}.{field_name}": field_errors
-                            for field_name, field_errors in description_model.validate_insert(
-                                value
-                            ).items()
-                        }
-                    )
-                except Exception as e:
-                    errors[self.name] = [str(e)]
-        return errors
+    def validate_insert(self, document: dict) -> dict:
+        warnings.warn(
+            "validate_insert is deprecated, use validate_and_deserialize_insert instead.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        # Nested fields are validated on a copy as provided document must not be modified
+        return self.validate_and_deserialize_insert(dict(document))
 
     def deserialize_insert(self, document: dict):
+        warnings.warn(
+            "deserialize_insert is deprecated, use validate_and_deserialize_insert instead.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        self.validate_and_deserialize_insert(document)
+
+    def validate_and_deserialize_insert(self, document: dict) -> dict:
+        errors = Column.validate_insert(self, document)
+        if errors:
+            return errors
         value = document.get(self.name)
         if value is None:
             # Ensure that None value are not stored to save space and allow to change default value.
             document.pop(self.name, None)
-        else:
-            self._description_model(document).deserialize_insert(value)
+            return errors
+        try:
+            description_model = self._description_model(document)
+            (
+                new_value,
+                value_errors,
+            ) = description_model._validate_and_deserialize_insert(value)
+        except Exception as e:
+            return {self.name: [str(e)]}
+        if value_errors:
+            return {
+                f"{self.name}.{field_name}": field_errors
+                for field_name, field_errors in value_errors.items()
+            }
+        document[self.name] = new_value
+        return errors
+
+    def _auto_increment_nested(self, documents: List[dict], reserve):
+        """
+        Set auto incremented fields values within this dictionary for those (valid and deserialized) documents.
+
+        :param reserve: Function reserving counter values of the model storing those documents.
+        """
+        values_per_model = {}
+        for document in documents:
+            value = document.get(self.name)
+            if value is not None:
+                values_per_model.setdefault(
+                    self._description_model(document), []
+                ).append(value)
+        for description_model, values in values_per_model.items():
+            description_model._auto_increment(values, reserve)
 
     def validate_update(self, document: dict) -> dict:
         errors = Column.validate_update(self, document)
@@ -998,7 +1172,10 @@ class DictColumn(Column):
             # Ensure that None value are not stored to save space and allow to change default value.
             document.pop(self.name, None)
         else:
+            # Provided dictionary is not modified
+            value = dict(value)
             self._description_model(document).deserialize_update(value)
+            document[self.name] = value
 
     def validate_query(self, filters: dict) -> dict:
         errors = Column.validate_query(self, filters)
@@ -1076,45 +1253,75 @@ class ListColumn(Column):
         :param max_length: Maximum number of items.
         """
         kwargs.pop("field_type", None)
+        definition = (type(self), _to_hashable(list_item_type), _to_hashable(kwargs))
         self.list_item_column = list_item_type
         self.sorted = bool(kwargs.pop("sorted", False))
         Column.__init__(self, list, **kwargs)
+        self._definition = definition
 
     def __set_name__(self, owner, name):
         super().__set_name__(owner, name)
         self.list_item_column.__set_name__(owner, name)
 
     def validate_insert(self, document: dict) -> dict:
-        errors = Column.validate_insert(self, document)
-        if not errors:
-            values = document.get(self.name) or []
-            for index, value in enumerate(values):
-                document_with_list_item = {**document, self.name: value}
-                list_item_errors = self.list_item_column.validate_insert(
-                    document_with_list_item
-                )
-                errors.update(
-                    {
-                        f"{field_name}[{index}]": field_errors
-                        for field_name, field_errors in list_item_errors.items()
-                    }
-                )
-        return errors
+        warnings.warn(
+            "validate_insert is deprecated, use validate_and_deserialize_insert instead.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        # Nested fields are validated on a copy as provided document must not be modified
+        return self.validate_and_deserialize_insert(dict(document))
 
     def deserialize_insert(self, document: dict):
+        warnings.warn(
+            "deserialize_insert is deprecated, use validate_and_deserialize_insert instead.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        self.validate_and_deserialize_insert(document)
+
+    def validate_and_deserialize_insert(self, document: dict) -> dict:
+        errors = Column.validate_insert(self, document)
+        if errors:
+            return errors
         values = document.get(self.name)
         if values is None:
             # Ensure that None value are not stored to save space and allow to change default value.
             document.pop(self.name, None)
-        else:
-            new_values = []
-            for value in values:
-                document_with_list_item = {**document, self.name: value}
-                self.list_item_column.deserialize_insert(document_with_list_item)
-                if self.name in document_with_list_item:
-                    new_values.append(document_with_list_item[self.name])
-
+            return errors
+        new_values = []
+        for index, value in enumerate(values):
+            document_with_list_item = {**document, self.name: value}
+            list_item_errors = self.list_item_column.validate_and_deserialize_insert(
+                document_with_list_item
+            )
+            errors.update(
+                {
+                    f"{field_name}[{index}]": field_errors
+                    for field_name, field_errors in list_item_errors.items()
+                }
+            )
+            if self.name in document_with_list_item:
+                new_values.append(document_with_list_item[self.name])
+        if not errors:
             document[self.name] = sorted(new_values) if self.sorted else new_values
+        return errors
+
+    def _auto_increment_nested(self, documents: List[dict], reserve):
+        """
+        Set auto incremented fields values within dictionaries of this list for those (valid and deserialized) documents.
+
+        :param reserve: Function reserving counter values of the model storing those documents.
+        """
+        if isinstance(self.list_item_column, DictColumn):
+            self.list_item_column._auto_increment_nested(
+                [
+                    {**document, self.name: value}
+                    for document in documents
+                    for value in document.get(self.name) or []
+                ],
+                reserve,
+            )
 
     def validate_update(self, document: dict) -> dict:
         errors = Column.validate_update(self, document)
@@ -1205,14 +1412,25 @@ def link(controller: CRUDController, base: pymongo.database.Database):
 
     :param base: As returned by layabase.load function
     """
+    if controller._model:
+        # Do not leave the background audit writer of a previous link running
+        controller.close_audit()
+
     if controller.history:
         import layabase._versioning_mongo
 
         crud_model = layabase._versioning_mongo.VersionedCRUDModel
+        model_parameters = {
+            "history_collection": controller.history_collection,
+            "history_snapshot_interval": controller.history_snapshot_interval,
+            "revision_scope": controller.revision_scope or RevisionScope.Shared,
+            "revision_block_size": controller.revision_block_size,
+        }
     else:
         from layabase._database_mongo import _CRUDModel
 
         crud_model = _CRUDModel
+        model_parameters = {}
 
     class ControllerModel(
         controller.table_or_collection,
@@ -1221,7 +1439,10 @@ def link(controller: CRUDController, base: pymongo.database.Database):
         skip_name_check=controller.skip_name_check,
         skip_unknown_fields=controller.skip_unknown_fields,
         skip_update_indexes=controller.skip_update_indexes,
+        plan_update_indexes=controller.plan_update_indexes,
         skip_log_for_unknown_fields=controller.skip_log_for_unknown_fields,
+        counter_block_size=controller.counter_block_size,
+        **model_parameters,
     ):
         pass
 
@@ -1231,7 +1452,21 @@ def link(controller: CRUDController, base: pymongo.database.Database):
         from layabase._audit_mongo import _create_from
 
         ControllerModel.audit_model = _create_from(
-            mixin=controller.table_or_collection, model=ControllerModel, base=base
+            mixin=controller.table_or_collection,
+            model=ControllerModel,
+            base=base,
+            skip_update_indexes=controller.skip_update_indexes,
+            plan_update_indexes=controller.plan_update_indexes,
         )
+        if controller.audit_queue_size:
+            from layabase._audit import AuditWriter
+
+            ControllerModel.audit_model._writer = AuditWriter(
+                ControllerModel.audit_model._write,
+                controller.audit_queue_size,
+                controller.audit_batch_size,
+                controller.audit_flush_interval,
+                name=f"audit_{ControllerModel.__collection_name__}",
+            )
 
     controller._model_description_dictionary = ControllerModel.description_dictionary()
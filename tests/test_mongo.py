@@ -115,3 +115,67 @@ def test_int_column_with_not_int_example_is_invalid():
     with pytest.raises(Exception) as exception_info:
         layabase.mongo.Column(int, example="test", counter=100, choices=[1, 2])
     assert str(exception_info.value) == "Example must be of field type."
+
+
+def test_dict_column_description_model_is_created_once_per_fields():
+    first_key = layabase.mongo.Column(int)
+    second_key = layabase.mongo.Column(int)
+
+    class TestCollection:
+        __collection_name__ = "test"
+
+        static_dict = layabase.mongo.DictColumn(fields={"first_key": first_key})
+        dynamic_dict = layabase.mongo.DictColumn(
+            get_fields=lambda document: {"second_key": second_key}
+            if document.get("other")
+            else {"first_key": first_key}
+        )
+
+    static_dict = TestCollection.static_dict
+    assert static_dict._description_model({}) is static_dict._description_model(
+        {"other": 1}
+    )
+    dynamic_dict = TestCollection.dynamic_dict
+    assert dynamic_dict._description_model({}) is dynamic_dict._description_model({})
+    assert dynamic_dict._description_model(
+        {"other": 1}
+    ) is not dynamic_dict._description_model({})
+    assert dynamic_dict._description_model({"other": 1}).get_field_names() == [
+        "second_key"
+    ]
+
+
+def test_dict_column_description_models_are_shared_by_equivalent_columns():
+    class TestCollection:
+        __collection_name__ = "test"
+
+        dynamic_dict = layabase.mongo.DictColumn(
+            get_fields=lambda document: {
+                "key": layabase.mongo.Column(int, choices=[1, 2]),
+                "inner": layabase.mongo.DictColumn(
+                    fields={"key": layabase.mongo.Column(str)}
+                ),
+            }
+        )
+
+    dynamic_dict = TestCollection.dynamic_dict
+    assert dynamic_dict._description_model({}) is dynamic_dict._description_model({})
+    assert dynamic_dict._cached_model.cache_info().misses == 1
+
+
+def test_dict_column_description_models_are_bounded():
+    class TestCollection:
+        __collection_name__ = "test"
+
+        dynamic_dict = layabase.mongo.DictColumn(
+            get_fields=lambda document: {
+                "key": layabase.mongo.Column(int, description=document["description"])
+            }
+        )
+
+    for index in range(layabase.mongo._max_cached_models * 2):
+        TestCollection.dynamic_dict._description_model({"description": str(index)})
+    assert (
+        TestCollection.dynamic_dict._cached_model.cache_info().currsize
+        == layabase.mongo._max_cached_models
+    )
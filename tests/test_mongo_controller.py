@@ -591,6 +591,7 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                         {
                             "name": "X-Fields",
                             "in": "header",
@@ -750,6 +751,7 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                     ],
                     "tags": ["Test"],
                 },
@@ -2,11 +2,14 @@ import datetime
 
 import flask
 import flask_restplus
+import mongomock
 import pytest
 from layaberr import ValidationFailed
 
 import layabase
 import layabase.mongo
+import layabase._audit_mongo
+import layabase._database_mongo
 from layabase.testing import mock_mongo_audit_datetime
 
 
@@ -177,6 +180,7 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                         {
                             "name": "X-Fields",
                             "in": "header",
@@ -445,6 +449,7 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                     ],
                     "tags": ["Test"],
                 },
@@ -1288,3 +1293,151 @@ def test_audit_user_name(client, mock_mongo_audit_datetime):
             "revision": 2,
         },
     ]
+
+
+def _record_calls(monkeypatch, *collections) -> list:
+    calls = []
+    for collection in collections:
+        for method_name in [
+            "find",
+            "find_one",
+            "find_one_and_update",
+            "bulk_write",
+            "insert_one",
+            "insert_many",
+            "aggregate",
+        ]:
+            method = getattr(collection, method_name)
+
+            def record(
+                *args, name=f"{collection.name}.{method_name}", method=method, **kwargs
+            ):
+                calls.append(name)
+                return method(*args, **kwargs)
+
+            monkeypatch.setattr(collection, method_name, record)
+    return calls
+
+
+def test_put_many_round_trips_do_not_depend_on_the_number_of_documents(
+    controller, monkeypatch
+):
+    controller.post_many([{"key": f"key{i}", "mandatory": i} for i in range(10)])
+    calls = _record_calls(
+        monkeypatch,
+        controller._model.__collection__,
+        controller._model.audit_model.__collection__,
+    )
+
+    controller.put_many([{"key": f"key{i}", "mandatory": i + 1} for i in range(10)])
+    assert calls == ["test.find", "test.bulk_write", "audit_test.insert_many"]
+    assert [audit["revision"] for audit in controller.get_audit({})] == list(
+        range(1, 21)
+    )
+
+
+def test_post_many_round_trips_do_not_depend_on_the_number_of_documents(
+    controller, monkeypatch
+):
+    calls = _record_calls(
+        monkeypatch,
+        controller._model.__collection__,
+        controller._model.audit_model.__collection__,
+        controller._model.__counters__,
+    )
+
+    controller.post_many([{"key": f"key{i}", "mandatory": i} for i in range(10)])
+    assert [call for call in calls if not call.startswith("counters.")] == [
+        "test.insert_many",
+        "audit_test.insert_many",
+    ]
+    # All revisions are reserved at once
+    assert calls.count("counters.find_one_and_update") == 1
+    assert [audit["revision"] for audit in controller.get_audit({})] == list(
+        range(1, 11)
+    )
+
+
+def test_delete_audit_is_performed_by_batches(
+    controller, monkeypatch, mock_mongo_audit_datetime
+):
+    monkeypatch.setattr(layabase._audit_mongo, "_REMOVE_BATCH_SIZE", 2)
+    controller.post_many([{"key": f"key{i}", "mandatory": i} for i in range(5)])
+    calls = _record_calls(monkeypatch, controller._model.audit_model.__collection__)
+
+    assert controller.delete({}) == 5
+    assert calls == ["audit_test.insert_many"] * 3
+    assert controller.get_audit({"audit_action": "Delete"}) == [
+        {
+            "audit_action": "Delete",
+            "audit_date_utc": "2018-10-11T15:05:05.663000",
+            "audit_user": "",
+            "key": f"key{i}",
+            "mandatory": i,
+            "optional": None,
+            "revision": i + 6,
+        }
+        for i in range(5)
+    ]
+
+
+def test_delete_audit_is_performed_by_the_server_when_supported(
+    controller, monkeypatch
+):
+    controller.post_many([{"key": f"key{i}", "mandatory": i} for i in range(5)])
+    audit_model = controller._model.audit_model
+    monkeypatch.setattr(audit_model, "_server_version", (5, 0, 5))
+    pipelines = []
+    monkeypatch.setattr(
+        controller._model.__collection__,
+        "aggregate",
+        lambda pipeline: pipelines.append(pipeline),
+    )
+    calls = _record_calls(monkeypatch, audit_model.__collection__)
+
+    assert controller.delete({"key": ["key2", "key3", "key4"]}) == 3
+    assert calls == []
+    [pipeline] = pipelines
+    assert pipeline[0] == {"$match": {"key": {"$in": ["key2", "key3", "key4"]}}}
+    assert pipeline[2] == {"$limit": 3}
+    # Revisions 6 to 8 are reserved
+    assert pipeline[4]["$set"]["revision"] == {"$add": ["$revision", 5]}
+    assert pipeline[4]["$set"]["audit_action"] == 3
+    assert pipeline[-1]["$merge"]["into"] == "audit_test"
+    assert audit_model._increment("revision", "test") == 9
+
+
+def test_delete_audit_is_performed_by_the_server_since_version_10(monkeypatch):
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+
+    monkeypatch.setattr(
+        mongomock.MongoClient,
+        "server_info",
+        lambda *args: {"version": "10.0.1", "versionArray": [10, 0, 1, 0]},
+    )
+    monkeypatch.setattr(layabase._database_mongo, "_server_versions", {})
+    controller = layabase.CRUDController(TestCollection, audit=True)
+    layabase.load("mongomock", [controller])
+    controller.post({"key": "key1"})
+    assert controller._model.audit_model._server_version == (10, 0, 1, 0)
+    pipelines = []
+    monkeypatch.setattr(
+        controller._model.__collection__,
+        "aggregate",
+        lambda pipeline: pipelines.append(pipeline),
+    )
+
+    assert controller.delete({"key": "key1"}) == 1
+    assert pipelines[0][-1]["$merge"]["into"] == "audit_test"
+
+
+def test_server_version_is_parsed_without_version_array():
+    assert layabase._database_mongo._to_version({"version": "10.0.1-rc0"}) == (
+        10,
+        0,
+        1,
+    )
+    assert layabase._database_mongo._to_version({}) == ()
@@ -0,0 +1,216 @@
+import datetime
+import enum
+import threading
+
+import pytest
+
+import layabase
+import layabase.mongo
+from layabase.testing import mock_mongo_audit_datetime
+
+
+@pytest.fixture
+def controller():
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        mandatory = layabase.mongo.Column(int, is_nullable=False)
+
+    controller = layabase.CRUDController(
+        TestCollection, audit=True, audit_queue_size=10, audit_flush_interval=0.01
+    )
+    layabase.load("mongomock", [controller])
+    yield controller
+    controller.close_audit()
+
+
+def test_audit_is_written_in_the_background(controller, mock_mongo_audit_datetime):
+    controller.post_many([{"key": "my_key1", "mandatory": 1}])
+    controller.put({"key": "my_key1", "mandatory": 2})
+    controller.delete({"key": "my_key1"})
+    controller.flush_audit()
+    assert controller.get_audit({}) == [
+        {
+            "audit_action": "Insert",
+            "audit_date_utc": "2018-10-11T15:05:05.663000",
+            "audit_user": "",
+            "key": "my_key1",
+            "mandatory": 1,
+            "revision": 1,
+        },
+        {
+            "audit_action": "Update",
+            "audit_date_utc": "2018-10-11T15:05:05.663000",
+            "audit_user": "",
+            "key": "my_key1",
+            "mandatory": 2,
+            "revision": 2,
+        },
+        {
+            "audit_action": "Delete",
+            "audit_date_utc": "2018-10-11T15:05:05.663000",
+            "audit_user": "",
+            "key": "my_key1",
+            "mandatory": 2,
+            "revision": 3,
+        },
+    ]
+    statistics = controller.audit_statistics()
+    assert statistics["queued"] == 0
+    assert statistics["written"] == 3
+    assert statistics["failed"] == 0
+    assert statistics["flushes"] >= 1
+
+
+def test_audit_is_not_written_on_the_request_path(controller, monkeypatch):
+    audit_model = controller._model.audit_model
+    written = threading.Event()
+    write = audit_model._write
+
+    def slow_write(audit_documents):
+        written.wait()
+        write(audit_documents)
+
+    monkeypatch.setattr(audit_model._writer, "_write", slow_write)
+    controller.post({"key": "my_key1", "mandatory": 1})
+    assert controller.get_audit({}) == []
+    written.set()
+    controller.flush_audit()
+    assert len(controller.get_audit({})) == 1
+
+
+def test_callers_wait_for_room_when_queue_is_full(controller, monkeypatch):
+    audit_model = controller._model.audit_model
+    written = threading.Event()
+    write = audit_model._write
+
+    def slow_write(audit_documents):
+        written.wait()
+        write(audit_documents)
+
+    monkeypatch.setattr(audit_model._writer, "_write", slow_write)
+    # Worker only takes 5 records before waiting, queue is full with 10 others
+    monkeypatch.setattr(audit_model._writer, "batch_size", 5)
+    posting = threading.Thread(
+        target=controller.post_many,
+        args=([{"key": f"key{i}", "mandatory": i} for i in range(30)],),
+    )
+    posting.start()
+    posting.join(timeout=0.2)
+    assert posting.is_alive()
+    written.set()
+    posting.join()
+    controller.flush_audit()
+    statistics = controller.audit_statistics()
+    assert statistics["waits"] > 0
+    assert statistics["written"] == 30
+    assert [audit["revision"] for audit in controller.get_audit({})] == list(
+        range(1, 31)
+    )
+
+
+def test_failed_writes_are_counted(controller, monkeypatch):
+    def failing_write(audit_documents):
+        raise Exception("Server unavailable")
+
+    monkeypatch.setattr(controller._model.audit_model._writer, "_write", failing_write)
+    controller.post({"key": "my_key1", "mandatory": 1})
+    controller.flush_audit()
+    assert controller.audit_statistics()["failed"] == 1
+    assert controller.get_audit({}) == []
+
+
+def test_close_writes_queued_audit(controller):
+    controller.post_many([{"key": f"key{i}", "mandatory": i} for i in range(5)])
+    controller.close_audit()
+    assert len(controller.get_audit({})) == 5
+    with pytest.raises(Exception) as exception_info:
+        controller.post({"key": "other", "mandatory": 1})
+    assert str(exception_info.value) == "Audit writer is closed."
+
+
+def test_audit_statistics_without_background_audit_is_empty():
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+
+    controller = layabase.CRUDController(TestCollection, audit=True)
+    layabase.load("mongomock", [controller])
+    assert controller.audit_statistics() == {}
+    controller.flush_audit()
+
+
+class EnumTest(enum.Enum):
+    Value1 = 1
+    Value2 = 2
+
+
+def test_nested_values_are_audited_as_inserted():
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        dict_field = layabase.mongo.DictColumn(
+            fields={
+                "date": layabase.mongo.Column(datetime.datetime),
+                "enum": layabase.mongo.Column(EnumTest),
+            }
+        )
+
+    controller = layabase.CRUDController(
+        TestCollection, audit=True, audit_queue_size=100, audit_flush_interval=0.01
+    )
+    layabase.load("mongomock", [controller])
+    writer = controller._model.audit_model._writer
+    written = threading.Event()
+    write = writer._write
+
+    def slow_write(audit_documents):
+        # Ensure that serialization of returned documents occurred beforehand
+        written.wait()
+        write(audit_documents)
+
+    writer._write = slow_write
+    try:
+        document = {
+            "key": "my_key",
+            "dict_field": {"date": "2018-10-11T15:05:05.663", "enum": "Value1"},
+        }
+        controller.post(document)
+        controller.post_many([{**document, "key": "my_key2"}])
+        controller.put_many([{"key": "my_key", "dict_field.enum": "Value2"}])
+        written.set()
+        controller.flush_audit()
+        audit_documents = list(
+            controller._model.audit_model.__collection__.find(
+                {}, sort=[("revision", 1)]
+            )
+        )
+        assert [audit_document["dict_field"] for audit_document in audit_documents] == [
+            {
+                "date": datetime.datetime(2018, 10, 11, 15, 5, 5, 663000),
+                "enum": 1,
+            },
+            {
+                "date": datetime.datetime(2018, 10, 11, 15, 5, 5, 663000),
+                "enum": 1,
+            },
+            {
+                "date": datetime.datetime(2018, 10, 11, 15, 5, 5, 663000),
+                "enum": 2,
+            },
+        ]
+    finally:
+        written.set()
+        controller.close_audit()
+
+
+def test_linking_again_closes_previous_writer(controller):
+    writer = controller._model.audit_model._writer
+    controller.post({"key": "my_key1", "mandatory": 1})
+    layabase.load("mongomock", [controller])
+    assert not writer._worker.is_alive()
+    assert writer.statistics()["written"] == 1
+    assert controller._model.audit_model._writer is not writer
@@ -50,12 +50,7 @@ def test_auto_incremented_fields_are_not_incremented_on_multi_post_failure(contr
         controller.post_many([{"other": 2}, {"other": "FAILED"}, {"other": 4}])
 
     assert controller.post_many([{"other": 5}]) == [
-        {
-            "key": 3,  # For performance reasons, deserialization is performed before checks on other doc (so first valid document incremented the counter)
-            "other": 5,
-            "valid_since_revision": 2,
-            "valid_until_revision": -1,
-        }
+        {"key": 2, "other": 5, "valid_since_revision": 2, "valid_until_revision": -1,}
     ]
 
 
@@ -159,6 +159,13 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
+                        {
+                            "name": "as_of_revision",
+                            "in": "query",
+                            "type": "integer",
+                            "minimum": 0,
+                        },
                         {
                             "name": "X-Fields",
                             "in": "header",
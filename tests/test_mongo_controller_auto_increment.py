@@ -212,6 +212,7 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                         {
                             "name": "X-Fields",
                             "in": "header",
@@ -0,0 +1,88 @@
+import pytest
+
+import layabase
+import layabase.mongo
+
+
+class TestCollection:
+    __collection_name__ = "test"
+
+    key = layabase.mongo.Column(int, is_primary_key=True, should_auto_increment=True)
+    other_key = layabase.mongo.Column(
+        int, should_auto_increment=True, counter=("other", "other_category")
+    )
+    value = layabase.mongo.Column(str)
+
+
+def _count_counter_updates(controller: layabase.CRUDController, monkeypatch) -> list:
+    counters = controller._model.__counters__
+    updates = []
+    find_one_and_update = counters.find_one_and_update
+
+    def count(*args, **kwargs):
+        updates.append(args)
+        return find_one_and_update(*args, **kwargs)
+
+    monkeypatch.setattr(counters, "find_one_and_update", count)
+    return updates
+
+
+@pytest.fixture
+def controller():
+    controller = layabase.CRUDController(TestCollection)
+    layabase.load("mongomock", [controller])
+    return controller
+
+
+@pytest.fixture
+def block_controller():
+    controller = layabase.CRUDController(TestCollection, counter_block_size=10)
+    layabase.load("mongomock", [controller])
+    return controller
+
+
+def test_post_many_reserves_values_once_per_counter(
+    controller: layabase.CRUDController, monkeypatch
+):
+    controller.post({"value": "first"})
+    updates = _count_counter_updates(controller, monkeypatch)
+    assert controller.post_many([{"value": "second"}, {"value": "third"}]) == [
+        {"key": 2, "other_key": 2, "value": "second"},
+        {"key": 3, "other_key": 3, "value": "third"},
+    ]
+    assert len(updates) == 2
+
+
+def test_values_are_reserved_by_blocks(
+    block_controller: layabase.CRUDController, monkeypatch
+):
+    updates = _count_counter_updates(block_controller, monkeypatch)
+    assert block_controller.post({"value": "first"}) == {
+        "key": 1,
+        "other_key": 1,
+        "value": "first",
+    }
+    assert block_controller.post_many([{"value": f"value{i}"} for i in range(9)])[
+        -1
+    ] == {"key": 10, "other_key": 10, "value": "value8"}
+    # First block is fully used
+    assert len(updates) == 2
+    assert block_controller._model._get_counter("key") == 10
+
+    assert block_controller.post_many([{"value": f"value{i}"} for i in range(12)])[
+        -1
+    ] == {"key": 22, "other_key": 22, "value": "value11"}
+    assert len(updates) == 4
+    assert block_controller._model._get_counter("key") == 22
+
+
+def test_remaining_block_values_are_discarded_on_reset(
+    block_controller: layabase.CRUDController,
+):
+    block_controller.post({"value": "first"})
+    block_controller.delete({})
+    assert block_controller.post({"value": "first"}) == {
+        "key": 1,
+        "other_key": 1,
+        "value": "first",
+    }
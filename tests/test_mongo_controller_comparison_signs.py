@@ -1252,6 +1252,7 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                         {
                             "name": "X-Fields",
                             "in": "header",
@@ -1344,6 +1345,7 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                     ],
                     "tags": ["Test"],
                 },
@@ -389,6 +389,7 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                         {
                             "name": "X-Fields",
                             "in": "header",
@@ -478,3 +479,54 @@ def test_open_api_definition(client):
             "MaskError": {"description": "When any error occurs on mask"},
         },
     }
+
+
+def test_put_many_with_a_datetime_primary_key():
+    class DateCollection:
+        __collection_name__ = "test_date"
+
+        key = layabase.mongo.Column(datetime.datetime, is_primary_key=True)
+        datetime_str = layabase.mongo.Column(datetime.datetime)
+
+    controller = layabase.CRUDController(DateCollection)
+    layabase.load("mongomock", [controller])
+    controller.post_many(
+        [
+            {
+                "key": "2018-10-11T15:05:05.663456+02:00",
+                "datetime_str": "2016-09-23T23:59:59",
+            },
+            {"key": "2018-10-12T15:05:05", "datetime_str": "2016-09-23T23:59:59"},
+        ]
+    )
+    assert controller.put_many(
+        [
+            {
+                "key": "2018-10-11T15:05:05.663456+02:00",
+                "datetime_str": "1989-12-31T01:00:00.123456+01:00",
+            },
+            {"key": "2018-10-12T15:05:05", "datetime_str": "1989-12-31T01:00:00"},
+        ]
+    ) == (
+        [
+            {
+                "key": "2018-10-11T13:05:05.663000",
+                "datetime_str": "2016-09-23T23:59:59",
+            },
+            {"key": "2018-10-12T15:05:05", "datetime_str": "2016-09-23T23:59:59"},
+        ],
+        [
+            {
+                "key": "2018-10-11T13:05:05.663000",
+                "datetime_str": "1989-12-31T00:00:00.123000",
+            },
+            {"key": "2018-10-12T15:05:05", "datetime_str": "1989-12-31T01:00:00"},
+        ],
+    )
+    assert controller.get({}) == [
+        {
+            "key": "2018-10-11T13:05:05.663000",
+            "datetime_str": "1989-12-31T00:00:00.123000",
+        },
+        {"key": "2018-10-12T15:05:05", "datetime_str": "1989-12-31T01:00:00"},
+    ]
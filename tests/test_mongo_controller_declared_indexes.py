@@ -0,0 +1,172 @@
+import datetime
+
+import pymongo
+import pytest
+from layaberr import ValidationFailed
+
+import layabase
+import layabase.mongo
+
+
+def _indexes() -> list:
+    return [
+        layabase.mongo.Index(
+            "by_date", ("date", pymongo.DESCENDING), "key", is_sparse=True
+        ),
+        layabase.mongo.Index("by_code", "code", "dict_field.inner", is_unique=True),
+        layabase.mongo.Index("expiry", "date", expire_after_seconds=3600),
+    ]
+
+
+@pytest.fixture
+def controller():
+    class TestCollection:
+        __collection_name__ = "test"
+        __indexes__ = _indexes()
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        code = layabase.mongo.Column(str)
+        date = layabase.mongo.Column(datetime.datetime)
+        dict_field = layabase.mongo.DictColumn(
+            fields={"inner": layabase.mongo.Column(str)}
+        )
+
+    controller = layabase.CRUDController(TestCollection, audit=True)
+    layabase.load("mongomock", [controller])
+    return controller
+
+
+def test_declared_indexes_are_created(controller):
+    indexes = controller._model.__collection__.index_information()
+    assert indexes["by_date"]["key"] == [("date", -1), ("key", 1)]
+    assert indexes["by_date"]["sparse"] is True
+    assert indexes["by_code"]["key"] == [("code", 1), ("dict_field.inner", 1)]
+    assert indexes["by_code"]["unique"] is True
+    assert indexes["expiry"]["key"] == [("date", 1)]
+    assert indexes["expiry"]["expireAfterSeconds"] == 3600
+    assert indexes["uidxtest"]["key"] == [("key", 1)]
+    assert controller._model.update_indexes() == []
+
+
+def test_declared_indexes_do_not_apply_to_audit(controller):
+    assert sorted(controller._model.audit_model.__collection__.index_information()) == [
+        "_id_",
+        "uidxaudit_test",
+    ]
+
+
+def test_declared_unique_index_is_enforced(controller):
+    controller.post({"key": "key1", "code": "code1", "dict_field": {"inner": "1"}})
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.post({"key": "key2", "code": "code1", "dict_field": {"inner": "1"}})
+    assert exception_info.value.errors == {"": ["This document already exists."]}
+
+
+def test_modified_declared_index_is_updated(controller):
+    class TestCollection:
+        __collection_name__ = "test"
+        __indexes__ = [
+            layabase.mongo.Index("by_date", ("date", pymongo.DESCENDING), "code"),
+            layabase.mongo.Index("expiry", "date", expire_after_seconds=3600),
+        ]
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        code = layabase.mongo.Column(str)
+        date = layabase.mongo.Column(datetime.datetime)
+
+    other_controller = layabase.CRUDController(TestCollection, skip_update_indexes=True)
+    layabase.mongo.link(other_controller, controller._model.__collection__.database)
+    assert [
+        (change["action"], change["index"]["name"])
+        for change in other_controller._model.update_indexes()
+    ] == [("create", "by_date_1"), ("drop", "by_date"), ("drop", "by_code")]
+
+
+def test_declared_partial_filter_applies_to_valid_versions_only(monkeypatch):
+    class TestCollection:
+        __collection_name__ = "test"
+        __indexes__ = [
+            layabase.mongo.Index(
+                "by_code", "code", partial_filter={"code": {"$exists": True}}
+            )
+        ]
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        code = layabase.mongo.Column(str)
+
+    controller = layabase.CRUDController(TestCollection, history=True)
+    layabase.load("mongomock", [controller])
+    monkeypatch.setattr(controller._model, "_server_version", (4, 0, 0))
+    [(collection, indexes)] = controller._model._expected_indexes(None)
+    assert {index["name"]: index for index in indexes}["by_code"] == {
+        "name": "by_code",
+        "key": [("code", pymongo.ASCENDING)],
+        "unique": False,
+        "partialFilterExpression": {
+            "code": {"$exists": True},
+            "valid_until_revision": {"$lt": 0},
+        },
+    }
+
+
+def test_declared_index_on_unknown_field_is_invalid():
+    with pytest.raises(Exception) as exception_info:
+
+        class TestCollection(layabase._database_mongo._CRUDModel):
+            __collection_name__ = "test"
+            __indexes__ = [layabase.mongo.Index("by_code", "code", "other")]
+
+            key = layabase.mongo.Column(str, is_primary_key=True)
+
+    assert (
+        str(exception_info.value)
+        == "by_code index refers to unknown fields: code, other."
+    )
+
+
+def test_declared_index_cannot_use_a_reserved_name():
+    with pytest.raises(Exception) as exception_info:
+
+        class TestCollection(layabase._database_mongo._CRUDModel):
+            __collection_name__ = "test"
+            __indexes__ = [layabase.mongo.Index("uidxtest", "key")]
+
+            key = layabase.mongo.Column(str, is_primary_key=True)
+
+    assert (
+        str(exception_info.value)
+        == "uidxtest index name is already used by test fields."
+    )
+
+
+def test_ttl_index_must_have_a_single_key():
+    with pytest.raises(Exception) as exception_info:
+        layabase.mongo.Index("expiry", "date", "key", expire_after_seconds=10)
+    assert str(exception_info.value) == "expiry TTL index must have a single key."
+
+
+def test_sparse_index_cannot_be_partial():
+    with pytest.raises(Exception) as exception_info:
+        layabase.mongo.Index(
+            "by_code", "code", is_sparse=True, partial_filter={"code": "1"}
+        )
+    assert (
+        str(exception_info.value) == "by_code index cannot be both sparse and partial."
+    )
+
+
+def test_sparse_index_cannot_be_declared_on_a_versioned_collection():
+    class TestCollection:
+        __collection_name__ = "test"
+        __indexes__ = [layabase.mongo.Index("by_code", "code", is_sparse=True)]
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        code = layabase.mongo.Column(str)
+
+    controller = layabase.CRUDController(TestCollection, history=True)
+    with pytest.raises(Exception) as exception_info:
+        layabase.load("mongomock", [controller])
+    assert (
+        str(exception_info.value)
+        == "by_code index cannot be sparse as test is versioned."
+    )
@@ -319,3 +319,23 @@ def test_query_delete_parser_with_dict(client):
         "dict_col.second_key": [3],
         "key": ["4"],
     }
+
+
+def test_deprecated_validate_insert_validates_dict_fields(controller):
+    document = {"key": "my_key", "dict_col": {"first_key": "Value1"}}
+    with pytest.deprecated_call():
+        assert controller._model.validate_insert(document) == {
+            "dict_col.second_key": ["Missing data for required field."]
+        }
+    with pytest.deprecated_call():
+        assert controller._model.dict_col.validate_insert(document) == {
+            "dict_col.second_key": ["Missing data for required field."]
+        }
+    assert document == {"key": "my_key", "dict_col": {"first_key": "Value1"}}
+
+
+def test_deprecated_deserialize_insert_deserializes_dict_fields(controller):
+    document = {"key": "my_key", "dict_col": {"first_key": "Value1", "second_key": 3}}
+    with pytest.deprecated_call():
+        controller._model.deserialize_insert(document)
+    assert document == {"key": "my_key", "dict_col": {"first_key": 1, "second_key": 3}}
@@ -0,0 +1,84 @@
+import pytest
+from layaberr import ValidationFailed
+
+import layabase
+import layabase.mongo
+
+
+def _count_counter_updates(controller: layabase.CRUDController, monkeypatch) -> list:
+    counters = controller._model.__counters__
+    updates = []
+    find_one_and_update = counters.find_one_and_update
+
+    def count(*args, **kwargs):
+        updates.append(args)
+        return find_one_and_update(*args, **kwargs)
+
+    monkeypatch.setattr(counters, "find_one_and_update", count)
+    return updates
+
+
+@pytest.fixture
+def controller():
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        dict_field = layabase.mongo.DictColumn(
+            fields={
+                "id": layabase.mongo.Column(int, should_auto_increment=True),
+                "value": layabase.mongo.Column(int, is_nullable=False),
+            }
+        )
+        list_field = layabase.mongo.ListColumn(
+            layabase.mongo.DictColumn(
+                fields={
+                    "id": layabase.mongo.Column(
+                        int, should_auto_increment=True, counter=("list_id",)
+                    )
+                }
+            )
+        )
+
+    controller = layabase.CRUDController(TestCollection)
+    layabase.load("mongomock", [controller])
+    return controller
+
+
+def test_nested_values_are_reserved_once_per_counter(
+    controller: layabase.CRUDController, monkeypatch
+):
+    updates = _count_counter_updates(controller, monkeypatch)
+    assert controller.post_many(
+        [
+            {"key": "1", "dict_field": {"value": 1}, "list_field": [{}, {}]},
+            {"key": "2", "dict_field": {"value": 2}, "list_field": [{}]},
+        ]
+    ) == [
+        {
+            "key": "1",
+            "dict_field": {"id": 1, "value": 1},
+            "list_field": [{"id": 1}, {"id": 2}],
+        },
+        {"key": "2", "dict_field": {"id": 2, "value": 2}, "list_field": [{"id": 3}],},
+    ]
+    assert len(updates) == 2
+    # Nested counters are stored alongside the ones of the collection
+    assert controller._model._get_counter("id") == 2
+    assert controller._model._get_counter("list_id") == 3
+
+
+def test_nested_values_are_not_reserved_if_invalid(
+    controller: layabase.CRUDController, monkeypatch
+):
+    updates = _count_counter_updates(controller, monkeypatch)
+    with pytest.raises(ValidationFailed):
+        controller.post_many(
+            [{"key": "1", "dict_field": {"value": 1}}, {"key": "2", "dict_field": {}},]
+        )
+    assert updates == []
+    assert controller.post({"key": "1", "dict_field": {"value": 1}}) == {
+        "key": "1",
+        "dict_field": {"id": 1, "value": 1},
+        "list_field": None,
+    }
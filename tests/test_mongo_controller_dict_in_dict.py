@@ -78,3 +78,181 @@ def test_get_with_dot_notation_multi_level_is_valid(controller):
             "key": "my_key",
         }
     ] == controller.get({"dict_field.first_key.inner_key1": EnumTest.Value1})
+
+
+def test_post_does_not_modify_provided_document(controller):
+    document = {
+        "key": "my_key",
+        "dict_field": {
+            "first_key": {"inner_key1": "Value1", "inner_key2": "3"},
+            "second_key": 3,
+        },
+    }
+    assert controller.post(document) == {
+        "key": "my_key",
+        "dict_field": {
+            "first_key": {"inner_key1": "Value1", "inner_key2": 3},
+            "second_key": 3,
+        },
+    }
+    assert document == {
+        "key": "my_key",
+        "dict_field": {
+            "first_key": {"inner_key1": "Value1", "inner_key2": "3"},
+            "second_key": 3,
+        },
+    }
+
+
+def test_post_many_with_dot_notation_does_not_modify_provided_documents(controller):
+    documents = [
+        {
+            "key": "my_key",
+            "dict_field": {"second_key": 3},
+            "dict_field.first_key": {"inner_key1": "Value2", "inner_key2": 1},
+        }
+    ]
+    assert controller.post_many(documents) == [
+        {
+            "key": "my_key",
+            "dict_field": {
+                "first_key": {"inner_key1": "Value2", "inner_key2": 1},
+                "second_key": 3,
+            },
+        }
+    ]
+    assert documents == [
+        {
+            "key": "my_key",
+            "dict_field": {"second_key": 3},
+            "dict_field.first_key": {"inner_key1": "Value2", "inner_key2": 1},
+        }
+    ]
+
+
+def test_put_many_does_not_modify_provided_documents(controller):
+    controller.post(
+        {
+            "key": "my_key",
+            "dict_field": {
+                "first_key": {"inner_key1": "Value1", "inner_key2": 3},
+                "second_key": 3,
+            },
+        }
+    )
+    documents = [
+        {
+            "key": "my_key",
+            "dict_field": {
+                "first_key": {"inner_key1": "Value2", "inner_key2": "4"},
+                "second_key": 4,
+            },
+        }
+    ]
+    assert controller.put_many(documents)[1] == [
+        {
+            "key": "my_key",
+            "dict_field": {
+                "first_key": {"inner_key1": "Value2", "inner_key2": 4},
+                "second_key": 4,
+            },
+        }
+    ]
+    assert documents == [
+        {
+            "key": "my_key",
+            "dict_field": {
+                "first_key": {"inner_key1": "Value2", "inner_key2": "4"},
+                "second_key": 4,
+            },
+        }
+    ]
+
+
+def test_put_many_with_dot_notation_returns_stored_documents(controller):
+    controller.post_many(
+        [
+            {
+                "key": "my_key",
+                "dict_field": {
+                    "first_key": {"inner_key1": "Value1", "inner_key2": 3},
+                    "second_key": 3,
+                },
+            },
+            {
+                "key": "my_key2",
+                "dict_field": {
+                    "first_key": {"inner_key1": "Value1", "inner_key2": 4},
+                    "second_key": 4,
+                },
+            },
+        ]
+    )
+    previous_documents, new_documents = controller.put_many(
+        [
+            {"key": "my_key", "dict_field.second_key": 5},
+            {
+                "key": "my_key2",
+                "dict_field.first_key": {"inner_key1": "Value2", "inner_key2": 6},
+            },
+        ]
+    )
+    assert previous_documents == [
+        {
+            "key": "my_key",
+            "dict_field": {
+                "first_key": {"inner_key1": "Value1", "inner_key2": 3},
+                "second_key": 3,
+            },
+        },
+        {
+            "key": "my_key2",
+            "dict_field": {
+                "first_key": {"inner_key1": "Value1", "inner_key2": 4},
+                "second_key": 4,
+            },
+        },
+    ]
+    assert new_documents == [
+        {
+            "key": "my_key",
+            "dict_field": {
+                "first_key": {"inner_key1": "Value1", "inner_key2": 3},
+                "second_key": 5,
+            },
+        },
+        {
+            "key": "my_key2",
+            "dict_field": {
+                "first_key": {"inner_key1": "Value2", "inner_key2": 6},
+                "second_key": 4,
+            },
+        },
+    ]
+    assert controller.get({}) == new_documents
+
+
+def test_put_many_twice_the_same_document_is_applied_in_order(controller):
+    controller.post(
+        {
+            "key": "my_key",
+            "dict_field": {
+                "first_key": {"inner_key1": "Value1", "inner_key2": 3},
+                "second_key": 3,
+            },
+        }
+    )
+    previous_documents, new_documents = controller.put_many(
+        [
+            {"key": "my_key", "dict_field.second_key": 4},
+            {"key": "my_key", "dict_field.second_key": 5},
+        ]
+    )
+    assert [
+        document["dict_field"]["second_key"] for document in previous_documents
+    ] == [3, 4,]
+    assert [document["dict_field"]["second_key"] for document in new_documents] == [
+        4,
+        5,
+    ]
+    assert controller.get({}) == [new_documents[1]]
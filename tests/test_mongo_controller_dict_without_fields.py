@@ -395,6 +395,7 @@ def test_open_api_definition(client):
                             "name": "offset",
                             "type": "integer",
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                         {
                             "description": "An optional " "fields mask",
                             "format": "mask",
@@ -482,6 +483,7 @@ def test_open_api_definition(client):
                             "name": "offset",
                             "type": "integer",
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                     ],
                     "responses": {"200": {"description": "Success"}},
                     "tags": ["Test"],
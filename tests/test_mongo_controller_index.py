@@ -55,6 +55,31 @@ def test_get_one_and_multiple_results_is_invalid(controller):
     assert {} == exception_info.value.received_data
 
 
+def test_get_one_is_performed_with_a_single_query(controller, monkeypatch):
+    controller.post({"unique_key": "test", "non_unique_key": "2017-01-01"})
+    controller.post({"unique_key": "test2", "non_unique_key": "2017-01-01"})
+    collection = controller._model.__collection__
+    queries = []
+    find = collection.find
+
+    def find_and_count(*args, **kwargs):
+        queries.append(kwargs)
+        return find(*args, **kwargs)
+
+    monkeypatch.setattr(collection, "find", find_and_count)
+    monkeypatch.setattr(collection, "count_documents", None)
+    monkeypatch.setattr(collection, "find_one", None)
+
+    assert controller.get_one({"unique_key": "test"}) == {
+        "non_unique_key": "2017-01-01",
+        "unique_key": "test",
+    }
+    assert controller.get_one({"unique_key": "unknown"}) == {}
+    with pytest.raises(ValidationFailed):
+        controller.get_one({"non_unique_key": "2017-01-01"})
+    assert queries == [{"limit": 2}, {"limit": 2}, {"limit": 2}]
+
+
 def test_get_one_is_valid(controller):
     controller.post({"unique_key": "test", "non_unique_key": "2017-01-01"})
     controller.post({"unique_key": "test2", "non_unique_key": "2017-01-01"})
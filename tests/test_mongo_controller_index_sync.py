@@ -0,0 +1,204 @@
+import logging
+
+import pymongo
+import pytest
+
+import layabase
+import layabase.mongo
+
+
+@pytest.fixture
+def base():
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        value = layabase.mongo.Column(str)
+
+    return layabase.load("mongomock", [layabase.CRUDController(TestCollection)])
+
+
+def _index_keys(base) -> dict:
+    return {
+        name: index["key"]
+        for name, index in base["test"].index_information().items()
+        if name != "_id_"
+    }
+
+
+def test_indexes_are_not_updated_when_unchanged(base):
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        value = layabase.mongo.Column(str)
+
+    controller = layabase.CRUDController(TestCollection)
+    layabase.mongo.link(controller, base)
+    assert controller._model.update_indexes() == []
+    assert _index_keys(base) == {"uidxtest": [("key", 1)]}
+
+
+def test_new_index_is_created_without_dropping_others(base):
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        value = layabase.mongo.Column(str, index_type=layabase.mongo.IndexType.Other)
+
+    controller = layabase.CRUDController(TestCollection, skip_update_indexes=True)
+    layabase.mongo.link(controller, base)
+    assert controller._model.update_indexes() == [
+        {
+            "collection": "test",
+            "action": "create",
+            "index": {
+                "name": "idxtest",
+                "key": [("value", pymongo.ASCENDING)],
+                "unique": False,
+            },
+        }
+    ]
+    assert _index_keys(base) == {
+        "uidxtest": [("key", 1)],
+        "idxtest": [("value", 1)],
+    }
+
+
+def test_modified_index_is_created_before_dropping_previous_one(base):
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        value = layabase.mongo.Column(str, is_primary_key=True)
+
+    controller = layabase.CRUDController(TestCollection, skip_update_indexes=True)
+    layabase.mongo.link(controller, base)
+    assert controller._model.update_indexes() == [
+        {
+            "collection": "test",
+            "action": "create",
+            "index": {
+                "name": "uidxtest_1",
+                "key": [("key", pymongo.ASCENDING), ("value", pymongo.ASCENDING)],
+                "unique": True,
+            },
+        },
+        {
+            "collection": "test",
+            "action": "drop",
+            "index": {
+                "name": "uidxtest",
+                "key": [("key", pymongo.ASCENDING)],
+                "unique": True,
+            },
+        },
+    ]
+    assert _index_keys(base) == {"uidxtest_1": [("key", 1), ("value", 1)]}
+    # Index is kept whatever its name
+    assert controller._model.update_indexes() == []
+
+
+def test_index_with_same_keys_is_dropped_first(base):
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(
+            str, is_nullable=False, index_type=layabase.mongo.IndexType.Other
+        )
+        value = layabase.mongo.Column(str)
+
+    controller = layabase.CRUDController(TestCollection, skip_update_indexes=True)
+    layabase.mongo.link(controller, base)
+    assert [
+        (change["action"], change["index"]["name"])
+        for change in controller._model.update_indexes()
+    ] == [("drop", "uidxtest"), ("create", "idxtest")]
+    assert base["test"].index_information()["idxtest"].get("unique", False) is False
+
+
+def test_unknown_index_is_dropped(base):
+    base["test"].create_index([("value", pymongo.DESCENDING)], name="custom")
+
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        value = layabase.mongo.Column(str)
+
+    controller = layabase.CRUDController(TestCollection)
+    layabase.mongo.link(controller, base)
+    assert _index_keys(base) == {"uidxtest": [("key", 1)]}
+
+
+def test_plan_update_indexes_only_logs_changes(base, caplog):
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        value = layabase.mongo.Column(str, index_type=layabase.mongo.IndexType.Other)
+
+    controller = layabase.CRUDController(TestCollection, plan_update_indexes=True)
+    with caplog.at_level(logging.INFO):
+        layabase.mongo.link(controller, base)
+    assert _index_keys(base) == {"uidxtest": [("key", 1)]}
+    assert (
+        "Would create {'name': 'idxtest', 'key': [('value', 1)], 'unique': False} index on test."
+        in caplog.messages
+    )
+    assert [
+        change["action"] for change in controller._model.update_indexes(dry_run=True)
+    ] == ["create"]
+    assert _index_keys(base) == {"uidxtest": [("key", 1)]}
+
+
+def test_plan_update_indexes_only_logs_audit_changes(base, caplog):
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+        value = layabase.mongo.Column(str)
+
+    controller = layabase.CRUDController(
+        TestCollection, audit=True, plan_update_indexes=True
+    )
+    with caplog.at_level(logging.INFO):
+        layabase.mongo.link(controller, base)
+    assert "audit_test" not in base.list_collection_names()
+    assert (
+        "Would create {'name': 'uidxaudit_test', 'key': [('key', 1), ('revision', 1)], 'unique': True} index on audit_test."
+        in caplog.messages
+    )
+    assert [
+        (change["collection"], change["action"])
+        for change in controller._model.update_indexes(dry_run=True)
+    ] == [("audit_test", "create")]
+    assert "audit_test" not in base.list_collection_names()
+
+
+def test_skip_update_indexes_applies_to_audit(base):
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+
+    controller = layabase.CRUDController(
+        TestCollection, audit=True, skip_update_indexes=True
+    )
+    layabase.mongo.link(controller, base)
+    assert "audit_test" not in base.list_collection_names()
+
+
+def test_versioned_indexes_are_not_updated_when_unchanged():
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(str, is_primary_key=True)
+
+    controller = layabase.CRUDController(
+        TestCollection, history=True, history_collection=True
+    )
+    layabase.load("mongomock", [controller])
+    assert controller._model.update_indexes() == []
+    assert "ridxtest" in controller._model.__history__.index_information()
+    assert "aidxtest" in controller._model.__history__.index_information()
@@ -0,0 +1,105 @@
+import pytest
+from layaberr import ValidationFailed
+
+import layabase
+import layabase.mongo
+
+
+class TestCollection:
+    __collection_name__ = "test"
+
+    key = layabase.mongo.Column(is_primary_key=True)
+    other_key = layabase.mongo.Column(int, is_primary_key=True)
+    value = layabase.mongo.Column(int)
+
+
+@pytest.fixture
+def controller():
+    controller = layabase.CRUDController(TestCollection)
+    layabase.load("mongomock", [controller])
+    controller.post_many(
+        [
+            {"key": "key1", "other_key": 2, "value": 1},
+            {"key": "key2", "other_key": 1, "value": 1},
+            {"key": "key1", "other_key": 1, "value": 2},
+            {"key": "key3", "other_key": 1, "value": 1},
+        ]
+    )
+    return controller
+
+
+@pytest.fixture
+def versioned_controller():
+    controller = layabase.CRUDController(TestCollection, history=True)
+    layabase.load("mongomock", [controller])
+    controller.post_many(
+        [
+            {"key": "key1", "other_key": 1, "value": 1},
+            {"key": "key2", "other_key": 1, "value": 1},
+        ]
+    )
+    controller.put({"key": "key1", "other_key": 1, "value": 2})
+    return controller
+
+
+def test_get_page_without_limit_returns_everything(
+    controller: layabase.CRUDController,
+):
+    documents, after = controller.get_page({})
+    assert [(document["key"], document["other_key"]) for document in documents] == [
+        ("key1", 1),
+        ("key1", 2),
+        ("key2", 1),
+        ("key3", 1),
+    ]
+    assert after is None
+
+
+def test_get_pages_ordered_by_primary_keys(controller: layabase.CRUDController):
+    documents, after = controller.get_page({"limit": 3})
+    assert [(document["key"], document["other_key"]) for document in documents] == [
+        ("key1", 1),
+        ("key1", 2),
+        ("key2", 1),
+    ]
+
+    documents, after = controller.get_page({"limit": 3, "after": after})
+    assert documents == [{"key": "key3", "other_key": 1, "value": 1}]
+    assert after is None
+
+
+def test_get_pages_with_filter(controller: layabase.CRUDController):
+    documents, after = controller.get_page({"value": 1, "limit": 2})
+    assert [(document["key"], document["other_key"]) for document in documents] == [
+        ("key1", 2),
+        ("key2", 1),
+    ]
+
+    # after can also be provided to get
+    assert controller.get({"value": 1, "after": after}) == [
+        {"key": "key3", "other_key": 1, "value": 1}
+    ]
+
+
+def test_get_page_with_invalid_token(controller: layabase.CRUDController):
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.get_page({"after": "invalid"})
+    assert exception_info.value.errors == {"after": ["Invalid continuation token."]}
+
+
+def test_versioned_get_pages_only_returns_valid_documents(
+    versioned_controller: layabase.CRUDController,
+):
+    documents, after = versioned_controller.get_page({"limit": 1})
+    assert documents == [
+        {
+            "key": "key1",
+            "other_key": 1,
+            "value": 2,
+            "valid_since_revision": 2,
+            "valid_until_revision": -1,
+        }
+    ]
+
+    documents, after = versioned_controller.get_page({"limit": 1, "after": after})
+    assert [document["key"] for document in documents] == ["key2"]
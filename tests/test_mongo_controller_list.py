@@ -185,6 +185,7 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                         {
                             "name": "X-Fields",
                             "in": "header",
@@ -263,6 +264,7 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                     ],
                     "tags": ["Test"],
                 },
@@ -649,3 +651,24 @@ def test_query_delete_parser_with_list_of_dict(client):
         "key": ["test"],
         "list_field": [[1, 2]],
     }
+
+
+def test_deprecated_list_validate_and_deserialize_insert(controller):
+    document = {
+        "key": "my_key",
+        "list_field": [
+            {"first_key": "Value1", "second_key": 1},
+            {"first_key": "Value2"},
+        ],
+    }
+    with pytest.deprecated_call():
+        assert controller._model.list_field.validate_insert(document) == {
+            "list_field.second_key[1]": ["Missing data for required field."]
+        }
+    document["list_field"][1]["second_key"] = 2
+    with pytest.deprecated_call():
+        controller._model.list_field.deserialize_insert(document)
+    assert document["list_field"] == [
+        {"first_key": 1, "second_key": 1},
+        {"first_key": 2, "second_key": 2},
+    ]
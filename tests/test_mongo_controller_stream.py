@@ -0,0 +1,74 @@
+import pytest
+from layaberr import ValidationFailed
+
+import layabase
+import layabase.mongo
+
+
+class TestCollection:
+    __collection_name__ = "test"
+
+    key = layabase.mongo.Column(is_primary_key=True)
+    value = layabase.mongo.Column(int)
+
+
+@pytest.fixture
+def controller():
+    controller = layabase.CRUDController(TestCollection)
+    layabase.load("mongomock", [controller])
+    return controller
+
+
+@pytest.fixture
+def versioned_controller():
+    controller = layabase.CRUDController(TestCollection, history=True)
+    layabase.load("mongomock", [controller])
+    return controller
+
+
+def test_stream_without_providing_a_dictionary(controller: layabase.CRUDController):
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.stream("")
+    assert exception_info.value.errors == {"": ["Must be a dictionary."]}
+    assert exception_info.value.received_data == ""
+
+
+def test_stream_with_invalid_filter(controller: layabase.CRUDController):
+    # Validation is performed before retrieving the first document
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.stream({"value": "not an int"})
+    assert exception_info.value.errors == {"value": ["Not a valid int."]}
+
+
+def test_stream_is_fetching_everything_by_batch(controller: layabase.CRUDController):
+    controller.post_many([{"key": f"my_key{index}", "value": 1} for index in range(5)])
+    controller.post({"key": "other_key", "value": 2})
+    assert list(controller.stream({"value": 1}, fetch_size=2)) == [
+        {"key": f"my_key{index}", "value": 1} for index in range(5)
+    ]
+
+
+def test_stream_with_limit_and_offset(controller: layabase.CRUDController):
+    controller.post_many([{"key": f"my_key{index}", "value": 1} for index in range(5)])
+    assert list(controller.stream({"limit": 2, "offset": 1}, fetch_size=1)) == [
+        {"key": "my_key1", "value": 1},
+        {"key": "my_key2", "value": 1},
+    ]
+
+
+def test_versioned_stream_is_only_fetching_valid_documents(
+    versioned_controller: layabase.CRUDController,
+):
+    versioned_controller.post_many(
+        [{"key": "my_key1", "value": 1}, {"key": "my_key2", "value": 1}]
+    )
+    versioned_controller.put({"key": "my_key1", "value": 2})
+    versioned_controller.delete({"key": "my_key2"})
+    assert list(versioned_controller.stream({})) == [
+        {
+            "key": "my_key1",
+            "value": 2,
+            "valid_since_revision": 2,
+            "valid_until_revision": -1,
+        }
+    ]
@@ -1,3 +1,4 @@
+import datetime
 import enum
 
 import flask
@@ -483,6 +484,102 @@ def test_versioned_many(controller: layabase.CRUDController):
     ]
 
 
+def test_put_many_returns_documents_in_requested_order(
+    controller: layabase.CRUDController,
+):
+    controller.post_many(
+        [
+            {"key": "first", "dict_field": {"first_key": "Value1", "second_key": 1}},
+            {"key": "second", "dict_field": {"first_key": "Value1", "second_key": 2}},
+        ]
+    )
+    assert controller.put_many(
+        [
+            {"key": "second", "dict_field.second_key": 3},
+            {"key": "first", "dict_field.first_key": "Value2"},
+        ]
+    ) == (
+        [
+            {
+                "key": "second",
+                "dict_field": {"first_key": "Value1", "second_key": 2},
+                "valid_since_revision": 1,
+                "valid_until_revision": -1,
+            },
+            {
+                "key": "first",
+                "dict_field": {"first_key": "Value1", "second_key": 1},
+                "valid_since_revision": 1,
+                "valid_until_revision": -1,
+            },
+        ],
+        [
+            {
+                "key": "second",
+                "dict_field": {"first_key": "Value1", "second_key": 3},
+                "valid_since_revision": 2,
+                "valid_until_revision": -1,
+            },
+            {
+                "key": "first",
+                "dict_field": {"first_key": "Value2", "second_key": 1},
+                "valid_since_revision": 2,
+                "valid_until_revision": -1,
+            },
+        ],
+    )
+
+
+def test_put_many_round_trips_do_not_depend_on_the_number_of_documents(
+    controller: layabase.CRUDController, monkeypatch
+):
+    controller.post_many(
+        [
+            {"key": f"key{i}", "dict_field": {"first_key": "Value1", "second_key": i}}
+            for i in range(10)
+        ]
+    )
+    collection = controller._model.__collection__
+    calls = []
+    for method_name in ["find", "find_one", "find_one_and_update", "bulk_write"]:
+        method = getattr(collection, method_name)
+
+        def record(*args, method_name=method_name, method=method, **kwargs):
+            calls.append(method_name)
+            return method(*args, **kwargs)
+
+        monkeypatch.setattr(collection, method_name, record)
+
+    controller.put_many(
+        [{"key": f"key{i}", "dict_field.second_key": i + 1} for i in range(10)]
+    )
+    assert calls == ["find", "bulk_write", "find"]
+
+
+def test_put_many_with_an_unknown_document_does_not_create_a_revision(
+    controller: layabase.CRUDController,
+):
+    controller.post(
+        {"key": "first", "dict_field": {"first_key": "Value1", "second_key": 1}}
+    )
+    with pytest.raises(ModelCouldNotBeFound):
+        controller.put_many(
+            [
+                {"key": "first", "dict_field.second_key": 2},
+                {"key": "unknown", "dict_field.second_key": 2},
+            ]
+        )
+    assert controller.get_history({}) == [
+        {
+            "key": "first",
+            "dict_field": {"first_key": "Value1", "second_key": 1},
+            "valid_since_revision": 1,
+            "valid_until_revision": -1,
+        }
+    ]
+    assert controller._model.current_revision() == 1
+
+
 def test_rollback_without_revision_is_invalid(controller: layabase.CRUDController):
     with pytest.raises(ValidationFailed) as exception_info:
         controller.rollback_to({"key": "unknown"})
@@ -689,6 +786,78 @@ def test_rollback_multiple_rows_is_valid(controller: layabase.CRUDController):
     ]
 
 
+def test_rollback_dry_run_does_not_modify_anything(
+    controller: layabase.CRUDController,
+):
+    controller.post_many(
+        [
+            {"key": "1", "dict_field": {"first_key": "Value1", "second_key": 1}},
+            {"key": "2", "dict_field": {"first_key": "Value1", "second_key": 1}},
+        ]
+    )
+    controller.put_many(
+        [
+            {"key": "1", "dict_field.second_key": 2},
+            {"key": "2", "dict_field.second_key": 2},
+        ]
+    )
+    controller.post(
+        {"key": "3", "dict_field": {"first_key": "Value1", "second_key": 1}}
+    )
+    history = controller.get_history({})
+
+    # Update key 1 and key 2, remove key 3
+    assert controller.rollback_to({"revision": 1}, dry_run=True) == 3
+    assert controller.get_history({}) == history
+    assert controller._model.current_revision() == 3
+
+    assert controller.rollback_to({"revision": 1}) == 3
+
+
+def test_rollback_dry_run_with_filter(controller: layabase.CRUDController):
+    controller.post(
+        {"key": "1", "dict_field": {"first_key": "Value1", "second_key": 1}}
+    )
+    controller.put({"key": "1", "dict_field.second_key": 2})
+    controller.post(
+        {"key": "2", "dict_field": {"first_key": "Value1", "second_key": 1}}
+    )
+
+    assert controller.rollback_to({"revision": 1, "key": "2"}, dry_run=True) == 1
+    assert controller.rollback_to({"revision": 1, "key": "1"}, dry_run=True) == 1
+    assert controller.rollback_to({"revision": 0}, dry_run=True) == 2
+
+
+def test_rollback_invalidates_current_versions_at_once(
+    controller: layabase.CRUDController, monkeypatch
+):
+    controller.post_many(
+        [
+            {"key": f"key{i}", "dict_field": {"first_key": "Value1", "second_key": i}}
+            for i in range(10)
+        ]
+    )
+    controller.put_many(
+        [{"key": f"key{i}", "dict_field.second_key": i + 1} for i in range(10)]
+    )
+    collection = controller._model.__collection__
+    calls = []
+    for method_name in ["find_one_and_update", "update_many"]:
+        method = getattr(collection, method_name)
+
+        def record(*args, method_name=method_name, method=method, **kwargs):
+            calls.append(method_name)
+            return method(*args, **kwargs)
+
+        monkeypatch.setattr(collection, method_name, record)
+
+    assert controller.rollback_to({"revision": 1}) == 10
+    assert calls == ["update_many", "update_many"]
+    assert [
+        document["dict_field"]["second_key"] for document in controller.get({})
+    ] == list(range(10))
+
+
 def test_open_api_definition(client):
     response = client.get("/swagger.json")
     assert response.json == {
@@ -799,6 +968,13 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
+                        {
+                            "name": "as_of_revision",
+                            "in": "query",
+                            "type": "integer",
+                            "minimum": 0,
+                        },
                         {
                             "name": "X-Fields",
                             "in": "header",
@@ -1035,3 +1211,92 @@ def test_query_rollback_parser(client):
         "key": ["test"],
         "revision": 2,
     }
+
+
+def test_last_revision_index_is_created(controller: layabase.CRUDController):
+    indexes = controller._model.__collection__.index_information()
+    assert indexes["ridxtest"]["key"] == [
+        ("key", 1),
+        ("valid_since_revision", -1),
+    ]
+
+
+def test_get_last_retrieves_a_single_removed_version(
+    controller: layabase.CRUDController, monkeypatch
+):
+    controller.post(
+        {"key": "1", "dict_field": {"first_key": "Value1", "second_key": 1}}
+    )
+    for second_key in range(2, 10):
+        controller.put({"key": "1", "dict_field.second_key": second_key})
+    controller.delete({"key": "1"})
+
+    collection = controller._model.__collection__
+    find = collection.find
+    retrieved = []
+
+    def record(*args, **kwargs):
+        documents = list(find(*args, **kwargs))
+        retrieved.extend(documents)
+        return iter(documents)
+
+    monkeypatch.setattr(collection, "find", record)
+    assert controller.get_last({"key": "1"}) == {
+        "dict_field": {"first_key": "Value1", "second_key": 9},
+        "key": "1",
+        "valid_since_revision": 9,
+        "valid_until_revision": 10,
+    }
+    assert len(retrieved) == 1
+
+
+def test_put_many_with_a_datetime_primary_key():
+    class DateCollection:
+        __collection_name__ = "test_date"
+
+        key = layabase.mongo.Column(datetime.datetime, is_primary_key=True)
+        value = layabase.mongo.Column(int)
+
+    controller = layabase.CRUDController(DateCollection, history=True)
+    layabase.load("mongomock", [controller])
+    controller.post_many(
+        [
+            {"key": "2018-10-11T15:05:05.663456+02:00", "value": 1},
+            {"key": "2018-10-12T15:05:05", "value": 1},
+        ]
+    )
+    assert controller.put_many(
+        [
+            {"key": "2018-10-11T15:05:05.663456+02:00", "value": 2},
+            {"key": "2018-10-12T15:05:05", "value": 2},
+        ]
+    ) == (
+        [
+            {
+                "key": "2018-10-11T13:05:05.663000",
+                "value": 1,
+                "valid_since_revision": 1,
+                "valid_until_revision": -1,
+            },
+            {
+                "key": "2018-10-12T15:05:05",
+                "value": 1,
+                "valid_since_revision": 1,
+                "valid_until_revision": -1,
+            },
+        ],
+        [
+            {
+                "key": "2018-10-11T13:05:05.663000",
+                "value": 2,
+                "valid_since_revision": 2,
+                "valid_until_revision": -1,
+            },
+            {
+                "key": "2018-10-12T15:05:05",
+                "value": 2,
+                "valid_since_revision": 2,
+                "valid_until_revision": -1,
+            },
+        ],
+    )
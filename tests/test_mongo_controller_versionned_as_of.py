@@ -0,0 +1,102 @@
+import flask
+import pytest
+from layaberr import ValidationFailed
+
+import layabase
+import layabase.mongo
+
+
+@pytest.fixture(
+    params=[{}, {"history_collection": True}, {"history_snapshot_interval": 2}],
+    ids=["same_collection", "history_collection", "deltas"],
+)
+def controller(request):
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(is_primary_key=True)
+        value = layabase.mongo.Column(int)
+
+    controller = layabase.CRUDController(TestCollection, history=True, **request.param)
+    layabase.load("mongomock", [controller])
+    return controller
+
+
+@pytest.fixture
+def revisions(controller: layabase.CRUDController):
+    controller.post_many([{"key": "1", "value": 1}, {"key": "2", "value": 1}])
+    controller.put({"key": "1", "value": 2})
+    controller.delete({"key": "2"})
+    controller.post({"key": "3", "value": 1})
+    controller.put({"key": "1", "value": 3})
+
+
+def _version(key: str, value: int, since: int, until: int = -1) -> dict:
+    return {
+        "key": key,
+        "value": value,
+        "valid_since_revision": since,
+        "valid_until_revision": until,
+    }
+
+
+def _sorted(documents: list) -> list:
+    return sorted(documents, key=lambda document: document["key"])
+
+
+def test_get_as_of_before_first_revision(
+    controller: layabase.CRUDController, revisions
+):
+    assert controller.get_as_of(0, {}) == []
+
+
+def test_get_as_of_each_revision(controller: layabase.CRUDController, revisions):
+    assert _sorted(controller.get_as_of(1, {})) == [
+        _version("1", 1, 1, 2),
+        _version("2", 1, 1, 3),
+    ]
+    assert _sorted(controller.get_as_of(2, {})) == [
+        _version("1", 2, 2, 5),
+        _version("2", 1, 1, 3),
+    ]
+    assert _sorted(controller.get_as_of(3, {})) == [_version("1", 2, 2, 5)]
+    assert _sorted(controller.get_as_of(4, {})) == [
+        _version("1", 2, 2, 5),
+        _version("3", 1, 4),
+    ]
+    assert _sorted(controller.get_as_of(5, {})) == _sorted(controller.get({}))
+
+
+def test_get_as_of_with_filters(controller: layabase.CRUDController, revisions):
+    assert controller.get_as_of(2, {"value": 1}) == [_version("2", 1, 1, 3)]
+    assert controller.get_as_of(4, {"key": "3"}) == [_version("3", 1, 4)]
+    assert len(controller.get_as_of(4, {"limit": 1})) == 1
+    assert controller.get_as_of(
+        2, {"valid_until_revision": -1}
+    ) == controller.get_as_of(2, {})
+
+
+def test_get_with_as_of_revision(controller: layabase.CRUDController, revisions):
+    assert _sorted(controller.get({"as_of_revision": 1})) == [
+        _version("1", 1, 1, 2),
+        _version("2", 1, 1, 3),
+    ]
+
+
+def test_get_as_of_with_invalid_revision(controller: layabase.CRUDController):
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.get_as_of("invalid", {})
+    assert exception_info.value.errors == {"as_of_revision": ["Not a valid int."]}
+
+
+def test_as_of_revision_query_parameter(controller: layabase.CRUDController):
+    with flask.Flask(__name__).test_request_context("/test?as_of_revision=3"):
+        assert controller.query_get_parser.parse_args()["as_of_revision"] == 3
+
+
+def test_as_of_index_is_created(controller: layabase.CRUDController):
+    for collection in controller._model._versions_collections():
+        assert collection.index_information()["aidxtest"]["key"] == [
+            ("valid_until_revision", 1),
+            ("valid_since_revision", 1),
+        ]
@@ -0,0 +1,224 @@
+import datetime
+
+import pytest
+
+import layabase
+import layabase.mongo
+
+
+@pytest.fixture(params=[False, True], ids=["same_collection", "history_collection"])
+def controller(request):
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(is_primary_key=True)
+        value = layabase.mongo.Column(int)
+        description = layabase.mongo.Column()
+        dict_field = layabase.mongo.DictColumn(
+            fields={
+                "first_key": layabase.mongo.Column(int),
+                "second_key": layabase.mongo.Column(int),
+            }
+        )
+
+    controller = layabase.CRUDController(
+        TestCollection,
+        history=True,
+        history_collection=request.param,
+        history_snapshot_interval=3,
+    )
+    layabase.load("mongomock", [controller])
+    return controller
+
+
+def _expired(controller: layabase.CRUDController) -> list:
+    collection = controller._model._expired_collection()
+    return [
+        {
+            field_name: value
+            for field_name, value in document.items()
+            if field_name != "_id"
+        }
+        for document in collection.find(
+            {"valid_until_revision": {"$ne": -1}}, sort=[("valid_since_revision", 1)],
+        )
+    ]
+
+
+def _version(revision: int, value: int, until: int = -1) -> dict:
+    return {
+        "key": "1",
+        "value": value,
+        "description": "a long description",
+        "dict_field": {"first_key": 1, "second_key": 2},
+        "valid_since_revision": revision,
+        "valid_until_revision": until,
+    }
+
+
+@pytest.fixture
+def updated(controller: layabase.CRUDController):
+    controller.post(
+        {
+            "key": "1",
+            "value": 1,
+            "description": "a long description",
+            "dict_field": {"first_key": 1, "second_key": 2},
+        }
+    )
+    for value in range(2, 6):
+        controller.put({"key": "1", "value": value})
+
+
+def test_only_updated_fields_are_stored_between_snapshots(
+    controller: layabase.CRUDController, updated
+):
+    assert _expired(controller) == [
+        {
+            "key": "1",
+            "value": 1,
+            "valid_since_revision": 1,
+            "valid_until_revision": 2,
+            "_delta": [],
+        },
+        {
+            "key": "1",
+            "value": 2,
+            "valid_since_revision": 2,
+            "valid_until_revision": 3,
+            "_delta": [],
+        },
+        {
+            "key": "1",
+            "value": 3,
+            "description": "a long description",
+            "dict_field": {"first_key": 1, "second_key": 2},
+            "valid_since_revision": 3,
+            "valid_until_revision": 4,
+        },
+        {
+            "key": "1",
+            "value": 4,
+            "valid_since_revision": 4,
+            "valid_until_revision": 5,
+            "_delta": [],
+        },
+    ]
+
+
+def test_get_history_reconstructs_versions(
+    controller: layabase.CRUDController, updated
+):
+    assert sorted(
+        controller.get_history({}), key=lambda version: version["valid_since_revision"]
+    ) == [
+        _version(1, 1, 2),
+        _version(2, 2, 3),
+        _version(3, 3, 4),
+        _version(4, 4, 5),
+        _version(5, 5),
+    ]
+
+
+def test_get_history_filters_reconstructed_versions(
+    controller: layabase.CRUDController, updated
+):
+    assert controller.get_history({"value": 1}) == [_version(1, 1, 2)]
+    assert controller.get_history({"description": "a long description", "limit": 1})
+    assert controller.get_history({"dict_field.first_key": 1, "value": [2, 5]}) in (
+        [_version(2, 2, 3), _version(5, 5)],
+        [_version(5, 5), _version(2, 2, 3)],
+    )
+    assert controller.get_history({"description": "other"}) == []
+
+
+def test_unset_fields_are_not_reconstructed(controller: layabase.CRUDController):
+    controller.post({"key": "1", "value": 1})
+    controller.put({"key": "1", "description": "added"})
+    assert sorted(
+        controller.get_history({}), key=lambda version: version["valid_since_revision"]
+    ) == [
+        {
+            "key": "1",
+            "value": 1,
+            "description": None,
+            "dict_field": {"first_key": None, "second_key": None},
+            "valid_since_revision": 1,
+            "valid_until_revision": 2,
+        },
+        {
+            "key": "1",
+            "value": 1,
+            "description": "added",
+            "dict_field": {"first_key": None, "second_key": None},
+            "valid_since_revision": 2,
+            "valid_until_revision": -1,
+        },
+    ]
+
+
+def test_get_last_reconstructs_removed_version(
+    controller: layabase.CRUDController, updated
+):
+    controller.delete({"key": "1"})
+    assert controller.get_last({"key": "1"}) == _version(5, 5, 6)
+    assert controller.get_last({"key": "1", "value": 2}) == _version(2, 2, 3)
+
+
+def test_rollback_restores_reconstructed_version(
+    controller: layabase.CRUDController, updated
+):
+    assert controller.rollback_to({"revision": 1, "value": 2}, dry_run=True) == 0
+    assert controller.rollback_to({"revision": 1, "value": 1}, dry_run=True) == 1
+    assert controller.rollback_to({"revision": 1}) == 1
+    assert controller.get({}) == [_version(6, 1)]
+
+    # Further updates of the restored version are stored as deltas again
+    controller.put({"key": "1", "dict_field.second_key": 3})
+    assert controller.get_history({"valid_since_revision": 6}) == [_version(6, 1, 7)]
+    assert _expired(controller)[-1] == {
+        "key": "1",
+        "dict_field": {"first_key": 1, "second_key": 2},
+        "valid_since_revision": 6,
+        "valid_until_revision": 7,
+        "_delta": [],
+    }
+
+
+def test_put_many_stores_deltas(controller: layabase.CRUDController):
+    controller.post_many([{"key": "1", "value": 1}, {"key": "2", "value": 1}])
+    controller.put_many([{"key": "1", "value": 2}, {"key": "2", "value": 2}])
+    assert [version["_delta"] for version in _expired(controller)] == [[], []]
+    assert sorted(
+        version["key"] for version in controller.get_history({"value": 1})
+    ) == ["1", "2"]
+
+
+@pytest.mark.parametrize("snapshot_interval", [1, 3])
+def test_get_history_filters_reconstructed_versions_on_date(snapshot_interval: int):
+    class DateCollection:
+        __collection_name__ = "test_date"
+
+        key = layabase.mongo.Column(is_primary_key=True)
+        value = layabase.mongo.Column(int)
+        date = layabase.mongo.Column(datetime.datetime)
+
+    controller = layabase.CRUDController(
+        DateCollection, history=True, history_snapshot_interval=snapshot_interval
+    )
+    layabase.load("mongomock", [controller])
+    controller.post({"key": "1", "value": 1, "date": "2018-10-11T15:05:05"})
+    controller.put({"key": "1", "value": 2})
+    controller.put({"key": "1", "value": 3, "date": "2019-10-11T15:05:05"})
+
+    assert sorted(
+        version["value"]
+        for version in controller.get_history({"date": "2018-10-11T15:05:05"})
+    ) == [1, 2]
+    assert controller.get_last({"key": "1", "value": 1}) == {
+        "key": "1",
+        "value": 1,
+        "date": "2018-10-11T15:05:05",
+        "valid_since_revision": 1,
+        "valid_until_revision": 2,
+    }
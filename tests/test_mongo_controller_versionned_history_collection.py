@@ -0,0 +1,231 @@
+import pytest
+from layaberr import ModelCouldNotBeFound
+
+import layabase
+import layabase.mongo
+
+
+@pytest.fixture
+def controller():
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(is_primary_key=True)
+        value = layabase.mongo.Column(int)
+
+    controller = layabase.CRUDController(
+        TestCollection, history=True, history_collection=True
+    )
+    layabase.load("mongomock", [controller])
+    return controller
+
+
+def _stored(collection) -> list:
+    return sorted(
+        (
+            document["key"],
+            document["value"],
+            document["valid_since_revision"],
+            document["valid_until_revision"],
+        )
+        for document in collection.find()
+    )
+
+
+def test_expired_versions_are_moved_to_history_collection(
+    controller: layabase.CRUDController,
+):
+    controller.post_many([{"key": "1", "value": 1}, {"key": "2", "value": 1}])
+    controller.put({"key": "1", "value": 2})
+    controller.put_many([{"key": "1", "value": 3}, {"key": "2", "value": 3}])
+    controller.delete({"key": "2"})
+
+    assert _stored(controller._model.__collection__) == [("1", 3, 3, -1)]
+    assert _stored(controller._model.__history__) == [
+        ("1", 1, 1, 2),
+        ("1", 2, 2, 3),
+        ("2", 1, 1, 3),
+        ("2", 3, 3, 4),
+    ]
+    assert controller._model.__history__.name == "test_history"
+
+
+def test_get_retrieves_only_valid_versions(controller: layabase.CRUDController):
+    controller.post_many([{"key": "1", "value": 1}, {"key": "2", "value": 1}])
+    controller.put({"key": "1", "value": 2})
+    controller.delete({"key": "2"})
+
+    assert controller.get({}) == [
+        {"key": "1", "value": 2, "valid_since_revision": 2, "valid_until_revision": -1}
+    ]
+    assert controller.get_one({"key": "1"}) == {
+        "key": "1",
+        "value": 2,
+        "valid_since_revision": 2,
+        "valid_until_revision": -1,
+    }
+
+
+def test_get_history_retrieves_both_collections(controller: layabase.CRUDController):
+    controller.post_many([{"key": "1", "value": 1}, {"key": "2", "value": 1}])
+    controller.put({"key": "1", "value": 2})
+
+    assert controller.get_history({}) == [
+        {"key": "1", "value": 2, "valid_since_revision": 2, "valid_until_revision": -1},
+        {"key": "2", "value": 1, "valid_since_revision": 1, "valid_until_revision": -1},
+        {"key": "1", "value": 1, "valid_since_revision": 1, "valid_until_revision": 2},
+    ]
+    assert controller.get_history({"key": "1"}) == [
+        {"key": "1", "value": 2, "valid_since_revision": 2, "valid_until_revision": -1},
+        {"key": "1", "value": 1, "valid_since_revision": 1, "valid_until_revision": 2},
+    ]
+    assert controller.get_history({"limit": 2, "offset": 1}) == [
+        {"key": "2", "value": 1, "valid_since_revision": 1, "valid_until_revision": -1},
+        {"key": "1", "value": 1, "valid_since_revision": 1, "valid_until_revision": 2},
+    ]
+
+
+def test_get_last_retrieves_expired_version(controller: layabase.CRUDController):
+    controller.post({"key": "1", "value": 1})
+    controller.put({"key": "1", "value": 2})
+    controller.delete({"key": "1"})
+
+    assert controller.get_last({"key": "1"}) == {
+        "key": "1",
+        "value": 2,
+        "valid_since_revision": 2,
+        "valid_until_revision": 3,
+    }
+
+
+def test_put_unknown_document(controller: layabase.CRUDController):
+    with pytest.raises(ModelCouldNotBeFound):
+        controller.put({"key": "1", "value": 2})
+    assert _stored(controller._model.__history__) == []
+
+
+def test_rollback_restores_expired_versions(controller: layabase.CRUDController):
+    controller.post_many([{"key": "1", "value": 1}, {"key": "2", "value": 1}])
+    controller.put({"key": "1", "value": 2})
+    controller.delete({"key": "2"})
+    controller.post({"key": "3", "value": 1})
+
+    assert controller.rollback_to({"revision": 1}, dry_run=True) == 3
+    assert controller.rollback_to({"revision": 1}) == 3
+
+    assert _stored(controller._model.__collection__) == [
+        ("1", 1, 5, -1),
+        ("2", 1, 5, -1),
+    ]
+    assert _stored(controller._model.__history__) == [
+        ("1", 1, 1, 2),
+        ("1", 2, 2, 5),
+        ("2", 1, 1, 3),
+        ("3", 1, 4, 5),
+    ]
+
+
+def test_last_revision_index_is_created_on_history_collection(
+    controller: layabase.CRUDController,
+):
+    assert "ridxtest" in controller._model.__history__.index_information()
+    assert "ridxtest" not in controller._model.__collection__.index_information()
+
+
+def test_expired_versions_of_the_collection_are_moved_on_demand():
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(is_primary_key=True)
+        value = layabase.mongo.Column(int)
+
+    without_history_collection = layabase.CRUDController(TestCollection, history=True)
+    base = layabase.load("mongomock", [without_history_collection])
+    without_history_collection.post_many(
+        [{"key": "1", "value": 1}, {"key": "2", "value": 1}]
+    )
+    without_history_collection.put({"key": "1", "value": 2})
+    without_history_collection.delete({"key": "2"})
+
+    controller = layabase.CRUDController(
+        TestCollection, history=True, history_collection=True
+    )
+    layabase.mongo.link(controller, base)
+    # Nothing is moved when linked
+    assert len(_stored(controller._model.__collection__)) == 3
+
+    assert controller.move_expired_versions(batch_size=1) == 2
+    assert _stored(controller._model.__collection__) == [("1", 2, 2, -1)]
+    assert _stored(controller._model.__history__) == [("1", 1, 1, 2), ("2", 1, 1, 3)]
+    assert controller.get_last({"key": "2"}) == {
+        "key": "2",
+        "value": 1,
+        "valid_since_revision": 1,
+        "valid_until_revision": 3,
+    }
+    assert sorted(
+        controller.get_as_of(1, {}), key=lambda document: document["key"]
+    ) == [
+        {"key": "1", "value": 1, "valid_since_revision": 1, "valid_until_revision": 2},
+        {"key": "2", "value": 1, "valid_since_revision": 1, "valid_until_revision": 3},
+    ]
+    assert controller.rollback_to({"revision": 1}) == 2
+    assert _stored(controller._model.__collection__) == [
+        ("1", 1, 4, -1),
+        ("2", 1, 4, -1),
+    ]
+
+    # Expired versions are now stored in the history collection
+    assert controller.move_expired_versions() == 0
+    assert len(_stored(controller._model.__history__)) == 3
+
+
+def test_interrupted_move_of_expired_versions_is_resumed(monkeypatch):
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(is_primary_key=True)
+        value = layabase.mongo.Column(int)
+
+    without_history_collection = layabase.CRUDController(TestCollection, history=True)
+    base = layabase.load("mongomock", [without_history_collection])
+    without_history_collection.post_many(
+        [{"key": "1", "value": 1}, {"key": "2", "value": 1}]
+    )
+    without_history_collection.delete({"key": "1"})
+    without_history_collection.delete({"key": "2"})
+
+    controller = layabase.CRUDController(
+        TestCollection, history=True, history_collection=True
+    )
+    layabase.mongo.link(controller, base)
+    collection = controller._model.__collection__
+    delete_many = collection.delete_many
+
+    def interrupted_delete_many(*args, **kwargs):
+        raise Exception("Connection lost")
+
+    monkeypatch.setattr(collection, "delete_many", interrupted_delete_many)
+    with pytest.raises(Exception):
+        controller.move_expired_versions(batch_size=1)
+    # First version was inserted in the history collection but not removed from the collection
+    assert len(_stored(controller._model.__history__)) == 1
+    assert len(_stored(collection)) == 2
+
+    monkeypatch.setattr(collection, "delete_many", delete_many)
+    assert controller.move_expired_versions(batch_size=1) == 2
+    assert _stored(collection) == []
+    assert _stored(controller._model.__history__) == [("1", 1, 1, 2), ("2", 1, 1, 3)]
+
+
+def test_move_expired_versions_without_history_collection_does_nothing():
+    class TestCollection:
+        __collection_name__ = "test"
+
+        key = layabase.mongo.Column(is_primary_key=True)
+
+    controller = layabase.CRUDController(TestCollection, history=True)
+    layabase.load("mongomock", [controller])
+    controller.post({"key": "1"})
+    controller.delete({"key": "1"})
+    assert controller.move_expired_versions() == 0
@@ -0,0 +1,179 @@
+import pytest
+
+import layabase
+import layabase._database_mongo
+import layabase.mongo
+
+
+class TestCollection:
+    __collection_name__ = "test"
+
+    key = layabase.mongo.Column(is_primary_key=True)
+    value = layabase.mongo.Column(int)
+
+
+class TestCollection2:
+    __collection_name__ = "test2"
+
+    key = layabase.mongo.Column(is_primary_key=True)
+    value = layabase.mongo.Column(int)
+
+
+def _count_counter_updates(controller: layabase.CRUDController, monkeypatch) -> list:
+    counters = controller._model.__counters__
+    updates = []
+    find_one_and_update = counters.find_one_and_update
+
+    def count(*args, **kwargs):
+        updates.append(args[0])
+        return find_one_and_update(*args, **kwargs)
+
+    monkeypatch.setattr(counters, "find_one_and_update", count)
+    return updates
+
+
+@pytest.fixture
+def shared_controllers():
+    controller = layabase.CRUDController(TestCollection, history=True, audit=True)
+    controller2 = layabase.CRUDController(TestCollection2, history=True, audit=True)
+    layabase.load("mongomock", [controller, controller2])
+    return controller, controller2
+
+
+@pytest.fixture
+def collection_controllers():
+    controller = layabase.CRUDController(
+        TestCollection,
+        history=True,
+        audit=True,
+        revision_scope=layabase.mongo.RevisionScope.Collection,
+    )
+    controller2 = layabase.CRUDController(
+        TestCollection2,
+        history=True,
+        audit=True,
+        revision_scope=layabase.mongo.RevisionScope.Collection,
+    )
+    layabase.load("mongomock", [controller, controller2])
+    return controller, controller2
+
+
+@pytest.fixture
+def block_controller():
+    controller = layabase.CRUDController(
+        TestCollection,
+        history=True,
+        revision_scope=layabase.mongo.RevisionScope.Collection,
+        revision_block_size=10,
+    )
+    layabase.load("mongomock", [controller])
+    return controller
+
+
+def test_revisions_are_shared_by_default(shared_controllers):
+    controller, controller2 = shared_controllers
+    assert controller.post({"key": "1"})["valid_since_revision"] == 1
+    assert controller2.post({"key": "1"})["valid_since_revision"] == 2
+    assert controller._model.current_revision() == 2
+    assert controller2._model.current_revision() == 2
+
+
+def test_revisions_per_collection(collection_controllers):
+    controller, controller2 = collection_controllers
+    assert controller.post({"key": "1", "value": 1})["valid_since_revision"] == 1
+    assert controller2.post({"key": "1"})["valid_since_revision"] == 1
+    assert controller.put({"key": "1", "value": 2})[1]["valid_since_revision"] == 2
+    assert controller._model.current_revision() == 2
+    assert controller2._model.current_revision() == 1
+    assert controller._model._get_counter("revision", "shared") == 0
+
+
+def test_audit_and_rollback_per_collection(collection_controllers):
+    controller, controller2 = collection_controllers
+    controller.post({"key": "1", "value": 1})
+    controller2.post({"key": "1", "value": 1})
+    controller.put({"key": "1", "value": 2})
+    controller2.put({"key": "1", "value": 2})
+
+    assert [
+        (audit["revision"], audit["audit_action"]) for audit in controller.get_audit({})
+    ] == [(1, "Insert"), (2, "Update")]
+    assert [
+        (audit["revision"], audit["audit_action"])
+        for audit in controller2.get_audit({})
+    ] == [(1, "Insert"), (2, "Update")]
+
+    assert controller.rollback_to({"revision": 1}) == 1
+    assert controller.get({}) == [
+        {"key": "1", "value": 1, "valid_since_revision": 3, "valid_until_revision": -1}
+    ]
+    assert controller2.get({}) == [
+        {"key": "1", "value": 2, "valid_since_revision": 2, "valid_until_revision": -1}
+    ]
+
+
+def test_revisions_are_reserved_by_blocks(
+    block_controller: layabase.CRUDController, monkeypatch
+):
+    updates = _count_counter_updates(block_controller, monkeypatch)
+    block_controller.post({"key": "1", "value": 0})
+    for value in range(1, 10):
+        block_controller.put({"key": "1", "value": value})
+    assert block_controller.get({}) == [
+        {"key": "1", "value": 9, "valid_since_revision": 10, "valid_until_revision": -1}
+    ]
+    assert len(updates) == 1
+    assert block_controller._model.current_revision() == 10
+
+
+def test_revisions_reserved_by_another_process_are_taken_into_account(
+    block_controller: layabase.CRUDController, monkeypatch
+):
+    block_controller.post({"key": "1", "value": 1})
+    block_controller.post({"key": "2", "value": 1})
+
+    # Simulate another process (with its own blocks) updating, removing and inserting
+    this_process_blocks = layabase._database_mongo._counter_blocks
+    monkeypatch.setattr(layabase._database_mongo, "_counter_blocks", {})
+    block_controller.put({"key": "1", "value": 2})
+    block_controller.delete({"key": "2"})
+    block_controller.post({"key": "3", "value": 1})
+    monkeypatch.setattr(
+        layabase._database_mongo, "_counter_blocks", this_process_blocks
+    )
+
+    # Remaining revisions of this process (3 to 10) are lower than those used by the other one (11 to 13)
+    assert block_controller.put({"key": "1", "value": 3})[1] == {
+        "key": "1",
+        "value": 3,
+        "valid_since_revision": 21,
+        "valid_until_revision": -1,
+    }
+    assert block_controller.post({"key": "2", "value": 2}) == {
+        "key": "2",
+        "value": 2,
+        "valid_since_revision": 22,
+        "valid_until_revision": -1,
+    }
+    # New block is used as long as it is not outdated
+    assert block_controller.post({"key": "4", "value": 1}) == {
+        "key": "4",
+        "value": 1,
+        "valid_since_revision": 23,
+        "valid_until_revision": -1,
+    }
+    assert block_controller.get_as_of(12, {}) == [
+        {"key": "1", "value": 2, "valid_since_revision": 11, "valid_until_revision": 21}
+    ]
+
+
+def test_revisions_cannot_be_reserved_by_blocks_with_a_shared_counter():
+    controller = layabase.CRUDController(
+        TestCollection, history=True, revision_block_size=10
+    )
+    with pytest.raises(Exception) as exception_info:
+        layabase.load("mongomock", [controller])
+    assert (
+        str(exception_info.value)
+        == "Revisions can only be reserved by blocks with a revision scope per collection."
+    )
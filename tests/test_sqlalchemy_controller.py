@@ -1122,6 +1122,7 @@ def test_open_api_definition(client):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                         {
                             "name": "order_by",
                             "in": "query",
@@ -1370,3 +1371,19 @@ def test_get_model_description_returns_description(controller: layabase.CRUDCont
         "optional": "optional",
         "table": "test",
     }
+
+
+def test_schema_is_created_once_per_thread(controller: layabase.CRUDController):
+    schema = controller._model.schema()
+    assert controller._model.schema() is schema
+
+    other_thread_schemas = []
+    get_thread = Thread(
+        name="SchemaInOtherThread",
+        target=lambda: other_thread_schemas.append(controller._model.schema()),
+    )
+    get_thread.start()
+    get_thread.join()
+
+    assert other_thread_schemas[0] is not schema
+    assert type(other_thread_schemas[0]) is type(schema)
@@ -160,6 +160,7 @@ def test_open_api_definition(client, controller1):
                             "type": "integer",
                             "minimum": 0,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                         {
                             "name": "order_by",
                             "in": "query",
@@ -645,6 +646,7 @@ def test_open_api_definition_without_offset_support(monkeypatch):
                             "minimum": 0,
                             "exclusiveMinimum": True,
                         },
+                        {"name": "after", "in": "query", "type": "string",},
                         {
                             "name": "order_by",
                             "in": "query",
@@ -1446,6 +1448,40 @@ def test_delete_with_filter_is_removing_the_proper_row(
     ]
 
 
+def test_delete_with_list_filter_is_auditing_every_removed_row(
+    controllers, controller1, mock_sqlalchemy_audit_datetime
+):
+    controller1.post_many(
+        [
+            {"key": "my_key1", "mandatory": 1, "optional": "my_value1"},
+            {"key": "my_key2", "mandatory": 2},
+            {"key": "my_key3", "mandatory": 3, "optional": "my_value3"},
+        ]
+    )
+    assert controller1.delete({"key": ["my_key1", "my_key3"]}) == 2
+    assert controller1.get({}) == [{"key": "my_key2", "mandatory": 2, "optional": None}]
+    assert controller1.get_audit({"audit_action": "D"}) == [
+        {
+            "audit_action": "D",
+            "audit_date_utc": "2018-10-11T15:05:05.663979",
+            "audit_user": "",
+            "key": "my_key1",
+            "mandatory": 1,
+            "optional": "my_value1",
+            "revision": 4,
+        },
+        {
+            "audit_action": "D",
+            "audit_date_utc": "2018-10-11T15:05:05.663979",
+            "audit_user": "",
+            "key": "my_key3",
+            "mandatory": 3,
+            "optional": "my_value3",
+            "revision": 5,
+        },
+    ]
+
+
 def test_audit_filter_is_returning_only_selected_data(
     controllers, controller1, mock_sqlalchemy_audit_datetime
 ):
@@ -0,0 +1,109 @@
+import pytest
+import sqlalchemy
+
+import layabase
+from layabase.testing import mock_sqlalchemy_audit_datetime
+
+
+@pytest.fixture
+def controller():
+    class TestTable:
+        __tablename__ = "test"
+
+        key = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+        mandatory = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+        optional = sqlalchemy.Column(sqlalchemy.String)
+
+    controller = layabase.CRUDController(
+        TestTable, audit=True, audit_queue_size=10, audit_flush_interval=0.01
+    )
+    layabase.load("sqlite:///:memory:", [controller])
+    yield controller
+    controller.close_audit()
+
+
+def test_audit_is_written_in_the_background(controller, mock_sqlalchemy_audit_datetime):
+    controller.post({"key": "my_key1", "mandatory": 1, "optional": "my_value1"})
+    controller.post_many([{"key": "my_key2", "mandatory": 2}], bulk_size=10)
+    controller.flush_audit()
+    controller.put({"key": "my_key1", "optional": "my_value"})
+    controller.flush_audit()
+    assert controller.delete({"key": "my_key2"}) == 1
+    controller.flush_audit()
+    assert controller.get_audit({}) == [
+        {
+            "audit_action": "I",
+            "audit_date_utc": "2018-10-11T15:05:05.663979",
+            "audit_user": "",
+            "key": "my_key1",
+            "mandatory": 1,
+            "optional": "my_value1",
+            "revision": 1,
+        },
+        {
+            "audit_action": "I",
+            "audit_date_utc": "2018-10-11T15:05:05.663979",
+            "audit_user": "",
+            "key": "my_key2",
+            "mandatory": 2,
+            "optional": None,
+            "revision": 2,
+        },
+        {
+            "audit_action": "U",
+            "audit_date_utc": "2018-10-11T15:05:05.663979",
+            "audit_user": "",
+            "key": "my_key1",
+            "mandatory": 1,
+            "optional": "my_value",
+            "revision": 3,
+        },
+        {
+            "audit_action": "D",
+            "audit_date_utc": "2018-10-11T15:05:05.663979",
+            "audit_user": "",
+            "key": "my_key2",
+            "mandatory": 2,
+            "optional": None,
+            "revision": 4,
+        },
+    ]
+    statistics = controller.audit_statistics()
+    assert statistics["written"] == 4
+    assert statistics["failed"] == 0
+
+
+def test_audit_is_not_written_if_transaction_is_rolled_back(controller):
+    def fail(session):
+        raise Exception("Commit failure")
+
+    controller.post({"key": "my_key1", "mandatory": 1})
+    sqlalchemy.event.listen(controller._model._session, "before_commit", fail)
+    with pytest.raises(Exception):
+        controller.post({"key": "my_key2", "mandatory": 2})
+    with pytest.raises(Exception):
+        controller.post_many([{"key": "my_key3", "mandatory": 3}])
+    with pytest.raises(Exception):
+        controller.delete({})
+    sqlalchemy.event.remove(controller._model._session, "before_commit", fail)
+    controller.flush_audit()
+    assert controller.get({}) == [{"key": "my_key1", "mandatory": 1, "optional": None}]
+    assert [
+        (audit["key"], audit["audit_action"]) for audit in controller.get_audit({})
+    ] == [("my_key1", "I")]
+
+    # Next transactions are audited
+    controller.put({"key": "my_key1", "mandatory": 4})
+    controller.flush_audit()
+    assert [
+        (audit["key"], audit["audit_action"]) for audit in controller.get_audit({})
+    ] == [("my_key1", "I"), ("my_key1", "U")]
+
+
+def test_linking_again_closes_previous_writer(controller):
+    writer = controller._model.audit_model._writer
+    controller.post({"key": "my_key1", "mandatory": 1})
+    layabase.load("sqlite:///:memory:", [controller])
+    assert not writer._worker.is_alive()
+    assert writer.statistics()["written"] == 1
+    assert controller._model.audit_model._writer is not writer
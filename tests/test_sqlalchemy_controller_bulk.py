@@ -0,0 +1,288 @@
+import pytest
+import sqlalchemy
+from layaberr import ValidationFailed, ModelCouldNotBeFound
+
+import layabase
+from layabase.testing import mock_sqlalchemy_audit_datetime
+
+
+@pytest.fixture
+def controller():
+    class TestTable:
+        __tablename__ = "test"
+
+        key = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+        mandatory = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+        optional = sqlalchemy.Column(sqlalchemy.String)
+        date_value = sqlalchemy.Column(sqlalchemy.Date)
+
+    controller = layabase.CRUDController(TestTable, audit=True)
+    layabase.load("sqlite:///:memory:", [controller])
+    return controller
+
+
+def test_post_many_in_bulk(
+    controller: layabase.CRUDController, mock_sqlalchemy_audit_datetime
+):
+    assert controller.post_many(
+        [
+            {"key": "my_key1", "mandatory": 1, "date_value": "2018-01-01"},
+            {"key": "my_key2", "mandatory": 2, "optional": "my_value2"},
+            {"key": "my_key3", "mandatory": 3},
+        ],
+        bulk_size=2,
+    ) == [
+        {
+            "key": "my_key1",
+            "mandatory": 1,
+            "optional": None,
+            "date_value": "2018-01-01",
+        },
+        {"key": "my_key2", "mandatory": 2, "optional": "my_value2", "date_value": None},
+        {"key": "my_key3", "mandatory": 3, "optional": None, "date_value": None},
+    ]
+    assert controller.get({}) == [
+        {
+            "key": "my_key1",
+            "mandatory": 1,
+            "optional": None,
+            "date_value": "2018-01-01",
+        },
+        {"key": "my_key2", "mandatory": 2, "optional": "my_value2", "date_value": None},
+        {"key": "my_key3", "mandatory": 3, "optional": None, "date_value": None},
+    ]
+    assert controller.get_audit({}) == [
+        {
+            "audit_action": "I",
+            "audit_date_utc": "2018-10-11T15:05:05.663979",
+            "audit_user": "",
+            "date_value": "2018-01-01",
+            "key": "my_key1",
+            "mandatory": 1,
+            "optional": None,
+            "revision": 1,
+        },
+        {
+            "audit_action": "I",
+            "audit_date_utc": "2018-10-11T15:05:05.663979",
+            "audit_user": "",
+            "date_value": None,
+            "key": "my_key2",
+            "mandatory": 2,
+            "optional": "my_value2",
+            "revision": 2,
+        },
+        {
+            "audit_action": "I",
+            "audit_date_utc": "2018-10-11T15:05:05.663979",
+            "audit_user": "",
+            "date_value": None,
+            "key": "my_key3",
+            "mandatory": 3,
+            "optional": None,
+            "revision": 3,
+        },
+    ]
+
+
+def test_post_many_in_bulk_returns_default_values():
+    class TestTable:
+        __tablename__ = "test"
+
+        key = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+        optional = sqlalchemy.Column(sqlalchemy.String, default="default")
+        computed = sqlalchemy.Column(sqlalchemy.String, default=lambda: "computed")
+        other = sqlalchemy.Column(sqlalchemy.String)
+
+    controller = layabase.CRUDController(TestTable)
+    layabase.load("sqlite:///:memory:", [controller])
+    rows = [{"key": "my_key1"}, {"key": "my_key2", "optional": "provided"}]
+    assert (
+        controller.post_many(rows, bulk_size=2)
+        == controller.get({})
+        == [
+            {
+                "key": "my_key1",
+                "optional": "default",
+                "computed": "computed",
+                "other": None,
+            },
+            {
+                "key": "my_key2",
+                "optional": "provided",
+                "computed": "computed",
+                "other": None,
+            },
+        ]
+    )
+
+
+def test_post_many_in_bulk_does_not_load_models(controller: layabase.CRUDController):
+    controller.post_many([{"key": "my_key1", "mandatory": 1}], bulk_size=10)
+    assert not controller._model._session().identity_map
+
+
+def test_post_many_invalid_in_bulk(controller: layabase.CRUDController):
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.post_many(
+            [{"key": "my_key1", "mandatory": 1}, {"key": "my_key2"}], bulk_size=10
+        )
+    assert exception_info.value.errors == {
+        1: {"mandatory": ["Missing data for required field."]}
+    }
+    assert controller.get({}) == []
+    assert controller.get_audit({}) == []
+
+
+def test_post_many_existing_in_bulk_is_rolled_back(
+    controller: layabase.CRUDController,
+):
+    controller.post({"key": "my_key2", "mandatory": 2})
+    with pytest.raises(Exception):
+        controller.post_many(
+            [{"key": "my_key1", "mandatory": 1}, {"key": "my_key2", "mandatory": 2}],
+            bulk_size=1,
+        )
+    assert controller.get({}) == [
+        {"key": "my_key2", "mandatory": 2, "optional": None, "date_value": None}
+    ]
+
+
+@pytest.fixture
+def composite_controller():
+    class TestCompositeTable:
+        __tablename__ = "test_composite"
+
+        key = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+        date_key = sqlalchemy.Column(sqlalchemy.Date, primary_key=True)
+        value = sqlalchemy.Column(sqlalchemy.Integer)
+
+    controller = layabase.CRUDController(TestCompositeTable)
+    layabase.load("sqlite:///:memory:", [controller])
+    return controller
+
+
+def _count_selects(controller: layabase.CRUDController) -> list:
+    statements = []
+
+    @sqlalchemy.event.listens_for(controller._model.metadata.bind, "before_execute")
+    def count(conn, clauseelement, multiparams, params):
+        if isinstance(clauseelement, sqlalchemy.sql.Select):
+            statements.append(clauseelement)
+
+    return statements
+
+
+def test_put_many_fetches_previous_rows_at_once(controller: layabase.CRUDController):
+    controller.post_many(
+        [{"key": f"my_key{i}", "mandatory": i} for i in range(5)], bulk_size=5
+    )
+    selects = _count_selects(controller)
+    previous_rows, new_rows = controller.put_many(
+        [{"key": f"my_key{i}", "mandatory": i + 10} for i in range(5)]
+    )
+    assert [row["mandatory"] for row in previous_rows] == [0, 1, 2, 3, 4]
+    assert [row["mandatory"] for row in new_rows] == [10, 11, 12, 13, 14]
+    assert len(selects) == 1
+
+
+def test_put_many_with_composite_keys(composite_controller: layabase.CRUDController):
+    composite_controller.post_many(
+        [
+            {"key": "my_key1", "date_key": "2018-01-01", "value": 1},
+            {"key": "my_key1", "date_key": "2018-01-02", "value": 2},
+            {"key": "my_key2", "date_key": "2018-01-01", "value": 3},
+        ]
+    )
+    selects = _count_selects(composite_controller)
+    assert composite_controller.put_many(
+        [
+            {"key": "my_key2", "date_key": "2018-01-01", "value": 30},
+            {"key": "my_key1", "date_key": "2018-01-02", "value": 20},
+        ]
+    ) == (
+        [
+            {"key": "my_key2", "date_key": "2018-01-01", "value": 3},
+            {"key": "my_key1", "date_key": "2018-01-02", "value": 2},
+        ],
+        [
+            {"key": "my_key2", "date_key": "2018-01-01", "value": 30},
+            {"key": "my_key1", "date_key": "2018-01-02", "value": 20},
+        ],
+    )
+    assert len(selects) == 1
+    assert composite_controller.get({"value": 1}) == [
+        {"key": "my_key1", "date_key": "2018-01-01", "value": 1}
+    ]
+
+
+def test_put_many_with_unknown_composite_keys(
+    composite_controller: layabase.CRUDController,
+):
+    composite_controller.post({"key": "my_key1", "date_key": "2018-01-01", "value": 1})
+    with pytest.raises(ModelCouldNotBeFound) as exception_info:
+        composite_controller.put_many(
+            [
+                {"key": "my_key1", "date_key": "2018-01-01", "value": 10},
+                {"key": "my_key1", "date_key": "2018-01-02", "value": 20},
+            ]
+        )
+    assert exception_info.value.requested_data == {
+        "key": "my_key1",
+        "date_key": "2018-01-02",
+        "value": 20,
+    }
+    assert composite_controller.get({}) == [
+        {"key": "my_key1", "date_key": "2018-01-01", "value": 1}
+    ]
+
+
+def test_put_many_with_invalid_composite_keys(
+    composite_controller: layabase.CRUDController,
+):
+    with pytest.raises(ValidationFailed) as exception_info:
+        composite_controller.put_many(
+            [{"key": "my_key1", "date_key": "not a date", "value": 10}]
+        )
+    assert exception_info.value.errors == {"date_key": ["Not a valid date."]}
+
+
+def test_post_many_in_bulk_with_auto_incremented_key(mock_sqlalchemy_audit_datetime):
+    class TestTable:
+        __tablename__ = "test"
+
+        key = sqlalchemy.Column(
+            sqlalchemy.Integer, primary_key=True, autoincrement=True
+        )
+        value = sqlalchemy.Column(sqlalchemy.String)
+
+    controller = layabase.CRUDController(TestTable, audit=True)
+    layabase.load("sqlite:///:memory:", [controller])
+    assert controller.post_many(
+        [{"value": "first"}, {"value": "second"}, {"value": "third"}], bulk_size=2
+    ) == [
+        {"key": 1, "value": "first"},
+        {"key": 2, "value": "second"},
+        {"key": 3, "value": "third"},
+    ]
+    assert [
+        (audit["key"], audit["audit_action"]) for audit in controller.get_audit({})
+    ] == [(1, "I"), (2, "I"), (3, "I"),]
+
+
+def test_put_many_relies_on_database_collation():
+    class TestTable:
+        __tablename__ = "test"
+
+        key = sqlalchemy.Column(sqlalchemy.String(collation="NOCASE"), primary_key=True)
+        value = sqlalchemy.Column(sqlalchemy.Integer)
+
+    controller = layabase.CRUDController(TestTable)
+    layabase.load("sqlite:///:memory:", [controller])
+    controller.post_many([{"key": "Key1", "value": 1}, {"key": "key2", "value": 1}])
+    previous_rows, new_rows = controller.put_many(
+        [{"key": "key1", "value": 2}, {"key": "key2", "value": 2}]
+    )
+    assert previous_rows == [{"key": "Key1", "value": 1}, {"key": "key2", "value": 1}]
+    assert [row["value"] for row in new_rows] == [2, 2]
+    assert sorted(row["value"] for row in controller.get({})) == [2, 2]
@@ -0,0 +1,123 @@
+import time
+
+import pytest
+import sqlalchemy
+from layaberr import ValidationFailed
+
+import layabase
+
+
+class TestTable:
+    __tablename__ = "test"
+
+    key = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+    mandatory = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+
+
+@pytest.fixture
+def controller():
+    controller = layabase.CRUDController(TestTable, cache_size=2)
+    layabase.load("sqlite:///:memory:", [controller])
+    controller.post({"key": "my_key1", "mandatory": 1})
+    return controller
+
+
+def _query_database(controller: layabase.CRUDController, value):
+    """Modify database without going through the controller."""
+    session = controller._model._session()
+    session.execute(f"UPDATE test SET mandatory = {value}")
+    session.commit()
+
+
+def test_without_cache():
+    controller = layabase.CRUDController(TestTable)
+    layabase.load("sqlite:///:memory:", [controller])
+    controller.post({"key": "my_key1", "mandatory": 1})
+    assert controller.get({}) == [{"key": "my_key1", "mandatory": 1}]
+    _query_database(controller, 2)
+    assert controller.get({}) == [{"key": "my_key1", "mandatory": 2}]
+    assert controller.cache_statistics() == {}
+
+
+def test_get_is_cached(controller: layabase.CRUDController):
+    assert controller.get({"key": "my_key1"}) == [{"key": "my_key1", "mandatory": 1}]
+    _query_database(controller, 2)
+    assert controller.get({"key": "my_key1"}) == [{"key": "my_key1", "mandatory": 1}]
+    assert controller.get_one({"key": "my_key1"}) == {"key": "my_key1", "mandatory": 2}
+    assert controller.cache_statistics() == {
+        "hits": 1,
+        "misses": 2,
+        "evictions": 0,
+        "size": 2,
+    }
+
+
+def test_cache_key_does_not_depend_on_arguments_order(
+    controller: layabase.CRUDController,
+):
+    controller.get({"key": "my_key1", "mandatory": 1})
+    controller.get({"mandatory": 1, "key": "my_key1"})
+    assert controller.cache_statistics()["hits"] == 1
+
+
+def test_cached_result_cannot_be_altered(controller: layabase.CRUDController):
+    controller.get({})[0]["mandatory"] = 2
+    controller.get({})[0]["mandatory"] = 3
+    assert controller.get({}) == [{"key": "my_key1", "mandatory": 1}]
+
+
+def test_least_recently_used_result_is_evicted(controller: layabase.CRUDController):
+    controller.get({"key": "my_key1"})
+    controller.get({"mandatory": 1})
+    controller.get({"key": "my_key1"})
+    controller.get({})
+    assert controller.cache_statistics() == {
+        "hits": 1,
+        "misses": 3,
+        "evictions": 1,
+        "size": 2,
+    }
+    _query_database(controller, 2)
+    # Evicted
+    assert controller.get({"mandatory": 1}) == []
+    # Still cached
+    assert controller.get({}) == [{"key": "my_key1", "mandatory": 1}]
+
+
+def test_result_expires(controller: layabase.CRUDController):
+    controller._cache.time_to_live = 0.01
+    controller.get({})
+    _query_database(controller, 2)
+    time.sleep(0.02)
+    assert controller.get({}) == [{"key": "my_key1", "mandatory": 2}]
+    assert controller.cache_statistics()["misses"] == 2
+
+
+@pytest.mark.parametrize(
+    "modify",
+    [
+        lambda controller: controller.post({"key": "my_key2", "mandatory": 2}),
+        lambda controller: controller.post_many([{"key": "my_key2", "mandatory": 2}]),
+        lambda controller: controller.put({"key": "my_key1", "mandatory": 2}),
+        lambda controller: controller.put_many([{"key": "my_key1", "mandatory": 2}]),
+        lambda controller: controller.delete({"key": "my_key1"}),
+        lambda controller: controller.rollback_to({}),
+    ],
+)
+def test_cache_is_invalidated_by_modifications(
+    controller: layabase.CRUDController, modify
+):
+    controller.get({})
+    modify(controller)
+    _query_database(controller, 3)
+    assert controller.get({}) == controller._model.get_all()
+    assert controller.cache_statistics()["size"] == 1
+
+
+def test_cache_is_invalidated_by_failed_modifications(
+    controller: layabase.CRUDController,
+):
+    controller.get({})
+    with pytest.raises(ValidationFailed):
+        controller.post({"key": "my_key2"})
+    assert controller.cache_statistics()["size"] == 0
@@ -0,0 +1,171 @@
+import datetime
+
+import pytest
+import sqlalchemy
+from layaberr import ValidationFailed
+
+import layabase
+
+
+@pytest.fixture
+def controller():
+    class TestTable:
+        __tablename__ = "test"
+
+        key = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+        other_key = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+        date_value = sqlalchemy.Column(sqlalchemy.Date)
+
+    controller = layabase.CRUDController(TestTable)
+    layabase.load("sqlite:///:memory:", [controller])
+    controller.post_many(
+        [
+            {"key": "key1", "other_key": 2, "date_value": "2018-01-03"},
+            {"key": "key2", "other_key": 1, "date_value": "2018-01-01"},
+            {"key": "key1", "other_key": 1, "date_value": "2018-01-02"},
+            {"key": "key3", "other_key": 1, "date_value": "2018-01-01"},
+        ]
+    )
+    return controller
+
+
+def test_get_page_without_providing_a_dictionary(controller: layabase.CRUDController):
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.get_page("")
+    assert exception_info.value.errors == {"": ["Must be a dictionary."]}
+    assert exception_info.value.received_data == ""
+
+
+def test_get_page_without_limit_returns_everything(
+    controller: layabase.CRUDController,
+):
+    rows, after = controller.get_page({})
+    assert [(row["key"], row["other_key"]) for row in rows] == [
+        ("key1", 1),
+        ("key1", 2),
+        ("key2", 1),
+        ("key3", 1),
+    ]
+    assert after is None
+
+
+def test_get_pages_ordered_by_primary_keys(controller: layabase.CRUDController):
+    rows, after = controller.get_page({"limit": 3})
+    assert [(row["key"], row["other_key"]) for row in rows] == [
+        ("key1", 1),
+        ("key1", 2),
+        ("key2", 1),
+    ]
+
+    rows, after = controller.get_page({"limit": 3, "after": after})
+    assert [(row["key"], row["other_key"]) for row in rows] == [("key3", 1)]
+    assert after is None
+
+
+def test_get_pages_with_filter(controller: layabase.CRUDController):
+    rows, after = controller.get_page({"other_key": 1, "limit": 1})
+    assert [(row["key"], row["other_key"]) for row in rows] == [("key1", 1)]
+
+    rows, after = controller.get_page({"other_key": 1, "limit": 1, "after": after})
+    assert [(row["key"], row["other_key"]) for row in rows] == [("key2", 1)]
+
+    # after can also be provided to get
+    assert controller.get({"other_key": 1, "after": after}) == [
+        {"key": "key3", "other_key": 1, "date_value": "2018-01-01"}
+    ]
+
+
+def test_get_pages_ordered_by_descending_date(controller: layabase.CRUDController):
+    rows, after = controller.get_page({"order_by": ["date_value desc"], "limit": 2})
+    assert [(row["key"], row["other_key"]) for row in rows] == [
+        ("key1", 2),
+        ("key1", 1),
+    ]
+
+    rows, after = controller.get_page(
+        {"order_by": ["date_value desc"], "limit": 2, "after": after}
+    )
+    # Rows with the same date are ordered by primary keys
+    assert [(row["key"], row["other_key"]) for row in rows] == [
+        ("key2", 1),
+        ("key3", 1),
+    ]
+
+    rows, after = controller.get_page(
+        {"order_by": ["date_value desc"], "limit": 2, "after": after}
+    )
+    assert rows == []
+    assert after is None
+
+
+def test_get_page_with_token_of_another_ordering(controller: layabase.CRUDController):
+    _, after = controller.get_page({"order_by": ["date_value"], "limit": 1})
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.get_page({"limit": 1, "after": after})
+    assert exception_info.value.errors == {"after": ["Invalid continuation token."]}
+
+
+def test_get_page_with_invalid_token(controller: layabase.CRUDController):
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.get({"after": "invalid"})
+    assert exception_info.value.errors == {"after": ["Invalid continuation token."]}
+
+
+def test_get_page_ordered_by_unknown_column(controller: layabase.CRUDController):
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.get_page({"order_by": ["unknown desc"], "limit": 1})
+    assert exception_info.value.errors == {
+        "order_by": ["unknown desc cannot be used to paginate."]
+    }
+
+
+@pytest.mark.parametrize("direction", ["", " desc"])
+def test_get_pages_ordered_by_a_column_containing_null(
+    controller: layabase.CRUDController, direction: str
+):
+    controller.post_many(
+        [
+            {"key": "key4", "other_key": 1, "date_value": None},
+            {"key": "key0", "other_key": 1, "date_value": None},
+        ]
+    )
+    order_by = [f"date_value{direction}"]
+    rows, after = controller.get_page({"order_by": order_by, "limit": 4})
+    assert after is not None
+    next_rows, after = controller.get_page(
+        {"order_by": order_by, "limit": 4, "after": after}
+    )
+    assert after is None
+    # NULL values are returned last whatever the direction
+    assert [(row["key"], row["other_key"]) for row in rows + next_rows] == [
+        *(
+            [("key2", 1), ("key3", 1), ("key1", 1), ("key1", 2)]
+            if not direction
+            else [("key1", 2), ("key1", 1), ("key2", 1), ("key3", 1)]
+        ),
+        ("key0", 1),
+        ("key4", 1),
+    ]
+
+    # Rows after a NULL value
+    rows, after = controller.get_page({"order_by": order_by, "limit": 5})
+    assert [(row["key"], row["other_key"]) for row in rows][-1] == ("key0", 1)
+    rows, after = controller.get_page(
+        {"order_by": order_by, "limit": 5, "after": after}
+    )
+    assert [(row["key"], row["other_key"]) for row in rows] == [("key4", 1)]
+
+
+@pytest.mark.parametrize("dialect", ["mssql", "oracle", "sybase"])
+def test_ordering_by_a_nullable_column_compiles_on_dialect(
+    controller: layabase.CRUDController, dialect: str
+):
+    model = controller._model
+    seek_keys = model._seek_keys({"order_by": ["date_value desc"]})
+    query = model._session.query(model).order_by(*model._seek_order(seek_keys))
+    order_by = str(
+        query.statement.compile(dialect=sqlalchemy.dialects.registry.load(dialect)())
+    ).split("ORDER BY")[1]
+    assert order_by.startswith(
+        " CASE WHEN (test.date_value IS NULL) THEN 1 ELSE 0 END, test.date_value DESC,"
+    )
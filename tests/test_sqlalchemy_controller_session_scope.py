@@ -0,0 +1,125 @@
+import gc
+from threading import Thread
+
+import flask
+import pytest
+import sqlalchemy
+
+import layabase
+
+
+class TestTable:
+    __tablename__ = "test"
+
+    key = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+    mandatory = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+
+
+def _current_session(controller: layabase.CRUDController):
+    return controller._model._session()
+
+
+def _session_in_other_thread(controller: layabase.CRUDController):
+    sessions = []
+    thread = Thread(target=lambda: sessions.append(_current_session(controller)))
+    thread.start()
+    thread.join()
+    return sessions[0]
+
+
+def test_session_is_thread_scoped_by_default():
+    controller = layabase.CRUDController(TestTable)
+    layabase.load("sqlite:///:memory:", [controller])
+
+    session = _current_session(controller)
+    assert _current_session(controller) is session
+    assert _session_in_other_thread(controller) is not session
+
+
+def test_session_is_shared_with_audit_model():
+    controller = layabase.CRUDController(TestTable, audit=True)
+    layabase.load("sqlite:///:memory:", [controller])
+
+    assert _current_session(controller) is controller._model.audit_model._session()
+
+
+def test_session_is_request_scoped():
+    controller = layabase.CRUDController(TestTable)
+    layabase.load("sqlite:///:memory:", [controller], session_scope="request")
+    application = flask.Flask(__name__)
+
+    with application.test_request_context():
+        first_request_session = _current_session(controller)
+        assert _current_session(controller) is first_request_session
+
+    with application.test_request_context():
+        assert _current_session(controller) is not first_request_session
+
+
+def test_session_with_custom_scope():
+    scope = "first"
+    controller = layabase.CRUDController(TestTable)
+    layabase.load("sqlite:///:memory:", [controller], session_scope=lambda: scope)
+
+    first_session = _current_session(controller)
+    # Sessions are not thread related anymore
+    assert _session_in_other_thread(controller) is first_session
+
+    scope = "second"
+    assert _current_session(controller) is not first_session
+
+
+def test_invalid_session_scope():
+    controller = layabase.CRUDController(TestTable)
+    with pytest.raises(Exception) as exception_info:
+        layabase.load("sqlite:///:memory:", [controller], session_scope="invalid")
+    assert (
+        str(exception_info.value)
+        == 'session_scope should be "thread", "request" or a function. Received invalid.'
+    )
+
+
+def test_teardown_provides_a_new_session():
+    controller = layabase.CRUDController(TestTable)
+    base = layabase.load("sqlite:///:memory:", [controller])
+    controller.post({"key": "my_key1", "mandatory": 1})
+    session = _current_session(controller)
+
+    layabase.teardown(base)
+
+    assert _current_session(controller) is not session
+    assert controller.get({}) == [{"key": "my_key1", "mandatory": 1}]
+
+
+def test_teardown_without_database():
+    with pytest.raises(Exception) as exception_info:
+        layabase.teardown(None)
+    assert str(exception_info.value) == "A database connection URL must be provided."
+
+
+def test_request_session_is_released_without_teardown(monkeypatch):
+    controller = layabase.CRUDController(TestTable)
+    layabase.load("sqlite:///:memory:", [controller], session_scope="request")
+    application = flask.Flask(__name__)
+    closed_sessions = []
+    close = sqlalchemy.orm.Session.close
+
+    def record_close(session):
+        closed_sessions.append(session)
+        close(session)
+
+    monkeypatch.setattr(sqlalchemy.orm.Session, "close", record_close)
+
+    sessions = []
+    for key in range(3):
+        with application.test_request_context():
+            controller.post({"key": f"my_key{key}", "mandatory": 1})
+            sessions.append(_current_session(controller))
+            registry = controller._model._session.registry.registry
+            assert len(registry) == 1
+            closed_sessions.clear()
+        gc.collect()
+        assert len(registry) == 0
+        assert sessions[-1] in closed_sessions
+    assert len(set(sessions)) == 3
+    assert len(controller.get({})) == 3
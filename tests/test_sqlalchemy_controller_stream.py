@@ -0,0 +1,61 @@
+import pytest
+import sqlalchemy
+from layaberr import ValidationFailed
+
+import layabase
+
+
+@pytest.fixture
+def controller():
+    class TestTable:
+        __tablename__ = "test"
+
+        key = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+        mandatory = sqlalchemy.Column(
+            sqlalchemy.Integer,
+            nullable=False,
+            info={"marshmallow": {"required_on_query": True}},
+        )
+
+    controller = layabase.CRUDController(TestTable)
+    layabase.load("sqlite:///:memory:", [controller])
+    return controller
+
+
+def test_stream_without_providing_a_dictionary(controller: layabase.CRUDController):
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.stream("")
+    assert exception_info.value.errors == {"": ["Must be a dictionary."]}
+    assert exception_info.value.received_data == ""
+
+
+def test_stream_without_required_field(controller: layabase.CRUDController):
+    # Validation is performed before retrieving the first row
+    with pytest.raises(ValidationFailed) as exception_info:
+        controller.stream({})
+    assert exception_info.value.errors == {
+        "mandatory": ["Missing data for required field."]
+    }
+
+
+def test_stream_without_data(controller: layabase.CRUDController):
+    assert list(controller.stream({"mandatory": 1})) == []
+
+
+def test_stream_is_fetching_everything_by_batch(controller: layabase.CRUDController):
+    controller.post_many(
+        [{"key": f"my_key{index}", "mandatory": 1} for index in range(5)]
+    )
+    controller.post({"key": "other_key", "mandatory": 2})
+    assert list(
+        controller.stream({"mandatory": 1, "order_by": ["key desc"]}, fetch_size=2)
+    ) == [{"key": f"my_key{index}", "mandatory": 1} for index in reversed(range(5))]
+
+
+def test_stream_with_limit_and_offset(controller: layabase.CRUDController):
+    controller.post_many(
+        [{"key": f"my_key{index}", "mandatory": 1} for index in range(5)]
+    )
+    assert list(
+        controller.stream({"mandatory": 1, "limit": 2, "offset": 1}, fetch_size=1)
+    ) == [{"key": "my_key1", "mandatory": 1}, {"key": "my_key2", "mandatory": 1}]